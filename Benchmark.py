@@ -0,0 +1,229 @@
+import argparse
+import json
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+
+import Json_Backends
+import main
+import Process_Jobs
+from Report_Writer import write_report
+from Synthetic_Corpus_Generator import generate_corpus
+from Utilities_and_Cosmetics import read_json_jobs
+
+"""
+An end-to-end throughput benchmark of 'process_corpus' (main.py), over synthetic corpora of several sizes
+(see 'Synthetic_Corpus_Generator.py').
+
+For each corpus size, the corpus is generated (or reused, if it was already generated with the same settings), and
+'process_corpus' and the report are run on it with all their output discarded. The time of each stage is measured:
+    parse    - reading the parts' jobs from the JSON files (measured in a separate pass - it's part of 'jobs' too)
+    jobs     - processing the parts' jobs (when processing in parallel - waiting for the workers' results)
+    merge    - merging the parts' results (only when processing in parallel, or with the results cache)
+    drawings - adding the technical drawings' info
+    report   - printing the stats
+The runs are repeated, and the fastest one is reported - parts/sec and holes/sec are computed from its total time.
+
+Usage example:
+    python Benchmark.py --sizes 10 50 200 --workers 4 --output results.json
+    python Benchmark.py --sizes 10 50 200 --baseline results.json   (fails if the throughput dropped)
+"""
+
+stages = ["parse", "jobs", "merge", "drawings", "report"]
+
+
+def timed(stage_times, stage, function):
+    """ Returns a wrapper of the function that adds its run time to stage_times[stage] """
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            stage_times[stage] += time.perf_counter() - start
+    return wrapper
+
+
+def timed_results(stage_times, stage, part_results):
+    """ Yields the parts' results, adding the time spent waiting for each of them to stage_times[stage] """
+    part_results = iter(part_results)
+    while True:
+        start = time.perf_counter()
+        try:
+            part_result = next(part_results)
+        except StopIteration:
+            return
+        finally:
+            stage_times[stage] += time.perf_counter() - start
+        yield part_result
+
+
+def benchmark_corpus(corpus_dir, num_workers=1, cache_dir=None):
+    """
+    This function runs 'process_corpus' and the report on a corpus once, and measures the time of each stage.
+
+    Args:
+        corpus_dir (str):  The corpus' directory (holds 'JSONs' and 'Tech_Drawing_JSONs')
+        num_workers (int): Number of worker processes (see 'num_workers' in main.py)
+        cache_dir (str):   The directory of the results cache (see 'cache_dir' in main.py) - None for not using it
+
+    Returns:
+        result (dict): The time of each stage and the total time (seconds), and the number of parts, jobs and holes
+    """
+    stage_times = dict.fromkeys(stages, 0.0)
+    parts_names = [part_name for part_name in os.listdir(os.path.join(corpus_dir, "JSONs"))
+                   if part_name.endswith('.json')]
+
+    # Reading the parts' jobs alone
+    num_jobs = 0
+    start = time.perf_counter()
+    for part_name in parts_names:
+        for job in read_json_jobs(os.path.join(corpus_dir, "JSONs", part_name),
+                                  main.drilling_types + main.non_drilling_types):
+            num_jobs += 1
+    stage_times["parse"] = time.perf_counter() - start
+
+    # Wrapping the stages of main.py with timers
+    patches = [(main, "process_part_drawing", timed(stage_times, "drawings", main.process_part_drawing)),
+               (Process_Jobs, "merge_partial_topologies",
+                timed(stage_times, "merge", Process_Jobs.merge_partial_topologies))]
+    if num_workers <= 1 and cache_dir is None:
+        patches.append((main, "process_part_jobs", timed(stage_times, "jobs", main.process_part_jobs)))
+    else:
+        # The parts are processed by 'process_part_worker' (maybe in other processes) - timing the wait for them
+        merge_part_results = main.merge_part_results
+        patches.append((main, "merge_part_results", lambda part_results, *args: merge_part_results(
+            timed_results(stage_times, "jobs", part_results), *args)))
+    originals = [(module, name, getattr(module, name)) for module, name, function in patches]
+    for module, name, function in patches:
+        setattr(module, name, function)
+
+    try:
+        with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+            start = time.perf_counter()
+            topologies_dict = main.process_corpus(os.path.join(corpus_dir, "JSONs"),
+                                                  os.path.join(corpus_dir, "Tech_Drawing_JSONs"), num_workers,
+                                                  cache_dir)
+            report_start = time.perf_counter()
+            write_report(topologies_dict)
+            end = time.perf_counter()
+            stage_times["report"] = end - report_start
+    finally:
+        for module, name, function in originals:
+            setattr(module, name, function)
+
+    num_holes = sum(len(hole_group.holes) for topology in topologies_dict.values()
+                    for hole_group in topology.holes_groups)
+    return {"stages": stage_times, "total": end - start, "parts": len(parts_names), "jobs": num_jobs,
+            "holes": num_holes, "json_backend": Json_Backends.current_backend().name}
+
+
+def prepare_corpus(work_dir, num_parts, corpus_settings):
+    """ Generates the corpus of the given size, unless it was already generated with the same settings """
+    corpus_dir = os.path.join(work_dir, f"parts_{num_parts}")
+    manifest_path = os.path.join(corpus_dir, "corpus_manifest.json")
+    settings = dict(corpus_settings, num_parts=num_parts)
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as file:
+            manifest_settings = json.load(file)["settings"]
+        if all(manifest_settings.get(name) == value for name, value in settings.items()):
+            return corpus_dir
+    generate_corpus(corpus_dir, **settings)
+    return corpus_dir
+
+
+def run_benchmark(sizes, work_dir, num_workers=1, repeats=3, use_cache=False, **corpus_settings):
+    """
+    This function benchmarks 'process_corpus' over corpora of several sizes.
+
+    Args:
+        sizes (list):           The corpora sizes - numbers of parts
+        work_dir (str):         The directory the corpora are generated in
+        num_workers (int):      Number of worker processes
+        repeats (int):          Number of runs on each corpus - the fastest one is reported
+        use_cache (bool):       If True, the results cache is used (and warmed up by the first run)
+        corpus_settings:        Passed to 'generate_corpus' (e.g, groups_per_part, holes_per_group, seed)
+
+    Returns:
+        results (list): The result of each corpus size (see 'benchmark_corpus'), with its throughput
+    """
+    results = []
+    for num_parts in sizes:
+        corpus_dir = prepare_corpus(work_dir, num_parts, corpus_settings)
+        cache_dir = os.path.join(corpus_dir, "cache") if use_cache else None
+        best = None
+        for _ in range(max(1, repeats)):
+            result = benchmark_corpus(corpus_dir, num_workers, cache_dir)
+            if best is None or result["total"] < best["total"]:
+                best = result
+        best["size"] = num_parts
+        best["parts_per_sec"] = best["parts"] / best["total"] if best["total"] else 0.0
+        best["holes_per_sec"] = best["holes"] / best["total"] if best["total"] else 0.0
+        results.append(best)
+    return results
+
+
+def print_results(results):
+    """ Prints the results as a table """
+    print(f"{'parts':>7} {'jobs':>8} {'holes':>9} " + " ".join(f"{stage:>9}" for stage in stages) +
+          f" {'total':>9} {'parts/s':>9} {'holes/s':>10}")
+    for result in results:
+        print(f"{result['parts']:>7} {result['jobs']:>8} {result['holes']:>9} " +
+              " ".join(f"{result['stages'][stage]:>9.3f}" for stage in stages) +
+              f" {result['total']:>9.3f} {result['parts_per_sec']:>9.1f} {result['holes_per_sec']:>10.1f}")
+
+
+def compare_to_baseline(results, baseline_results, max_slowdown):
+    """
+    This function compares the throughput (holes/sec) of each corpus size to a baseline.
+
+    Returns:
+        regressions (list): A message for each corpus size that is slower than the baseline by more than max_slowdown
+    """
+    baseline = {result["size"]: result for result in baseline_results}
+    regressions = []
+    for result in results:
+        if result["size"] not in baseline or not baseline[result["size"]]["holes_per_sec"]:
+            continue
+        ratio = result["holes_per_sec"] / baseline[result["size"]]["holes_per_sec"]
+        if ratio < 1 - max_slowdown:
+            regressions.append(f"{result['size']} parts: {result['holes_per_sec']:.1f} holes/s is "
+                               f"{(1 - ratio) * 100:.1f}% slower than the baseline")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks process_corpus over synthetic corpora")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 200], help="numbers of parts")
+    parser.add_argument("--work-dir", default="benchmark_corpora")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--cache", action="store_true", help="use the results cache")
+    parser.add_argument("--json-backend", default="auto", choices=Json_Backends.backend_names,
+                        help="the JSON decoding backend (see 'Json_Backends.py')")
+    parser.add_argument("--groups-per-part", type=int, default=20)
+    parser.add_argument("--holes-per-group", type=int, default=4)
+    parser.add_argument("--mac-pairs", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="save the results to this JSON file")
+    parser.add_argument("--baseline", help="compare the results to a JSON file saved by --output")
+    parser.add_argument("--max-slowdown", type=float, default=0.1,
+                        help="the fraction of holes/sec that may be lost compared to the baseline")
+    args = parser.parse_args()
+
+    print(f"JSON backend: {Json_Backends.select_backend(args.json_backend).name}")
+    benchmark_results = run_benchmark(args.sizes, args.work_dir, args.workers, args.repeats, args.cache,
+                                      groups_per_part=args.groups_per_part, holes_per_group=args.holes_per_group,
+                                      mac_pairs=args.mac_pairs, seed=args.seed)
+    print_results(benchmark_results)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(benchmark_results, file, indent=1)
+    if args.baseline:
+        with open(args.baseline) as file:
+            slowdowns = compare_to_baseline(benchmark_results, json.load(file), args.max_slowdown)
+        for message in slowdowns:
+            print(f"Regression: {message}")
+        if slowdowns:
+            sys.exit(1)
@@ -1,4 +1,9 @@
-from MACs_Conversions import compare_coordinates, compare_geometries
+import sys
+
+import Metrics
+from MACs_Conversions import compare_coordinates, Geometry, GeometryIndex, ParallelCentersIndex, tolerance
+from Report_Writer import TextReportWriter
+from Thread_Standards import resolve_thread_standard
 from Utilities_and_Cosmetics import process_job_name, process_tool_type_name, remove_non_ascii
 import math
 
@@ -20,8 +25,9 @@ class Topology:
     self.topology = topology_type       # String containing topology's name (e.g, CounterBore)
     self.holes_groups = []              # The hole groups that belong to this topology
     self.jobs_orders_dict = dict()      # Used for printing the legend in plots
+    self.geometry_index = GeometryIndex()  # Index of the hole groups by their geometry
 
-  def add_hole_group(self,job, new_coordinates, holes_group_info, part_name):
+  def add_hole_group(self,job, new_coordinates, holes_group_info, part_name, part_registry=None, tool=None):
     """
     This method does the following:
     1 - Creates HoleGroup instance - only if the geometric shape (geom_ShapePoly field in JSON) doesn't exist in that topology.
@@ -32,43 +38,80 @@ class Topology:
       new_coordinates (set): Holds a 3-tuples with the (x,y,z) coordinates of each hole
       holes_group_info (dict): Holds all information about the hole group being processed
       part_name (str): Holds the part name defined by the user
+      part_registry (PartRegistry): If given, the holes the job is performed on are registered in it
+      tool (Tool): The job's tool (see 'ToolRegistry') - parsed from the job if not given
     """
 
-    new_geom_shape = holes_group_info["_geom_ShapePoly"]
+    new_geom_shape = Geometry.from_shape(holes_group_info["_geom_ShapePoly"])  # Built once for the holes group
     job_number = job["job_number"]
     new_group_flag = True
 
-    # Going over on all existing hole groups and check if the "new" geometry shape already exists
-    for existing_group in self.holes_groups:
-      # If true, then geometry shape or its reverse already exists, so just updating number of centers
-      # if compare_geometries(new_geom_shape, existing_group.geom_shape, job_number):
-      if compare_geometries(holes_group_info, existing_group, False) or compare_geometries(holes_group_info, existing_group, True):
-        new_group_flag = False
-        # Going over the centers in the new coordinates in order to update centers
-        for new_center_coordinates in new_coordinates:
-          # Add the new center if he is really new, or he already exists inside the hole group
-          hole_exist_flag, hole_instance = compare_coordinates(new_center_coordinates, existing_group,
-                                                          job["home_number"], existing_group.hole_depth,
-                                                          job_number)
-          # If True, the Hole object already exists - just add the job to that existing Hole instance
-          if hole_exist_flag:
-            hole_instance.add_job(job,holes_group_info)
-          # If False, the hole object does NOT exist - creating a new Hole object, and adding the job
-          else:
-            existing_group.add_hole(job, holes_group_info, new_center_coordinates)
+    # Creating a single Job instance, which is shared by all the holes the job is performed on in this holes group
+    if tool is None:
+      tool = Tool(job['tool'])
+    new_job = Job(job, tool, holes_group_info)
+    if Metrics.enabled:
+      Metrics.count("jobs_created")
+
+    # Going over on all existing hole groups where the "new" geometry shape (or its reverse) already exists
+    for existing_group in self.find_hole_groups(new_geom_shape):
+      # If got here, then geometry shape or its reverse already exists, so just updating number of centers
+      new_group_flag = False
+      # Going over the centers in the new coordinates in order to update centers
+      for new_center_coordinates in new_coordinates:
+        # Add the new center if he is really new, or he already exists inside the hole group
+        hole_exist_flag, hole_instance = compare_coordinates(new_center_coordinates, existing_group,
+                                                        job["home_number"], existing_group.hole_depth,
+                                                        job_number)
+        # If True, the Hole object already exists - just add the job to that existing Hole instance
+        if hole_exist_flag:
+          if Metrics.enabled:
+            Metrics.count("holes_deduplicated")
+          hole_instance.add_job(job, new_job)
+        # If False, the hole object does NOT exist - creating a new Hole object, and adding the job
+        else:
+          hole_instance = existing_group.add_hole(job, new_job, new_center_coordinates)
+        if part_registry is not None:
+          part_registry.add_hole(existing_group, hole_instance)
 
     # If true, then the hole group is new (the geometry shape doesn't exist)
     if new_group_flag:
       # Creating a new instance of HoleGroup
       new_group = HoleGroup(new_geom_shape, holes_group_info, part_name, self)
+      if Metrics.enabled:
+        Metrics.count("holes_groups_created")
 
       # For each hole we create a new Hole instance, and add it to the new hole group
       for new_center_coordinates in new_coordinates:
-        new_group.add_hole(job, holes_group_info, new_center_coordinates)
+        new_group.add_hole(job, new_job, new_center_coordinates)
 
       # Adding the new hole group to the Topology
-      self.holes_groups.append(new_group)
+      self.append_hole_group(new_group)
+      if part_registry is not None:
+        part_registry.add_hole_group(new_group)
+
+
+  def find_hole_groups(self, geometry):
+    """
+    This method returns all the existing hole groups that have the same geometric shape (or its reverse)
+    as the holes group, by their order in the topology.
+    Only the hole groups with a similar geometry fingerprint are compared.
+
+    Args:
+      geometry (Geometry): The geometric shape of the hole group being processed
+    """
+    candidates = self.geometry_index.candidates(geometry)
+    if Metrics.enabled:
+      Metrics.count("candidate_groups_scanned", len(candidates))
+    # Comparing the geometry to all the candidates at once (see 'compare_geometries_batch')
+    return self.geometry_index.matching_groups(geometry, candidates)
+
 
+  def append_hole_group(self, hole_group):
+    """ This method adds a hole group to the topology, and to the geometry index """
+    hole_group.position = len(self.holes_groups)
+    self.geometry_index.add(hole_group.position, hole_group)
+    self.holes_groups.append(hole_group)
 
   # def update_jobs_orders_dict(self):
   #   """
@@ -89,23 +132,44 @@ class HoleGroup:
           but NOT all jobs necessarily were performed on all the holes (E.g, a hole that has a lower tolerance,
           so it has one more job performed on it).
   """
+  __slots__ = ("holes", "geom_shape", "parent_topology", "part_name", "diameter", "hole_depth", "centers_index",
+               "fastener_size", "position", "derived_features")
+
   def __init__(self, geom_shape, holes_group_info, part_name, parent_topology):
     self.holes = {}                              # dict: holds all the holes in that hole group - key is hole coordinates
-    self.centers = set()                         # set:  holds the (x,y,z) coordinates of holes in this hole group
     # self.jobs = []                             # list: holds all the jobs performed on this hole group
     # self.jobs_order = ''                       # str:  holds the order of the jobs
-    self.geom_shape           = geom_shape       # list: holds dicts which specifies the geometric shape of the holes in this hole group
+    self.geom_shape           = geom_shape       # Geometry: the geometric shape of the holes in this hole group
     self.parent_topology      = parent_topology  # Topology: a pointer to the parent topology
     self.part_name            = part_name        # str: the part's name
-    self.diameter             = abs(2*min(item["p0"][0] for item in geom_shape))        # The smallest diameter of the hole
+    self.position             = None             # int: the hole group's index in its topology's 'holes_groups'
+    self.diameter             = abs(2*float(geom_shape.segments[:, Geometry.x0].min()))  # The smallest diameter of the hole
     self.hole_depth           = self.decide_hole_depth(holes_group_info["_geom_depth"]) # Hole's depth
+    self.centers_index        = ParallelCentersIndex(self.hole_depth + tolerance)     # Spatial index of the centers, by parallel home numbers
+    self.derived_features     = None             # GeometryFeatures: computed on first use (see 'geometry_features')
 
     # todo I think I need to move this attribute to Hole class - It can also be infered
     self.fastener_size        = remove_non_ascii(holes_group_info["_fastener_size"])
 
 
+  @property
+  def centers(self):
+    """ The (x,y,z) coordinates of the holes in this hole group, by the order they were added - a view of 'holes' """
+    return self.holes.keys()
+
 
-  def add_hole(self, job, holes_group_info, new_center_coordinates):
+  @property
+  def geometry_features(self):
+    """
+    The ML fields that depend only on the hole group's geometry and topology (counterbore, countersink, segments) -
+    computed once, on first use, and shared by all the holes in this hole group
+    """
+    if self.derived_features is None:
+      self.derived_features = GeometryFeatures(self)
+    return self.derived_features
+
+
+  def add_hole(self, job, new_job, new_center_coordinates):
     """
     This method does the following:
     1 - Creates a new Hole instance, and assign the job to it
@@ -113,17 +177,21 @@ class HoleGroup:
 
     Args:
       job (dict): Holds all information about the job.
-      holes_group_info (dict): Holds all information about the hole group being processed
+      new_job (Job): The Job instance of the job and the hole group being processed
       new_center_coordinates(3-tuple): Holds the (x,y,z) coordinates of this hole
+
+    Returns:
+      new_hole (Hole): The new hole
     """
     # Creating a new Hole instance
     new_hole = Hole(new_center_coordinates, job, self)
     # Assigning the job to the new hole
-    new_hole.add_job(job, holes_group_info)
+    new_hole.add_job(job, new_job)
     # Adding the new_hole to the group
     self.holes[new_center_coordinates] = new_hole
-    # Adding the new coordinates to the group
-    self.centers.add(new_center_coordinates)
+    if Metrics.enabled:
+      Metrics.count("holes_created")
+    return new_hole
 
 
   # def add_xls_info(self, tolerance_type, upper_tolerance, lower_tolerance, material,
@@ -150,143 +218,86 @@ class HoleGroup:
       return geom_depth
     else:
       # If true, then hole does not end in a cone, subtract cone depth from geom_depth
-      first_value = self.geom_shape[-1]["p0"][1]
-      second_value = self.geom_shape[-1]["p1"][1]
+      x0, first_value, x1, second_value = self.geom_shape.segments[-1].tolist()
       return geom_depth - abs(first_value - second_value)
 
 
   def print(self, group_index):
-    """ This method prints selected fields from that hole group """
-    # print(f"Part name: {self.part_name}")
-    print(f"Number of instances in Hole Group {group_index}:  {len(self.centers)}")
-    print(f"Geometry shape: {self.geom_shape}") # Print when checking MACs
-    print(f"Holes centers: {{{', '.join(f'({x}, {y}, {z})' for x, y, z in self.centers)}}}")  # DEBUGGING
-    print(f"Diameter: {self.diameter} | Depth: {round(self.hole_depth, 3)}")
-    # print(f"Depth: {round(self.hole_depth, 3)}")
-
-    print(f"\nEach hole, and the jobs performed on it:")
-    for hole in self.holes.values():
-      print(f"Hole position at {tuple(float(x) for x in hole.center_coordinates)}")
-      # print(f"Hole tolerance type: {hole.tolerance_type} | upper: {hole.upper_tolerance} | lower: {hole.lower_tolerance}") # DEBUGGING
-      # print(f"thread_nominal_diameter: {hole.thread_nominal_diameter} | thread_pitch: {hole.thread_pitch} " # DEBUGGING
-      #       f"| standard: {hole.standard} | thread_depth: {hole.thread_depth}")                             # DEBUGGING
-      # if hole.has_csk:  # DEBUGGING
-      #   print(f"hole has counterSINK")    # DEBUGGING
-      #   print(f"hole.csk_major_dia is: {hole.csk_major_dia}")   # DEBUGGING
-      #   print(f"hole.csk_minor_dia is: {hole.csk_minor_dia}")   # DEBUGGING
-      #   print(f"hole.csk_angle_deg is: {hole.csk_angle_deg}")   # DEBUGGING
-      #
-      # if hole.has_cbore:  # DEBUGGING
-      #   print(f"Hole has counterBORE")  # DEBUGGING
-      #   print(f"hole.cbore_dia is: {hole.cbore_dia}")      # DEBUGGING
-      #   print(f"hole.cbore_depth is: {hole.cbore_depth}")  # DEBUGGING
-
-      if hole.diam_tol_exists:
-        print(f"Diameter tolerance specified is: {hole.diam_tol_plus}+ and {hole.diam_tol_minus}-")
-      else:
-        print(f"Diameter Tolerance is NOT specified")
-      if hole.depth_tol_exists:
-        print(f"Depth tolerance specified is:    {hole.depth_tol_plus}+ and {hole.depth_tol_minus}-")
-      else:
-        print(f"Depth Tolerance is NOT specified")
-      # GD&T related
-      if hole.gdandt_exists:
-        print(f"GD&T tolerance type is:  {hole.gdandt_tol_type}")
-        print(f"GD&T tolerance value is: {hole.gdandt_tol_value}")
-      else:
-        print(f"GD&T is NOT specified")
-      # Context related
-      print(f"material is:             {hole.material}")
-      print(f"surface_finish is:       {hole.surface_finish}")
-      # Thread related
-      if hole.has_thread:
-        print(f"Thread exists, so printing thread info:")
-        print(f"thread_nominal_dia_drawing is: {hole.thread_nominal_dia_drawing}")
-        print(f"thread_pitch_drawing is:       {hole.thread_pitch_drawing}")
-        print(f"thread_depth_drawing is:       {hole.thread_depth_drawing}")
-        # Below is 6H because it is the standard - otherwise, specified in the technical drawing
-        print(f"thread_class_grade is:           {hole.thread_class_grade}")
-
-      print(f"The jobs performed on the hole in the order they were performed:")
-      for i, job in enumerate(hole.jobs):
-        print(f"{i + 1} - {job}")
-      print("________________________________________________")
-    print("                NEW HOLE GROUP                 ")
-    print("*-*-*-*-*-*-*-*-*-*-*-*-*-*-*-*-*-*-*-*-*-*-*-*-")
+    """ This method prints selected fields from that hole group, and its holes (see 'TextReportWriter') """
+    TextReportWriter(sys.stdout).write_hole_group(self.parent_topology, self, group_index)
 
 
 
 
-# Hole class for when I'm going to create a database for my ML model
-class Hole:
+class PartRegistry:
   """
-  An object of this class holds a hole - it's position, tolerance, and jobs performed on it.
+  An object of this class holds the hole groups and holes of a single part - the ones its jobs were performed on.
+  It is used for adding the information of the part's technical drawing only to the part's holes.
+
+  *Note: a hole group may hold holes of several parts (hole groups are shared by geometry), so the registry
+          holds only the part's holes in each hole group.
   """
-  def __init__(self, new_coordinates, job, parent_hole_group):
-    # The next few blocks of parameters are for INTERNAL use
-    self.parent_hole_group = parent_hole_group  # pointer to the hole group which this hole belongs to
-    self.center_coordinates = new_coordinates
-    self.diameter = parent_hole_group.diameter
-    self.hole_depth = parent_hole_group.hole_depth
-    self.jobs = []  # The jobs performed on this hole by the order they were performed
-    self.tolerance_type  = None
-    self.upper_tolerance = None
-    self.lower_tolerance = None
+  def __init__(self, part_name):
+    self.part_name = part_name
+    self.holes_groups = {}  # dict: HoleGroup -> the part's holes in it (dict, key is hole coordinates)
 
-    # Threading attributes deducted from tool parameters
-    self.thread_nominal_diameter = None   # float: Nominal diameter (in mm) of the thread, e.g., 8 for an M8 thread.
-    self.thread_pitch = None              # float: Thread pitch (in mm). E.g., 1.25 for M8x1.25
-    self.standard = None                  # str:   The thread's standard
-    self.thread_depth = None              # float: The depth of the thread
+  def add_hole(self, hole_group, hole):
+    """ This method registers a hole of the part """
+    self.holes_groups.setdefault(hole_group, {})[hole.center_coordinates] = hole
 
-    ###################################################
-    # The parameters below are for machine learning use
-    # Before doing all the fields below, I need to ask Eran (or Tatyana) for some of the fields
-    self.is_thru       = None  # 0/1 - Eran/Tatyana # todo
-    self.main_diameter = None  # float: Nominal bore before any thread (in mm)
-    self.hole_depth    = None  # float: Hole depth for blind. if THRU, set to wall thickness (in mm)
-    # Hole Segments and Segments' length
-    self.mask_seg1 = self.mask_seg2 = self.mask_seg3 = None # list of int: Binary mask - 4 values:  0=missing, 1=present - JSON
-    self.mask_seg4 = self.mask_seg5 = self.mask_seg6 = None # list of int: Binary mask - 4 values:  0=missing, 1=present - JSON
-    self.seg1_len = self.seg2_len = self.seg3_len    = None # float: Length of the segment (in mm)
-    self.seg4_len = self.seg5_len = self.seg6_len    = None # float: Length of the segment (in mm)
-    # Diameter Tolerance Related
-    self.diam_tol_exists   = 0     # int: 1/0, indicates if there's a diameter tolerance specified in the drawing
-    self.diam_tol_plus     = None  # float: Hole DIAMETER minus tolerance (in mm)
-    self.diam_tol_minus    = None  # float: Hole DIAMETER plus tolerance (in mm)
-    # Depth Tolerance Related
-    self.depth_tol_exists  = 0     # int: 1/0, indicates if there's a depth tolerance specified in the drawing
-    self.depth_tol_plus    = None  # float: Hole DEPTH plus tolerance (in mm)
-    self.depth_tol_minus   = None  # float: Hole DEPTH minus tolerance (in mm)
-    # GD&T related
-    self.gdandt_exists     = 0     # int: 1/0, indicates if there's a GD&T specified in the drawing
-    self.gdandt_tol_type   = None  # String: The GD&T tolerance type - I should change it to binary mask # todo
-    self.gdandt_tol_value  = None  # float: Tolerance value of the GD&T (special tolerance) (in mm)
-    # Context related
-    self.material          = None  # String: The material - should be categorical index or learned embedding # todo
-    self.surface_finish = None  # in micro meters - technical drawing
-    # Thread related
-    self.has_thread = 0                        # Int: 0/1
-    self.thread_nominal_dia_drawing = None  # float: Thread's nominal diameter in the drawing (in mm) (E.g., 3 for M3)
-    self.thread_pitch_drawing       = None  # float: Thread's pitch diameter in the drawing (in mm) (E.g., 0.25 for M2X0.25) - perhaps deduced
-    self.thread_depth_drawing       = None  # float: Thread's depth in the drawing (in mm) - perhaps deduced
-    # self.thread_depth_drawing = None  # in mm - engagement length; if THRU ALL, set to wall thickness - technical drawing # todo
-    # Below is 6H because it is the standard - otherwise, specified in the technical drawing
-    self.thread_class_grade = None  # String: Thread's class grade (E.g., 6 for 6H or 6g)
+  def add_hole_group(self, hole_group):
+    """ This method registers all the holes of a hole group """
+    for hole in hole_group.holes.values():
+      self.add_hole(hole_group, hole)
+
+  def holes(self):
+    """ Returns all the holes of the part """
+    return [hole for holes in self.holes_groups.values() for hole in holes.values()]
+
+  def part_holes(self, hole_group):
+    """ Returns the part's holes in a hole group, by their order in the hole group """
+    holes = self.holes_groups.get(hole_group, {})
+    # Going over the centers only, so the holes of other parts that were spilled are not loaded (see 'Spill_Store.py')
+    return [holes[center] for center in hole_group.holes if center in holes]
+
+  def sorted_holes_groups(self, topologies_dict):
+    """ Returns the part's hole groups by their order in the topologies dictionary """
+    topologies_order = {topology_mask: i for i, topology_mask in enumerate(topologies_dict)}
+    return sorted(self.holes_groups, key=lambda hole_group: (
+      topologies_order[hole_group.parent_topology.topology_mask], hole_group.position))
 
-    # Counter Sink (ALSO CHAMFER) related
+
+class GeometryFeatures:
+  """
+  An object of this class holds the ML fields of the holes in a hole group that depend only on the hole group's
+  geometric shape and topology - the counterbore and countersink parameters, and the segments' masks and lengths.
+  It is computed once per hole group (see 'HoleGroup.geometry_features'), and the holes access its fields as their
+  own attributes (e.g, 'hole.has_csk').
+  """
+  __slots__ = ("has_cbore", "cbore_dia", "cbore_depth", "has_csk", "csk_major_dia", "csk_minor_dia", "csk_angle_deg",
+               "mask_segs", "segments_len")
+
+  def __init__(self, hole_group):
+    # Counter Bore related attributes
+    self.has_cbore     = 0     # int: 0/1
+    self.cbore_dia     = None  # double: Counterbore outer diameter (in mm)
+    self.cbore_depth   = None  # double: Counterbore depth (in mm)
+    # Counter Sink (ALSO CHAMFER) related attributes
     self.has_csk       = 0     # int: 0/1
     self.csk_major_dia = None  # double: Countersink major diameter (in mm)
     self.csk_minor_dia = None  # double: Countersink minor diameter (in mm)
     self.csk_angle_deg = None  # double: Countersink angle (in degrees)
-    # Counter Bore related
-    self.has_cbore     = 0     # int: 0/1
-    self.cbore_dia     = None  # double: Counterbore outer diameter (in mm)
-    self.cbore_depth   = None  # double: Counterbore depth (in mm)
+    # Hole Segments and Segments' length - accessed by 'mask_seg1'...'mask_seg6' and 'seg1_len'...'seg6_len'
+    self.mask_segs     = None  # list of 6 lists of int: Binary masks - 4 values:  0=missing, 1=present - JSON
+    self.segments_len  = None  # list of 6 floats: Length of each segment (in mm)
 
-    self.decide_params() # Filling all the attributes
+    mask = str(hole_group.parent_topology.topology_mask)
+    segments = hole_group.geom_shape.segments.tolist()   # The (x0, y0, x1, y1) of each segment
+    self.decide_cbore_params(mask, segments)      # Filling attributes of counterBORE related parameters
+    self.decide_csink_params(mask, segments)      # Filling attributes of counterSINK related parameters
+    self.decide_mask_and_segments(mask, segments) # Filling the mask and segments attributes
 
-  def decide_csink_params(self):
+  def decide_csink_params(self, mask, segments):
     """
     This method fills the fields for the counter sink OR chamfer related parameters.
 
@@ -294,32 +305,29 @@ class Hole:
     it regards a cone as a chamfer or as a countersink.
     In order to deal with that, I'm referring both cases as countersink
     """
-    mask = str(self.parent_hole_group.parent_topology.topology_mask)
-    geom_shape = self.parent_hole_group.geom_shape[0]
+    x0, y0, x1, y1 = segments[0]
     # check if the hole start with a cone: 3 for conic, 4 for chamfer
     if mask[-1] == "3" or mask[-1] == "4":
       self.has_csk = 1
-      self.csk_major_dia = abs(geom_shape["p0"][0] * 2)
-      self.csk_minor_dia = abs(geom_shape["p1"][0] * 2)
+      self.csk_major_dia = abs(x0 * 2)
+      self.csk_minor_dia = abs(x1 * 2)
 
       # Computing the countersink angle in degree - using arctan
-      opp = abs(geom_shape["p0"][0] - geom_shape["p1"][0])
-      adj = abs(geom_shape["p0"][1] - geom_shape["p1"][1])
+      opp = abs(x0 - x1)
+      adj = abs(y0 - y1)
       angle_deg = math.degrees(math.atan(opp / adj))
       self.csk_angle_deg = round(angle_deg*2)
 
-  def decide_cbore_params(self):
+  def decide_cbore_params(self, mask, segments):
     """ This method fills the fields for the counter boring related parameters """
-    mask = str(self.parent_hole_group.parent_topology.topology_mask)
-
     # Deciding if there is a counterbore by the mask
     if len(mask)>2 and mask[-1]=="2" and mask[-2]=='1':
       self.has_cbore = 1
-      geom_shape = self.parent_hole_group.geom_shape[0]
-      self.cbore_dia = geom_shape["p0"][0] * 2
-      self.cbore_depth = abs(geom_shape["p0"][1] - geom_shape["p1"][1])
+      x0, y0, x1, y1 = segments[0]
+      self.cbore_dia = x0 * 2
+      self.cbore_depth = abs(y0 - y1)
 
-  def decide_mask_and_segments(self):
+  def decide_mask_and_segments(self, mask, segments):
     """
     This method does two things:
     1 - One-hot encoding of the topology's mask
@@ -327,127 +335,271 @@ class Hole:
     """
     ### 1 - One-hot encoding ###
     # Get the reversed string
-    mask_str = str(self.parent_hole_group.parent_topology.topology_mask)[::-1]
+    mask_str = mask[::-1]
 
     # Create one-hot vectors for existing digits - Creates [0,0,0,0] if digit is out of 1-4 range
     mask_segs = [[1 if i == int(d) - 1 else 0 for i in range(4)] for d in mask_str]
 
     # Pad with empty [0,0,0,0] vectors to ensure length of 6 vectors
     mask_segs += [[0, 0, 0, 0]] * (6 - len(mask_segs))
-    self.mask_seg1, self.mask_seg2, self.mask_seg3, self.mask_seg4, self.mask_seg5, self.mask_seg6 = mask_segs
+    self.mask_segs = mask_segs
 
     ### 2 - Computing segments' length ###
-    geom_shape = self.parent_hole_group.geom_shape
     # Compute segments' lengths, and rounding to 2 numbers after the decimal point
-    segments_len = [round(math.dist(s['p0'], s['p1']), 2) for s in geom_shape]
+    segments_len = [round(math.dist((x0, y0), (x1, y1)), 2) for x0, y0, x1, y1 in segments]
 
     # Pad with zeros to ensure exactly 6 elements
     segments_len += [0] * (6 - len(segments_len))
-    self.seg1_len, self.seg2_len, self.seg3_len, self.seg4_len, self.seg5_len, self.seg6_len = segments_len
+    self.segments_len = segments_len
+
+
+class FeatureBlock:
+  """
+  Base class of the optional feature blocks of a hole (thread, tolerances, GD&T).
+  A hole allocates a block only when one of its fields gets a value different from its default, so holes
+  without that feature don't pay for its fields. The fields are accessed through the hole (e.g, 'hole.cbore_dia').
+  """
+  __slots__ = ()
+  defaults = {}  # dict: the default value of each field - returned by the hole if the block wasn't allocated
+
+  def __init__(self):
+    for field, default in self.defaults.items():
+      setattr(self, field, default)
+
+
+class ThreadFeatures(FeatureBlock):
+  """ Thread related attributes - deducted from tool parameters, and from the technical drawing """
+  __slots__ = ("thread_nominal_diameter", "thread_pitch", "standard", "thread_depth", "has_thread",
+               "thread_nominal_dia_drawing", "thread_pitch_drawing", "thread_depth_drawing", "thread_class_grade")
+  defaults = {
+    "thread_nominal_diameter": None,     # float: Nominal diameter (in mm) of the thread, e.g., 8 for an M8 thread.
+    "thread_pitch": None,                # float: Thread pitch (in mm). E.g., 1.25 for M8x1.25
+    "standard": None,                    # str:   The thread's standard
+    "thread_depth": None,                # float: The depth of the thread
+    "has_thread": 0,                     # Int: 0/1
+    "thread_nominal_dia_drawing": None,  # float: Thread's nominal diameter in the drawing (in mm) (E.g., 3 for M3)
+    "thread_pitch_drawing": None,        # float: Thread's pitch diameter in the drawing (in mm) (E.g., 0.25 for M2X0.25) - perhaps deduced
+    "thread_depth_drawing": None,        # float: Thread's depth in the drawing (in mm) - perhaps deduced
+    # Below is 6H because it is the standard - otherwise, specified in the technical drawing
+    "thread_class_grade": None,          # String: Thread's class grade (E.g., 6 for 6H or 6g)
+  }
+
+
+class DiameterToleranceFeatures(FeatureBlock):
+  """ Diameter Tolerance related attributes """
+  __slots__ = ("diam_tol_exists", "diam_tol_plus", "diam_tol_minus")
+  defaults = {
+    "diam_tol_exists": 0,     # int: 1/0, indicates if there's a diameter tolerance specified in the drawing
+    "diam_tol_plus": None,    # float: Hole DIAMETER plus tolerance (in mm)
+    "diam_tol_minus": None,   # float: Hole DIAMETER minus tolerance (in mm)
+  }
 
 
-  def decide_params(self):
-    """ This method fills the fields for the ML model database"""
-    self.main_diameter = self.parent_hole_group.diameter
-    self.hole_depth = self.parent_hole_group.hole_depth
+class DepthToleranceFeatures(FeatureBlock):
+  """ Depth Tolerance related attributes """
+  __slots__ = ("depth_tol_exists", "depth_tol_plus", "depth_tol_minus")
+  defaults = {
+    "depth_tol_exists": 0,    # int: 1/0, indicates if there's a depth tolerance specified in the drawing
+    "depth_tol_plus": None,   # float: Hole DEPTH plus tolerance (in mm)
+    "depth_tol_minus": None,  # float: Hole DEPTH minus tolerance (in mm)
+  }
 
-    self.decide_cbore_params()      # Filling attributes of counterBORE related parameters
-    self.decide_csink_params()      # Filling attributes of counterSINK related parameters
-    self.decide_mask_and_segments() # Filling the mask and segments attributes
 
+class GDandTFeatures(FeatureBlock):
+  """ GD&T related attributes """
+  __slots__ = ("gdandt_exists", "gdandt_tol_type", "gdandt_tol_value")
+  defaults = {
+    "gdandt_exists": 0,        # int: 1/0, indicates if there's a GD&T specified in the drawing
+    "gdandt_tol_type": None,   # String: The GD&T tolerance type - I should change it to binary mask # todo
+    "gdandt_tol_value": None,  # float: Tolerance value of the GD&T (special tolerance) (in mm)
+  }
 
 
-  def add_job(self, job, holes_group_info):
+def feature_property(block_slot, block_class, field):
+  """
+  This function creates a property of a hole for a field of one of its feature blocks.
+  Getting the field returns its default value if the block wasn't allocated, and setting it allocates the block
+  only if the value isn't the default one.
+
+  Args:
+    block_slot (str):   The hole's attribute which holds the block (e.g, "thread")
+    block_class (type): The block's class (e.g, ThreadFeatures)
+    field (str):        The field's name
+  """
+  default = block_class.defaults[field]
+
+  def getter(hole):
+    block = getattr(hole, block_slot)
+    return default if block is None else getattr(block, field)
+
+  def setter(hole, value):
+    block = getattr(hole, block_slot)
+    if block is None:
+      if value is default or (default is not None and value == default):
+        return
+      block = block_class()
+      setattr(hole, block_slot, block)
+    setattr(block, field, value)
+
+  return property(getter, setter)
+
+
+# Hole class for when I'm going to create a database for my ML model
+class Hole:
+  """
+  An object of this class holds a hole - it's position, tolerance, and jobs performed on it.
+
+  *Note: in order to keep holes small, the attributes of features that most holes don't have (thread, tolerances,
+          GD&T) are kept in feature blocks that are allocated only when needed.
+          Accessing them is done as usual (e.g, 'hole.has_thread') - see 'feature_property'.
+          The attributes that depend only on the hole group's geometry (counterbore, countersink, segments) are
+          not kept in the hole at all - they are taken from the hole group (see 'GeometryFeatures').
+  """
+  __slots__ = ("parent_hole_group", "center_coordinates", "jobs", "jobs_by_key", "tolerance_type", "upper_tolerance",
+               "lower_tolerance", "is_thru", "material", "surface_finish",
+               "thread", "diam_tol", "depth_tol", "gdandt")
+
+  # The feature blocks - the hole's attribute that holds each block, and the block's class
+  feature_blocks = {"thread": ThreadFeatures, "diam_tol": DiameterToleranceFeatures,
+                    "depth_tol": DepthToleranceFeatures, "gdandt": GDandTFeatures}
+
+  # Above this number of jobs, the jobs on the hole are indexed by their identity keys (see 'add_job')
+  jobs_index_threshold = 4
+
+  def __init__(self, new_coordinates, job, parent_hole_group):
+    # The next few blocks of parameters are for INTERNAL use
+    self.parent_hole_group = parent_hole_group  # pointer to the hole group which this hole belongs to
+    self.center_coordinates = new_coordinates
+    self.jobs = []  # The jobs performed on this hole by the order they were performed
+    self.jobs_by_key = None  # The jobs in 'self.jobs' by their identity keys - for finding repeated jobs in O(1)
+    self.tolerance_type  = None
+    self.upper_tolerance = None
+    self.lower_tolerance = None
+
+    # Feature blocks - None until the hole has that feature (see 'feature_property')
+    self.thread = self.diam_tol = self.depth_tol = self.gdandt = None
+
+    ###################################################
+    # The parameters below are for machine learning use
+    # Before doing all the fields below, I need to ask Eran (or Tatyana) for some of the fields
+    # *Note: 'main_diameter' (Nominal bore before any thread) and 'hole_depth' (Hole depth for blind. if THRU,
+    #         set to wall thickness) are taken from the parent hole group
+    self.is_thru       = None  # 0/1 - Eran/Tatyana # todo
+    # Context related
+    self.material          = None  # String: The material - should be categorical index or learned embedding # todo
+    self.surface_finish = None  # in micro meters - technical drawing
+
+  @property
+  def diameter(self):
+    return self.parent_hole_group.diameter
+
+  @property
+  def main_diameter(self):
+    return self.parent_hole_group.diameter
+
+  @property
+  def hole_depth(self):
+    return self.parent_hole_group.hole_depth
+
+  def add_job(self, job, new_job):
     """
     This method assigns a job to a hole.
 
     Args:
       job (dict): Holds all information about the job.
-      holes_group_info (dict): Holds all information about the hole group being processed
+      new_job (Job): The Job instance of the job - shared by all the holes it is performed on in the holes group,
+                     so it should not be changed
     """
-
-    tool_type = process_tool_type_name(job['tool']['tool_type'])  # Cosmetics
-
-    new_job = Job(job, tool_type, holes_group_info)               # Creating a new Job instance
-    self.decide_thread_params(job)                                # Filling the thread parameters for relevant jobs
-
-    # Checking if this job is really new - acting as a fail-safe mechanism
-    new_job_flag = True
-    for existing_job in self.jobs:
-      if new_job == existing_job:
-        new_job_flag = False
-
-    # Adding the job only it's new
-    if new_job_flag:
-      self.jobs.append(new_job)
+    self.decide_thread_params(new_job)                            # Filling the thread parameters for relevant jobs
+
+    # Checking if this job is really new - acting as a fail-safe mechanism.
+    # Holes with only a few jobs just go over them (comparing is fast - see 'Job.__eq__'),
+    # and holes with more jobs index them by their identity keys
+    if self.jobs_by_key is None:
+      if new_job in self.jobs:
+        if Metrics.enabled:
+          Metrics.count("jobs_deduplicated")
+        return
+      if len(self.jobs) >= self.jobs_index_threshold:
+        self.jobs_by_key = {}
+        for existing_job in self.jobs:
+          self.jobs_by_key.setdefault(existing_job.identity_key, []).append(existing_job)
+    if self.jobs_by_key is not None:
+      same_key_jobs = self.jobs_by_key.setdefault(new_job.identity_key, [])
+      if new_job in same_key_jobs:
+        if Metrics.enabled:
+          Metrics.count("jobs_deduplicated")
+        return
+      same_key_jobs.append(new_job)
+
+    # Adding the job, and indexing the hole under the home numbers parallel to the job's MAC
+    if Metrics.enabled:
+      Metrics.count("jobs_added")
+    self.jobs.append(new_job)
+    self.parent_hole_group.centers_index.add(self.center_coordinates, new_job.parallel_home_numbers)
 
 
   def decide_thread_params(self, job):
     """
     This function infers the thread parameters by looking at the tool parameters.
 
-    *Note: for now, I'm comparing only to the ISO Metric standard.
+    *Note: the thread's standard is resolved by the tool's diameter and pitch (see 'resolve_thread_standard').
 
     Args:
-      job (dict): Holds all information about the job.
+      job (Job): The job performed on the hole - its tool was already parsed (see 'Tool')
     """
-    # Known ISO Metric thread table (coarse and fine pitches)
-    metric_threads = {
-      1.2: [0.25], 1.4: [0.3], 1.6: [0.35], 2.0: [0.4], 2.2: [0.45], 2.5: [0.45], 3.0: [0.5], 3.5: [0.6], 4.0: [0.7],
-      5.0: [0.8], 6.0: [1.0], 7.0: [1.0], 8.0: [1.25, 1.0], 10.0: [1.5, 1.25, 1.0], 12.0: [1.75, 1.5, 1.25],
-      14.0: [2.0, 1.5], 16.0: [2.0, 1.5], 18.0: [2.5, 2.0, 1.5], 20.0: [2.5, 2.0, 1.5], 22.0: [2.5, 2.0, 1.5],
-      24.0: [3.0, 2.0], 27.0: [3.0, 2.0], 30.0: [3.5, 2.0], 33.0: [3.5, 2.0], 36.0: [4.0, 3.0], 39.0: [4.0, 3.0, 2.0],
-      42.0: [4.5, 3.0], 45.0: [4.5], 48.0: [5.0], 52.0: [5.0, 3.0], 56.0: [5.5, 4.0], 60.0: [5.5, 4.0],
-      64.0: [6.0, 4.0], 68.0: [6.0], 72.0: [6.0, 4.0], 80.0: [6.0, 4.0], 90.0: [6.0, 4.0], 100.0: [6.0, 4.0]
-    }
-
-    # Initialize
-    thread_flag = False
-    thread_or_tap = None
-    unit = None
+    tool = job.tool
 
     # Choose which diameter parameter we're looking at - according to Thread Mill or Drill with Tap tool
-    if job["type"] == "NC_THREAD":
+    if job.job_type == "NC_THREAD":
       thread_or_tap = True
-      thread_flag = True
-    elif job["type"] == "NC_DRILL" and job["tool"]["tool_type"] == "TOOL_TAP_MILL":
+    elif job.job_type == "NC_DRILL" and tool.tool_type == "TOOL_TAP_MILL":
       thread_or_tap = False
-      thread_flag = True
-
-    # If thread_flag is False, then it's not Thread Milling or Drill with Tap
-    if not thread_flag:
+    # If got here, then it's not Thread Milling or Drill with Tap
+    else:
       return
+
+    # Finding thread's depth value
+    if job.job_depth >= self.parent_hole_group.hole_depth:
+      # True if job's depth is greater (or equal) than the hole's depth
+      self.thread_depth = self.parent_hole_group.hole_depth
     else:
-      # Finding thread's depth value
-      if job.get("job_depth") >= self.parent_hole_group.hole_depth:
-        # True if job's depth is greater (or equal) than the hole's depth
-        self.thread_depth = self.parent_hole_group.hole_depth
-      else:
-        # True if job's depth is lesser than the hole's depth
-        self.thread_depth = job["job_depth"]
+      # True if job's depth is lesser than the hole's depth
+      self.thread_depth = job.job_depth
+
+    # Tap tool's head has a chamfer, so I subtract its value from the thread's depth
+    if not thread_or_tap:
+      for chamfer_length in tool.chamfer_lengths:
+        self.thread_depth -= chamfer_length
+
+    # Thread's nominal diameter, its units (mm/inch), and pitch
+    unit = None
+    diameter, diameter_unit = (tool.major_diameter, tool.major_diameter_unit) if thread_or_tap else \
+                              (tool.diameter, tool.diameter_unit)
+    if diameter_unit is not None:
+      self.thread_nominal_diameter = diameter
+      unit = diameter_unit
+    if tool.pitch is not None:
+      self.thread_pitch = tool.pitch
+
+    # Finding thread's standard - checking if diameter and pitch match the ISO Metric, UNC or UNF tables
+    standard = resolve_thread_standard(self.thread_nominal_diameter, self.thread_pitch, unit)
+    if standard is not None:
+      self.standard = standard
 
-      # Extract length parameters
-      diam_type = "MajorDiameter" if thread_or_tap else "D"
-      for param in job["tool"]["lengthParameters"]:
-        # Tap tool's head has a chamfer, so I subtract its value from the thread's depth
-        if not thread_or_tap and param["name"] == "Ch.L":
-          # True if it's Drill with Tap
-          self.thread_depth -= param["value"]
-        if param["name"] == diam_type:
-          self.thread_nominal_diameter = param["value"]   # Finding thread's nominal diameter value
-          unit = param["unit"]                            # Finding the units - mm/inch
-        elif param["name"] == "Pitch":
-          self.thread_pitch = param["value"]              # Finding thread's pitch value
 
-      # Finding thread's standard - checking if diameter and pitch matches ISO Metric table
-      if unit == "mm":
-        for dia, pitches in metric_threads.items():
-          if abs(self.thread_nominal_diameter - dia) < 0.2:  # Allow small tolerance
-            for p in pitches:
-              if abs(self.thread_pitch - p) < 0.05:          # Allow small tolerance
-                self.standard = f"M{dia}_x_{self.thread_pitch}"
 
 
+# Accessing the fields of the feature blocks, the hole group's geometry features, and the masks and lengths of the
+# segments, as attributes of the hole
+for _block_slot, _block_class in Hole.feature_blocks.items():
+  for _field in _block_class.__slots__:
+    setattr(Hole, _field, feature_property(_block_slot, _block_class, _field))
+for _field in GeometryFeatures.__slots__:
+  setattr(Hole, _field, property(lambda hole, field=_field: getattr(hole.parent_hole_group.geometry_features, field)))
+for _i in range(6):
+  setattr(Hole, f"mask_seg{_i + 1}", property(lambda hole, i=_i: hole.mask_segs[i]))
+  setattr(Hole, f"seg{_i + 1}_len", property(lambda hole, i=_i: hole.segments_len[i]))
 
 
 ## Old hole class
@@ -572,17 +724,92 @@ class Hole:
 
 
 
+class Tool:
+  """
+  An object of this class holds the parameters of a tool that the processing needs - decoded once from the tool's
+  JSON (the job's "tool" field), and shared by all the jobs that use the same tool (see 'ToolRegistry').
+  Tools are equal if their JSONs are equal.
+  """
+  __slots__ = ("tool_parameters", "tool_type", "tool_type_name", "angle", "diameter", "diameter_unit",
+               "major_diameter", "major_diameter_unit", "pitch", "chamfer_lengths")
+
+  def __init__(self, tool_parameters):
+    self.tool_parameters = tool_parameters                         # dict: The tool's JSON - used only for comparing
+    self.tool_type = tool_parameters["tool_type"]                  # str: Tool's type in SolidCAM (e.g, TOOL_TAP_MILL)
+    self.tool_type_name = process_tool_type_name(self.tool_type)   # str: Cosmetics (e.g, Tap_Mill)
+    self.angle = 0                    # float: The tool's head angle ("A") - 0 if it isn't specified
+    self.diameter = None              # float: The tool's diameter ("D")
+    self.diameter_unit = None         # str:   The unit of the tool's diameter - mm/inch
+    self.major_diameter = None        # float: The thread mill's major diameter ("MajorDiameter")
+    self.major_diameter_unit = None   # str:   The unit of the thread mill's major diameter - mm/inch
+    self.pitch = None                 # float: The thread's pitch ("Pitch")
+    self.chamfer_lengths = []         # list of float: The lengths of the tap's head chamfer ("Ch.L")
+
+    # Going over the length parameters once - when a parameter appears more than once, the last one is used
+    for param in tool_parameters["lengthParameters"]:
+      name = param["name"]
+      if name == "A":
+        self.angle = param["value"]
+      elif name == "D":
+        self.diameter, self.diameter_unit = param["value"], param["unit"]
+      elif name == "MajorDiameter":
+        self.major_diameter, self.major_diameter_unit = param["value"], param["unit"]
+      elif name == "Pitch":
+        self.pitch = param["value"]
+      elif name == "Ch.L":
+        self.chamfer_lengths.append(param["value"])
+    # The head angle in the (non-length) parameters is preferred
+    for param in tool_parameters["parameters"]:
+      if param["name"] == "A":
+        self.angle = param["value"]
+
+  def __eq__(self, other):
+    if not isinstance(other, Tool):
+      return NotImplemented
+    return self is other or self.tool_parameters == other.tool_parameters
+
+  def __hash__(self):
+    return hash((self.tool_type, self.angle, self.diameter, self.major_diameter, self.pitch))
+
+  def __repr__(self):
+    return f"Tool({self.tool_type_name})"
+
+
+class ToolRegistry:
+  """
+  An object of this class holds the tools of a single part - each distinct tool is decoded once (see 'Tool'),
+  no matter how many jobs, hole groups and holes it is used on.
+
+  *Note: the tools are identified by their dicts - the jobs of a part that use the same tool share the same dict
+          (see 'read_json_jobs'), so finding a job's tool doesn't go over its JSON at all.
+  """
+  def __init__(self):
+    self.tools = {}  # dict: id of the tool's dict -> Tool (which also keeps the dict alive, so the id isn't reused)
+
+  def tool(self, tool_parameters):
+    """ Returns the Tool of a tool's dict (the job's "tool" field) - decodes it only the first time it's seen """
+    tool = self.tools.get(id(tool_parameters))
+    if tool is None:
+      tool = self.tools[id(tool_parameters)] = Tool(tool_parameters)
+      if Metrics.enabled:
+        Metrics.count("tools_parsed")
+    return tool
+
+
 class Job:
   """
   An object of this class holds a job that is done on a hole.
   Each field holds the json's field with the same name.
+
+  *Note: a single instance is created for each job and holes group, and it's shared by all the holes the job is
+          performed on - so it should not be changed after it is created.
   """
-  def __init__(self, job, tool_type, holes_group_info):
+  def __init__(self, job, tool, holes_group_info):
     self.job_number = job["job_number"]           # Job's index in SolidCAM
     self.job_name = job['name']                   # Job name as defined by the user
     self.job_type = job['type']                   # Technology used (e.g, 2_5D_Drilling)
-    self.tool_type = tool_type                    # Tool being used (e.g, End Mill)
-    self.tool_parameters = job['tool']            # Tool parameters
+    self.tool_type = tool.tool_type_name          # Tool being used (e.g, End Mill)
+    self.tool = tool                              # Tool parameters (Tool) - shared by the jobs that use the same tool
     self.job_depth = job['job_depth']             # How deep the tool goes in, NOT taking into account the tool's tip
     self.tool_depth = None                        # How deep the tool goes in, taking into account the tool's tip
     self.thread_mill_params = job["thread_mill"]  # Thread Milling parameters - not None only on this job
@@ -601,12 +828,33 @@ class Job:
 
     self.decide_drill_params(job, holes_group_info) # Assign drill-related attributes depending on job type
     self.compute_tool_depth()  # How deep the tool goes in, taking into account the tool's tip
+    self.identity_key = self.compute_identity_key()  # Identifies the job by its scalar attributes
+
+  def compute_identity_key(self):
+    """
+    This method computes a key that identifies the job - the job number and all its scalar attributes.
+    Jobs with different keys are different, so only jobs with the same key need to be compared attribute by attribute.
+
+    Returns:
+      identity_key (tuple): The job's identity key
+    """
+    parallel_home_numbers = self.parallel_home_numbers
+    if isinstance(parallel_home_numbers, list):
+      parallel_home_numbers = tuple(parallel_home_numbers)
+    return (self.job_number, self.job_name, self.job_type, self.tool_type, self.job_depth, self.tool_depth,
+            self.home_number, parallel_home_numbers, self.drill_cycle_type, self.drill_gcode_name, self.cycle_is_using,
+            self.depth_diameter_value, self.depth_type)
 
   def __eq__(self, other):
     """ Compare two Job objects by checking if all their attributes are identical. """
     if not isinstance(other, Job):
       return NotImplemented
-    return self.__dict__ == other.__dict__
+    if self is other:
+      return True
+    return self.identity_key == other.identity_key and self.__dict__ == other.__dict__
+
+  def __hash__(self):
+    return hash(self.identity_key)
 
   def __repr__(self):
     """ Used for printing - Returns a string with Job type, Tool type, Job name and Job number """
@@ -680,16 +928,10 @@ class Job:
     tool depth = job depth + tip depth
     """
 
-    tool_angle = 0
     tool_depth = 0
 
-    # Saving the tool's head angle
-    for param in self.tool_parameters["lengthParameters"]:
-      if param["name"] == "A":
-        tool_angle = param["value"]
-    for param in self.tool_parameters["parameters"]:
-      if param["name"] == "A":
-        tool_angle = param["value"]
+    # The tool's head angle
+    tool_angle = self.tool.angle
 
 
     # True if the job is one of the drilling jobs
@@ -0,0 +1,102 @@
+import json
+
+"""
+The JSON decoding backends - how the parts' and the technical drawings' JSON files are read and decoded.
+
+The backends:
+    "stdlib" - The standard library's json module - always available. The parts' jobs are streamed by 'read_json_jobs'
+               (Utilities_and_Cosmetics.py), which decodes only the relevant jobs and fields.
+    "orjson" - The orjson package, if it's installed. It decodes a whole part much faster than streaming it, so the part
+               is decoded at once and the relevant jobs and fields are taken from it - the whole part is held in
+               memory while its jobs are read.
+    "auto"   - The fastest backend that is installed.
+
+A backend that isn't installed falls back to the stdlib. A JSON that the backend can't decode (e.g, NaN values, or
+integers above 64 bits for orjson) is decoded again by the stdlib, so the results are always the stdlib's.
+
+The files are decoded as UTF-8 (the encoding of JSON).
+
+The backend is selected per run (see 'select_backend'), and is reported in the run's metrics (see 'Metrics.py').
+"""
+
+backend_names = ["auto", "stdlib", "orjson"]
+
+
+class JsonBackend:
+    """
+    A JSON decoding backend.
+    If 'decodes_whole' is True, the parts' JSON files are decoded at once (instead of streaming their jobs).
+    """
+    def __init__(self, name, loads, dumps=None, decodes_whole=False):
+        self.name = name
+        self.loads_function = loads
+        self.dumps = dumps                  # Encodes a value - the key of the shared tools (see 'read_json_jobs')
+        self.decodes_whole = decodes_whole
+
+    def loads(self, data):
+        """ Decodes a JSON document (str or bytes) - by the stdlib, if the backend can't decode it """
+        try:
+            return self.loads_function(data)
+        except ValueError:
+            if self is stdlib_backend:
+                raise
+            return json.loads(data)
+
+
+stdlib_backend = JsonBackend("stdlib", json.loads)
+
+
+def load_orjson_backend():
+    """ Returns the orjson backend, or None if orjson isn't installed """
+    try:
+        import orjson
+    except ImportError:
+        return None
+    return JsonBackend("orjson", orjson.loads, orjson.dumps, decodes_whole=True)
+
+
+# The backends that may be installed, by their preference - the name -> a function that returns the backend (or None)
+optional_backends = {"orjson": load_orjson_backend}
+
+# The selected backend - see 'select_backend'
+backend = None
+
+
+def select_backend(backend_name="auto"):
+    """
+    This function selects the JSON backend of the run.
+
+    Args:
+        backend_name (str): "auto", "stdlib" or "orjson" - the stdlib is used if the backend isn't installed
+
+    Returns:
+        backend (JsonBackend): The selected backend
+    """
+    global backend
+    if backend_name not in backend_names:
+        raise ValueError(f"Unknown JSON backend: {backend_name} (expected one of {backend_names})")
+    backend = None
+    for name, load_backend in optional_backends.items():
+        if backend_name in ("auto", name):
+            backend = load_backend()
+            if backend is not None:
+                break
+    if backend is None:
+        backend = stdlib_backend
+    return backend
+
+
+def current_backend():
+    """ Returns the selected backend - "auto" if none was selected """
+    return backend if backend is not None else select_backend()
+
+
+def read_file(file_path):
+    """ Returns the content of a file (bytes) """
+    with open(file_path, 'rb') as file:
+        return file.read()
+
+
+def load_file(file_path):
+    """ Reads and decodes a whole JSON file with the selected backend """
+    return current_backend().loads(read_file(file_path))
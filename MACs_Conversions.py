@@ -1,10 +1,18 @@
+import math
+
 import numpy as np
 
+import Metrics
+
 # Used in order to compare between coordinates of centers of holes.
 # It is required because the field "_tech_positions" values should be equal to the field 'vals'
 # values, but they are only approximately close.
 tolerance = 0.1
 
+# The minimal number of candidates that are compared to a geometry at once (see 'compare_geometries_batch') - fewer
+# candidates are compared one by one
+batch_min_candidates = 4
+
 
 def rotation_translation(home_matrix):
     """
@@ -49,6 +57,8 @@ def extract_coordinates(holes_group_info, rotation_mat, translation_vec):
     This function extracts holes centers (x,y,z) coordinates from a job.
     It extracts the hole centers depending on the job's type given.
 
+    The positions of all the holes in the group are read as one array, and transformed at once.
+
     Args:
       holes_group_info (dict):   Holes group information
       rotation_mat (np.arr):     Rotation matrix from MAC to CAD origin
@@ -58,34 +68,53 @@ def extract_coordinates(holes_group_info, rotation_mat, translation_vec):
       new_coordinates (set): Coordinates extracted from the job
     """
 
-    holes_positions = holes_group_info['_tech_positions']
+    holes_positions = np.asarray(holes_group_info['_tech_positions'], dtype=float)
 
-    # Defining a set with the holes centers - each hole center is (x,y,z) coordinates
+    # Defining an array with the holes centers - each hole center is (x,y,z) coordinates
     # For this position format, take only the first 3 values (out of 9) of each point
     if holes_group_info["_positions_format"] == "VFrmt_P3Str_P3End_V3Dir":
-        new_coordinates = [holes_positions[i:i + 3] for i in range(0, len(holes_positions), 9)]
+        points = holes_positions.reshape(-1, 9)[:, :3]
 
     # For XY position format, take (x,y) values and set 'z' to the geometry's upper level.
     elif holes_group_info["_positions_format"] == "VFrmt_XY":
-        new_coordinates = {(round(holes_positions[i], 3),
-                            round(holes_positions[i + 1], 3),
-                            round(holes_group_info["_geom_upper_level"], 3)) for i in range(0, len(holes_positions), 2)}
+        points = holes_positions.reshape(-1, 2)
+        upper_level = np.full((len(points), 1), holes_group_info["_geom_upper_level"], dtype=float)
+        # Duplicate centers are removed by the set of the transformed centers (below) - the first occurrence of each
+        # center is kept, so the holes are added by the positions' order
+        points = round_as_python(np.hstack((points, upper_level)), 3)
     # Debugging purposes
     else:
         print("Haven't encountered this format yet. Need to check it out")
         raise ValueError("Invalid position format.")
 
     # Transforming the points to the CAD coordinate system origin
-    new_coordinates = transform_points(new_coordinates, rotation_mat, translation_vec)
+    new_coordinates = set(map(tuple, transform_points_array(points, rotation_mat, translation_vec).tolist()))
     return new_coordinates
 
 
+def transform_points_array(points, rotation_mat, translation_vec):
+    """
+    This function transforms an array of holes centers (x,y,z) coordinates from any coordinate
+    system to the CAD model coordinate system, using a single matrix multiplication:
+    1 - Translation - Subtracting the translation vector from the holes centers coordinates.
+    2 - Rotation -    Multiplying the holes centers coordinates by the rotation matrix.
+
+    Args:
+      points:          Nx3 np array of (x,y,z) centers of holes.
+      rotation_mat:    3x3 np array of the Rotation Matrix.
+      translation_vec: 3x1 np array of the Translation Vector.
+
+    Returns:
+      Nx3 np array of the transformed points, rounded to 3 digits after the decimal point
+    """
+    transformed_points = (points - translation_vec.reshape(1, 3)) @ rotation_mat.T
+    return np.round(transformed_points, 3)
+
+
 def transform_points(coordinates, rotation_mat, translation_vec):
     """
     This function transforms hole center (x,y,z) coordinates from any coordinate
-    system to the CAD model coordinate system:
-    1 - Translation - Subtracting the translation vector from the hole center coordinates.
-    2 - Rotation -    Dot product of the rotation matrix with the hole center coordinates.
+    system to the CAD model coordinate system (see 'transform_points_array').
 
     Args:
       coordinates:     Set with tuples of (x,y,z) centers of holes.
@@ -95,26 +124,145 @@ def transform_points(coordinates, rotation_mat, translation_vec):
     Returns:
       A set of the transformed points to the CAD model coordinate system
     """
-    transformed_coordinates = set()
+    points = np.array(list(coordinates), dtype=float).reshape(-1, 3)
+    return set(map(tuple, transform_points_array(points, rotation_mat, translation_vec).tolist()))
+
+
+def round_as_python(values, ndigits):
+    """
+    This function rounds an array the same way Python's built-in 'round' rounds floats.
+    NumPy rounds by scaling the values, so values that are (almost) exactly halfway may be rounded
+    differently. Python rounds the exact value of the float, so for those few values the exact product of the value
+    and 2 * 10**ndigits (see 'exact_product') is compared to the odd integer between the 2 candidates, and the tie
+    (an exactly halfway value) is rounded to the even candidate.
+
+    Args:
+      values (np.arr): The values to round
+      ndigits (int):   Number of digits after the decimal point
+
+    Returns:
+      np array of the rounded values
+    """
+    rounded_values = np.round(values, ndigits)
+    scaled_values = values * 10**ndigits
+    with np.errstate(invalid="ignore"):
+        halfway = np.abs(np.abs(scaled_values - np.trunc(scaled_values)) - 0.5) < 1e-6
+    if not halfway.any():
+        return rounded_values
+
+    halfway_values = values[halfway]
+    lower = np.floor(scaled_values[halfway])  # The value is between 'lower' and 'lower + 1' (scaled)
+    product, product_error = exact_product(halfway_values, 2 * 10**ndigits)
+    # The sign of (the exact product - the odd integer between the candidates) - the subtraction is exact
+    above_middle = (product - (2 * lower + 1)) + product_error
+    rounded_up = (above_middle > 0) | ((above_middle == 0) & (lower % 2 == 1))
+    # As Python's 'round', a negative value that is rounded to 0 is rounded to -0.0
+    rounded_values[halfway] = np.copysign((lower + rounded_up) / 10**ndigits, halfway_values)
+    return rounded_values
+
+
+def exact_product(values, factor):
+    """
+    This function multiplies an array by a small integer factor, without losing the rounding error - the exact
+    product is 'product + error' (Dekker's product, with the values split into halves of 26 bits).
+
+    Args:
+      values (np.arr): The values to multiply
+      factor (int):    The factor - an integer of up to 26 bits, so its products with the halves are exact
+
+    Returns:
+      product (np.arr): The rounded products
+      error (np.arr):   The rounding errors of the products
+    """
+    split_values = values * (2**27 + 1)
+    high = split_values - (split_values - values)
+    low = values - high
+    product = values * factor
+    error = (high * factor - product) + low * factor
+    return product, error
+
 
-    for point in coordinates:
-        # Convert the point to a numpy array (x, y, z)
-        point_array = np.array([[point[0]], [point[1]], [point[2]]]).reshape(3, 1)
 
-        # Applying translation
-        transformed_point = point_array - translation_vec
-        # Applying rotation
-        transformed_point = np.dot(rotation_mat, transformed_point)
+# The types of the geometries' segments (e.g, "line") - a segment's type code is its index in 'segment_types'.
+# The codes are given by the order the types are encountered, so they are kept only in memory - a pickled
+# Geometry holds the types' names (see 'Geometry.__reduce__')
+segment_types = []
+segment_type_codes = {}
 
-        # Convert the transformed point to a tuple, round it, and add it to the set
-        transformed_coordinates.add((round(transformed_point[0, 0], 3),
-                                     round(transformed_point[1, 0], 3),
-                                     round(transformed_point[2, 0], 3)))
-    return transformed_coordinates
 
+def segment_type_code(segment_type):
+    """ Returns the code of a segment type - a new type gets the next code """
+    code = segment_type_codes.get(segment_type)
+    if code is None:
+        code = segment_type_codes[segment_type] = len(segment_types)
+        segment_types.append(segment_type)
+    return code
 
 
-def compare_geometries(new_group, existing_group, reverse_flag) -> bool:
+class Geometry:
+    """
+    The geometric shape of a hole ("_geom_ShapePoly" field) - the profile of the hole, as a list of segments.
+    It is built once, when the hole group is read, and all the computations on the geometry work on its arrays:
+        segments   - float64 array of shape (number of segments, 4): the (x, y) of each segment's p0 and p1
+        type_codes - int8 array of the segments' type codes (see 'segment_types')
+    The values that 'compare_geometries' compares are computed once as well - they are held in the same array
+    as the segments (see 'values').
+
+    Printing it (e.g, in the report) prints the segments the same way as the JSON's list of dictionaries.
+    """
+    __slots__ = ("values", "type_codes", "types_key")
+
+    # The columns of 'values' - the segment's points, and then the compared values (see 'comparison_values'):
+    # depth and delta-x, and the diameter of p0 (straight-forward) and of p1 (compared with a reversed geometry)
+    x0, y0, x1, y1, depth, delta_x, diameter0, diameter1 = range(8)
+    columns = 8
+
+    def __init__(self, values, type_codes):
+        self.values = values                   # float64 array of shape (number of segments, 8) - see 'columns'
+        self.type_codes = type_codes
+        self.types_key = type_codes.tobytes()  # bytes: the type codes - for comparing the types at once
+
+    @classmethod
+    def from_shape(cls, geom_shape):
+        """ Builds the geometry from the "_geom_ShapePoly" field - a list of {"p0": [x, y], "p1": [x, y], "type"} """
+        rows = []
+        for segment in geom_shape:
+            (x0, y0), (x1, y1) = segment["p0"], segment["p1"]
+            rows.append((x0, y0, x1, y1, abs(abs(y0) - abs(y1)), abs(abs(x0) - abs(x1)), x0 * 2, x1 * 2))
+        values = np.array(rows, dtype=np.float64).reshape(len(rows), cls.columns)
+        return cls(values, np.array([segment_type_code(segment["type"]) for segment in geom_shape], dtype=np.int8))
+
+    @classmethod
+    def from_segments(cls, segments, types):
+        """ Builds the geometry from its segments' points and the names of their types - used when unpickling """
+        return cls.from_shape([{"p0": [x0, y0], "p1": [x1, y1], "type": segment_type}
+                               for (x0, y0, x1, y1), segment_type in zip(segments.tolist(), types)])
+
+    def __reduce__(self):
+        return Geometry.from_segments, (self.segments, self.types())
+
+    def __len__(self):
+        return len(self.type_codes)
+
+    @property
+    def segments(self):
+        """ The (x0, y0, x1, y1) of each segment - a view of 'values' """
+        return self.values[:, :4]
+
+    def types(self):
+        """ Returns the names of the segments' types """
+        return tuple(segment_types[code] for code in self.type_codes.tolist())
+
+    def to_list(self):
+        """ Returns the geometry as the JSON's list of dictionaries """
+        return [{"p0": [x0, y0], "p1": [x1, y1], "type": segment_type}
+                for (x0, y0, x1, y1), segment_type in zip(self.segments.tolist(), self.types())]
+
+    def __repr__(self):
+        return repr(self.to_list())
+
+
+def compare_geometries(new_geometry, existing_group, reverse_flag) -> bool:
     """
     This function compares the shape of two geometries ("_geom_ShapePoly" field).
     We make a straight-forward comparison, and if that doesn't work we compare
@@ -127,14 +275,16 @@ def compare_geometries(new_group, existing_group, reverse_flag) -> bool:
 
     The Algorithm:
     1 - Check if both geometries contain the same number of elements (Trivial) - return False if not same
-    2 - Iterating on both geometries at the same time, and comparing their elements (original or reverse):
-      2.1 - Compare the types of the elements (e.g., "line")
-      2.2 - Compare the depth of the elements
-      2.3 - Compare the diameter of the elements
-    3 - If we passed 2, then geometries are the same
+    2 - Compare the types of the elements (e.g., "line") - all at once, by the geometries' type codes
+    3 - Iterating on both geometries at the same time, and comparing their elements (original or reverse):
+      3.1 - Compare the depth of the elements (which is also their delta-y)
+      3.2 - Compare the diameter of the elements
+      3.3 - Compare the delta-x of the elements
+    4 - If we passed 3, then geometries are the same
+    The depths, delta-x and diameters were already computed (see 'Geometry').
 
     Args:
-      new_group:      List of dictionaries containing the hole's description of the geometry we check
+      new_geometry:   Geometry of the hole group we check
       existing_group: Class containing existing's hole group information
       reverse_flag:   Boolean that decides whether to check the reversed geometry
 
@@ -143,48 +293,209 @@ def compare_geometries(new_group, existing_group, reverse_flag) -> bool:
       False if the new geometry and existing geometry are DIFFERENT
     """
 
-    # Saving the geometric shape of the existing geometry and the new geometry
+    if Metrics.enabled:
+        Metrics.count("compare_geometries")
+
     existing_geometry = existing_group.geom_shape
-    new_geometry = new_group["_geom_ShapePoly"]
 
-    # 1 - Checking if both lists contain the same number of elements
+    # 1 - Checking if both geometries contain the same number of elements
     # If true, proceed to check if they are the same, else, the geometries are NOT the same, so return False
     if len(new_geometry) != len(existing_geometry):
         return False
 
-    # If true, then checking the reversed topology
-    if reverse_flag:
-        new_geometry = new_geometry[::-1]
+    # 2 - Comparing the types of the elements - return False if different
+    # If reverse_flag is true, then checking the reversed geometry
+    new_types_key = new_geometry.type_codes[::-1].tobytes() if reverse_flag else new_geometry.types_key
+    if new_types_key != existing_geometry.types_key:
+        return False
 
-    # 2 - Iterating on both geometries at the same time, and comparing their elements
-    for elem1, elem2 in zip(new_geometry, existing_geometry):
-        # 2.1 - Comparing the types of the elements - return False if different
-        if elem1["type"] != elem2["type"]:
+    # 3 - Iterating on both geometries at the same time, and comparing their elements
+    # (a reversed geometry's p0 diameters are compared to the existing p1 diameters)
+    new_values = new_geometry.values[::-1] if reverse_flag else new_geometry.values
+    existing_diameter = Geometry.diameter1 if reverse_flag else Geometry.diameter0
+    for elem1, elem2 in zip(new_values.tolist(), existing_geometry.values.tolist()):
+        if (abs(elem1[Geometry.depth] - elem2[Geometry.depth]) > tolerance or
+                abs(elem1[Geometry.diameter0] - elem2[existing_diameter]) > tolerance or
+                abs(elem1[Geometry.delta_x] - elem2[Geometry.delta_x]) > tolerance):
             return False
 
-        # 2.2 - Checking if the depths are the same. If not, then geometries are NOT the same
-        new_geom_depth =      abs(abs(elem1["p0"][1]) - abs(elem1["p1"][1]))
-        existing_geom_depth = abs(abs(elem2["p0"][1]) - abs(elem2["p1"][1]))
-        if abs(new_geom_depth - existing_geom_depth) > tolerance:
-            return False
+    # If got here, then geometries are the same
+    return True
 
-        # 2.3 - Checking if the diameters are the same. If not, then geometries are NOT the same
-        if reverse_flag:   # If reverse_flag is true, then checking the reverse
-            if abs((elem1["p0"][0]*2) - (elem2["p1"][0]*2)) > tolerance:
-                return False
-        elif abs((elem1["p0"][0] * 2) - (elem2["p0"][0] * 2)) > tolerance:
-            return False
 
-        # Checking the DIFFERENCES between Diameter size and segments' lengths
-        delta_x1 = abs(abs(elem1['p0'][0]) - abs(elem1['p1'][0]))
-        delta_x2 = abs(abs(elem2['p0'][0]) - abs(elem2['p1'][0]))
-        delta_y1 = abs(abs(elem1['p0'][1]) - abs(elem1['p1'][1]))
-        delta_y2 = abs(abs(elem2['p0'][1]) - abs(elem2['p1'][1]))
-        if abs(delta_x1 - delta_x2) > tolerance or abs(delta_y1 - delta_y2) > tolerance:
-            return False
 
-    # If got here, then geometries are the same
-    return True
+def geometry_fingerprint(geometry):
+    """
+    This function computes a fingerprint of a geometry ("_geom_ShapePoly" field), that is the same for
+    the geometry and for its reverse. Two geometries that 'compare_geometries' finds the same (straight-forward
+    or reversed) always have the same number of segments and segment types, and their sums of depths and
+    of delta-x differ by at most (number of segments * tolerance).
+
+    Args:
+      geometry: Geometry of the hole
+
+    Returns:
+      A 4-tuple of the number of segments, the segments' types (the smaller of both directions), the sum
+      of the segments' depths, and the sum of the segments' delta-x
+    """
+    types = geometry.types()
+    depths_sum = sum(geometry.values[:, Geometry.depth].tolist())
+    delta_x_sum = sum(geometry.values[:, Geometry.delta_x].tolist())
+    return len(geometry), min(types, types[::-1]), depths_sum, delta_x_sum
+
+
+def compare_geometries_batch(new_geometry, comparison_values):
+    """
+    This function compares a geometry to several geometries with the same number of segments at once - the same
+    comparison as 'compare_geometries' (straight-forward and reversed, with the same tolerance), done for all the
+    geometries in a single NumPy expression.
+
+    Args:
+      new_geometry:      Geometry of the hole group we check
+      comparison_values: float64 array of shape (number of geometries, 2, number of segments * 4) - the depth,
+                         delta-x, diameter and type code of each segment of each geometry, for the straight-forward
+                         (p0's diameter) and the reversed (p1's diameter) comparison (see 'GeometryStack')
+
+    Returns:
+      matches (np.ndarray): bool array of shape (number of geometries, 2) - True where the new geometry is the SAME
+                            as the geometry, straight-forward (column 0) or reversed (column 1)
+    """
+    # The new geometry's values, straight-forward and reversed (always compared to p0's diameter)
+    new_values = np.empty((2, len(new_geometry), 4))
+    new_values[0, :, :3] = new_geometry.values[:, Geometry.depth:Geometry.diameter0 + 1]
+    new_values[0, :, 3] = new_geometry.type_codes
+    new_values[1] = new_values[0, ::-1]
+
+    # None of the differences is above the tolerance. The type codes are integers, so different types always
+    # differ by more than the tolerance. As in 'compare_geometries', a NaN difference isn't above the tolerance.
+    with np.errstate(invalid="ignore"):
+        matches = ~(np.abs(comparison_values - new_values.reshape(2, -1)) > tolerance).any(axis=2)
+
+    if Metrics.enabled:
+        # Counted as the calls to 'compare_geometries' - the reversed comparison only if the straight-forward failed
+        Metrics.count("compare_geometries", len(matches) + int(np.count_nonzero(~matches[:, 0])))
+    return matches
+
+
+class GeometryStack:
+    """
+    The geometries of the hole groups (in a topology) that have the same number of segments, stacked into one array,
+    so a geometry can be compared to all of them at once (see 'compare_geometries_batch'). A row is added for each
+    hole group, by the order they were added.
+
+    The array holds the segments' type codes, which are given per process (see 'segment_types'), so it is never
+    pickled - the stacks are built again when their index is unpickled (see 'GeometryIndex.__setstate__').
+    """
+    def __init__(self, segments_num):
+        self.size = 0
+        self.comparison = np.empty((4, 2, segments_num * 4))  # The compared values of each geometry
+
+    def add(self, geometry):
+        """ Adds a geometry, and returns its row """
+        if self.size == len(self.comparison):
+            # Doubling the array's capacity
+            self.comparison = np.concatenate((self.comparison, np.empty_like(self.comparison)))
+        values = geometry.values
+        row = self.comparison[self.size].reshape(2, len(geometry), 4)
+        row[0, :, :3] = values[:, Geometry.depth:Geometry.diameter0 + 1]
+        row[1, :, :2] = values[:, Geometry.depth:Geometry.delta_x + 1]
+        row[1, :, 2] = values[:, Geometry.diameter1]
+        row[:, :, 3] = geometry.type_codes
+        self.size += 1
+        return self.size - 1
+
+
+class GeometryIndex:
+    """
+    A hash index of the hole groups in a topology by their geometry fingerprint (see 'geometry_fingerprint').
+    The sums in the fingerprint are quantized into buckets of (number of segments * tolerance), so a geometry
+    can only be the same as the hole groups in its bucket or in the buckets next to it - only those
+    candidates need the exact comparison, which is done for all of them at once (see 'matching_groups').
+
+    A geometry with a NaN or infinite value has no bucket - it is kept in a bucket of its own, and is compared to all
+    the hole groups with its number of segments and types (a NaN difference is never above the tolerance, see
+    'compare_geometries').
+    """
+    def __init__(self):
+        self.buckets = {}  # dict: quantized fingerprint -> list of (position in the topology, hole group, row)
+        self.stacks = {}   # dict: number of segments -> GeometryStack (the row of a hole group is its row in it)
+
+    @staticmethod
+    def quantize(geometry):
+        """
+        Returns the number of segments, the segments' types, and the buckets of the depths and delta-x sums -
+        the buckets are None if one of the sums isn't finite
+        """
+        segments_num, types, depths_sum, delta_x_sum = geometry_fingerprint(geometry)
+        if not (math.isfinite(depths_sum) and math.isfinite(delta_x_sum)):
+            return segments_num, types, None, None
+        # The bucket is slightly bigger than the maximal difference, so floating point errors won't matter
+        bucket_size = max(segments_num, 1) * tolerance * 1.001
+        return segments_num, types, math.floor(depths_sum / bucket_size), math.floor(delta_x_sum / bucket_size)
+
+    def add(self, position, hole_group):
+        """ Adds a hole group, which is in the given position in its topology's hole groups list """
+        geometry = hole_group.geom_shape
+        stack = self.stacks.get(len(geometry))
+        if stack is None:
+            stack = self.stacks[len(geometry)] = GeometryStack(len(geometry))
+        row = stack.add(geometry)
+        self.buckets.setdefault(self.quantize(geometry), []).append((position, hole_group, row))
+
+    def __getstate__(self):
+        # The stacks hold type codes of this process, so only the geometries of their rows are pickled (a pickled
+        # Geometry holds the types' names)
+        geometries = {segments_num: [None] * stack.size for segments_num, stack in self.stacks.items()}
+        for bucket in self.buckets.values():
+            for _, hole_group, row in bucket:
+                geometries[len(hole_group.geom_shape)][row] = hole_group.geom_shape
+        return {"buckets": self.buckets, "geometries": geometries}
+
+    def __setstate__(self, state):
+        # Building the stacks again, with the type codes of this process
+        self.buckets = state["buckets"]
+        self.stacks = {}
+        for segments_num, geometries in state["geometries"].items():
+            stack = self.stacks[segments_num] = GeometryStack(segments_num)
+            for geometry in geometries:
+                stack.add(geometry)
+
+    def candidates(self, geometry):
+        """
+        Returns the hole groups that may have the same geometry (or its reverse), by their order in the topology -
+        as (position in the topology, hole group, row in the stack of their number of segments)
+        """
+        segments_num, types, depths_bucket, delta_x_bucket = self.quantize(geometry)
+        candidates = []
+        if depths_bucket is None:
+            # A geometry that isn't finite may be the same as any hole group with its number of segments and types
+            for key, bucket in self.buckets.items():
+                if key[:2] == (segments_num, types):
+                    candidates.extend(bucket)
+        else:
+            for depths_offset in (-1, 0, 1):
+                for delta_x_offset in (-1, 0, 1):
+                    key = (segments_num, types, depths_bucket + depths_offset, delta_x_bucket + delta_x_offset)
+                    candidates.extend(self.buckets.get(key, ()))
+            # The hole groups whose geometry isn't finite
+            candidates.extend(self.buckets.get((segments_num, types, None, None), ()))
+        candidates.sort(key=lambda candidate: candidate[0])
+        return candidates
+
+    def matching_groups(self, geometry, candidates):
+        """
+        Returns the candidates (see 'candidates') that have the same geometry (or its reverse), by their order in the
+        topology. All the candidates have the geometry's number of segments, so they are compared at once (unless there
+        are only a few of them - see 'batch_min_candidates').
+        """
+        if len(candidates) < batch_min_candidates:
+            # The batch comparison costs more than a few comparisons of pairs
+            return [hole_group for _, hole_group, _ in candidates
+                    if compare_geometries(geometry, hole_group, False) or compare_geometries(geometry, hole_group, True)]
+        stack = self.stacks[len(geometry)]
+        rows = [row for _, _, row in candidates]
+        matches = compare_geometries_batch(geometry, stack.comparison[rows]).any(axis=1)
+        return [hole_group for (_, hole_group, _), match in zip(candidates, matches.tolist()) if match]
 
 
 
@@ -197,6 +508,8 @@ def compare_coordinates(new_center, existing_group, home_number, hole_depth, job
 
     *Note - This function is used in order to deal with cases where a hole is being worked
      different MACs (which are parallel).
+     For the second condition, only the centers that the hole group's spatial index returns are
+     checked - holes that have a job from a MAC parallel to 'home_number', and are close enough.
 
     Args:
       new_center: Tuple containing the center we're checking.
@@ -210,33 +523,96 @@ def compare_coordinates(new_center, existing_group, home_number, hole_depth, job
       False if the two hole centers refer to DIFFERENT holes.
     """
 
-    hole_exist_flag = False
+    if Metrics.enabled:
+        Metrics.count("compare_coordinates")
 
     # 1 - Checking if the exact same coordinates already exist
-    if new_center in existing_group.centers:
+    if new_center in existing_group.holes:
         # If true, the two centers refer to the same hole, so return True
-        # if job_number in [55, 62]:                                                     # DEBUGGING PURPOSES
-        #     print(f"Job number is: {job_number} - the exact same coordinates exists")  # DEBUGGING PURPOSES
-        hole_exist_flag = True
-        return hole_exist_flag, existing_group.holes[new_center]
-
-    # Going over on all the Hole objects in that hole group
-    for existing_center in existing_group.centers:
-        # Going over on all the jobs inside each Hole object
-        for existing_job in existing_group.holes[existing_center].jobs:
-            # Check if home numbers are parallel
-            if home_number in existing_job.parallel_home_numbers:
-                # Checking if the distance between the centers equals the hole's depth
-                centers_distance = np.linalg.norm(np.array(new_center) - np.array(existing_center))
-                # If true, the two centers refer to the same hole, so return True
-                if abs(centers_distance - hole_depth) <= tolerance:
-                    # if job_number in [55, 62]:                                                 # DEBUGGING PURPOSES
-                    #     print(f"Job number is: {job_number} - dist between centers == depth")  # DEBUGGING PURPOSES
-                    hole_exist_flag = True
-                    return hole_exist_flag, existing_group.holes[existing_center]
-
-    # Return hole_exist_flag False if the two hole centers refer to DIFFERENT holes
-    return hole_exist_flag, None
+        return True, existing_group.holes[new_center]
+
+    # 2 - Going over the holes that were worked from a MAC parallel to the new job's MAC, and are close enough
+    matching_centers = []
+    parallel_centers = existing_group.centers_index.query(new_center, home_number, hole_depth + tolerance)
+    if Metrics.enabled:
+        Metrics.count("parallel_centers_scanned", len(parallel_centers))
+    for existing_center in parallel_centers:
+        # Checking if the distance between the centers equals the hole's depth
+        centers_distance = np.linalg.norm(np.array(new_center) - np.array(existing_center))
+        if abs(centers_distance - hole_depth) <= tolerance:
+            matching_centers.append(existing_center)
+
+    # Return False if the two hole centers refer to DIFFERENT holes
+    if not matching_centers:
+        return False, None
+
+    # If more than one hole matches, taking the first one by the order of the hole group's centers set
+    if len(matching_centers) > 1:
+        matching_centers = set(matching_centers)
+        matching_centers = [center for center in centers_set(existing_group.centers) if center in matching_centers]
+    return True, existing_group.holes[matching_centers[0]]
+
+
+def centers_set(centers):
+    """
+    This function returns the set of a hole group's centers, built the same way the hole group used to hold them -
+    by adding the centers one by one, by the order they were added to the hole group. Iterating the set gives the
+    order that decides which hole is taken when several holes match a center (see 'compare_coordinates'), so it's
+    built only in that case.
+
+    Args:
+      centers: The centers of the hole group, by the order they were added
 
+    Returns:
+      centers_set (set): The centers
+    """
+    centers_set = set()
+    for center in centers:
+        centers_set.add(center)
+    return centers_set
 
 
+class ParallelCentersIndex:
+    """
+    A spatial index (grid hash) of the holes centers in a hole group, used for finding holes that are
+    being worked from parallel MACs (see 'compare_coordinates').
+
+    A center is indexed under every home number that is parallel to one of the jobs performed on its hole,
+    so a query for a new job's home number returns only holes it may share. Each center is saved in a cubic
+    cell - the cell's size is the hole's depth (plus tolerance), so the centers at that distance from a
+    new center are always in the 27 cells around it.
+
+    A NaN or infinite coordinate (or depth) is never at the hole's depth from another center (see 'compare_coordinates'),
+    so such centers are not indexed, and such queries return no centers.
+    """
+    def __init__(self, cell_size):
+        self.cell_size = max(cell_size, tolerance)  # float: the cells' edge length
+        if not math.isfinite(self.cell_size):
+            self.cell_size = tolerance
+        self.cells = {}    # dict: home number -> dict of cell (3-tuple) -> list of centers in that cell
+        self.centers = {}  # dict: home number -> set of the centers indexed under that home number
+
+    def cell(self, center):
+        """ Returns the cell that contains the center """
+        return tuple(math.floor(coordinate / self.cell_size) for coordinate in center)
+
+    def add(self, center, parallel_home_numbers):
+        """ Indexes the center under each of the parallel home numbers (once for each home number) """
+        if not all(map(math.isfinite, center)):
+            return
+        for home_number in parallel_home_numbers or ():
+            indexed_centers = self.centers.setdefault(home_number, set())
+            if center not in indexed_centers:
+                indexed_centers.add(center)
+                self.cells.setdefault(home_number, {}).setdefault(self.cell(center), []).append(center)
+
+    def query(self, center, home_number, distance):
+        """ Returns the centers indexed under home_number that may be up to 'distance' away from the center """
+        cells = self.cells.get(home_number)
+        if not cells or not (math.isfinite(distance) and distance >= 0) or not all(map(math.isfinite, center)):
+            return []
+        cells_range = range(-math.ceil(distance / self.cell_size), math.ceil(distance / self.cell_size) + 1)
+        cx, cy, cz = self.cell(center)
+        return [existing_center
+                for dx in cells_range for dy in cells_range for dz in cells_range
+                for existing_center in cells.get((cx + dx, cy + dy, cz + dz), ())]
@@ -0,0 +1,216 @@
+import json
+import math
+import os
+from operator import attrgetter
+
+import numpy as np
+
+"""
+The ML feature store - the machine learning fields of all the holes, saved as typed columnar arrays.
+
+The store is a directory with a sub-directory for each feature group, holding an .npy file for each column.
+Row i of every column belongs to the same hole. Text fields (e.g, material) are saved as int32 codes, and the
+code tables are saved in 'categories.json' (code -1 means None). Missing numeric values are saved as NaN.
+'manifest.json' holds the number of rows, and the dtype and shape of each column.
+
+Loading the store with mmap_mode='r' (see 'load_feature_store') maps the columns without copying them.
+"""
+
+store_version = 1
+
+# The columns of each feature group - (column name, hole attribute, dtype).
+# dtype "category" means a text field that is saved as int32 codes
+feature_groups = {
+    "index": [
+        ("part_name", "parent_hole_group.part_name", "category"),
+        ("topology", "parent_hole_group.parent_topology.topology", "category"),
+        ("topology_mask", "parent_hole_group.parent_topology.topology_mask", "int64"),
+        ("hole_group", None, "int32"),  # The hole group's index in the store - filled while exporting
+        ("center_x", None, "float64"),
+        ("center_y", None, "float64"),
+        ("center_z", None, "float64"),
+    ],
+    "geometry": [
+        ("main_diameter", "main_diameter", "float64"),
+        ("hole_depth", "hole_depth", "float64"),
+        ("mask_segs", "mask_segs", "uint8"),             # shape (n, 6, 4) - one-hot mask of each segment
+        ("segments_len", "segments_len", "float64"),     # shape (n, 6)
+    ],
+    "countersink": [
+        ("has_csk", "has_csk", "uint8"),
+        ("csk_major_dia", "csk_major_dia", "float64"),
+        ("csk_minor_dia", "csk_minor_dia", "float64"),
+        ("csk_angle_deg", "csk_angle_deg", "float64"),
+    ],
+    "counterbore": [
+        ("has_cbore", "has_cbore", "uint8"),
+        ("cbore_dia", "cbore_dia", "float64"),
+        ("cbore_depth", "cbore_depth", "float64"),
+    ],
+    "thread": [
+        ("has_thread", "has_thread", "uint8"),
+        ("thread_nominal_diameter", "thread_nominal_diameter", "float64"),
+        ("thread_pitch", "thread_pitch", "float64"),
+        ("thread_depth", "thread_depth", "float64"),
+        ("standard", "standard", "category"),
+        ("thread_nominal_dia_drawing", "thread_nominal_dia_drawing", "float64"),
+        ("thread_pitch_drawing", "thread_pitch_drawing", "float64"),
+        ("thread_depth_drawing", "thread_depth_drawing", "float64"),
+        ("thread_class_grade", "thread_class_grade", "category"),
+    ],
+    "tolerance": [
+        ("diam_tol_exists", "diam_tol_exists", "uint8"),
+        ("diam_tol_plus", "diam_tol_plus", "float64"),
+        ("diam_tol_minus", "diam_tol_minus", "float64"),
+        ("depth_tol_exists", "depth_tol_exists", "uint8"),
+        ("depth_tol_plus", "depth_tol_plus", "float64"),
+        ("depth_tol_minus", "depth_tol_minus", "float64"),
+    ],
+    "gdandt": [
+        ("gdandt_exists", "gdandt_exists", "uint8"),
+        ("gdandt_tol_type", "gdandt_tol_type", "category"),
+        ("gdandt_tol_value", "gdandt_tol_value", "float64"),
+    ],
+    "context": [
+        ("material", "material", "category"),
+        ("surface_finish", "surface_finish", "category"),
+    ],
+}
+
+# The shape of a single row of the columns that hold more than a value per hole
+column_row_shapes = {"mask_segs": (6, 4), "segments_len": (6,)}
+
+# Number of holes whose values are held in memory before they are written to the columns' files
+export_chunk_rows = 65536
+
+
+def to_float(value):
+    """ Returns the value as a float, or NaN if it's missing or not a number """
+    if value is None:
+        return math.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def export_feature_store(topologies_dict, store_dir):
+    """
+    This function writes the ML fields of all the holes in the topologies dictionary to a feature store.
+    The holes are written by the order of the topologies, hole groups and holes.
+
+    The columns are written in chunks of 'export_chunk_rows' holes, so the memory doesn't grow with the number of
+    holes - the holes that were spilled to the disk are read back one at a time (see 'Spill_Store.py').
+
+    Args:
+        topologies_dict (dict): Topologies dictionary that contains all hole groups and holes
+        store_dir (str):        The directory of the feature store - created if it doesn't exist
+
+    Returns:
+        num_rows (int): The number of holes that were written
+    """
+    num_rows = sum(len(hole_group.holes) for topology in topologies_dict.values()
+                   for hole_group in topology.holes_groups)
+    categories = {}  # column -> {text value -> code}
+
+    # Opening each column's .npy file, and writing its header - the rows are appended chunk by chunk
+    column_files = {}
+    manifest = {"version": store_version, "num_rows": num_rows, "groups": {}}
+    for group, columns in feature_groups.items():
+        group_dir = os.path.join(store_dir, group)
+        os.makedirs(group_dir, exist_ok=True)
+        manifest["groups"][group] = {}
+        for column, attribute, dtype in columns:
+            array_dtype = np.dtype(np.int32) if dtype == "category" else np.dtype(dtype)
+            shape = (num_rows,) + column_row_shapes.get(column, ())
+            column_file = column_files[column] = open(os.path.join(group_dir, column + ".npy"), "wb")
+            np.lib.format.write_array_header_1_0(column_file, {"descr": np.lib.format.dtype_to_descr(array_dtype),
+                                                               "fortran_order": False, "shape": shape})
+            manifest["groups"][group][column] = {"dtype": str(array_dtype), "shape": list(shape),
+                                                 "category": dtype == "category"}
+
+    # The values of each column in the current chunk
+    values = {column: [] for columns in feature_groups.values() for column, attribute, dtype in columns}
+    dtypes = {column: np.dtype(np.int32) if dtype == "category" else np.dtype(dtype)
+              for columns in feature_groups.values() for column, attribute, dtype in columns}
+
+    # The columns that are taken from the holes' attributes - (values list, attribute getter, dtype, code table)
+    attribute_columns = [(values[column], attrgetter(attribute), dtype,
+                          categories.setdefault(column, {}) if dtype == "category" else None)
+                         for columns in feature_groups.values()
+                         for column, attribute, dtype in columns if attribute is not None]
+
+    def write_chunk():
+        """ Appends the values of the current chunk to the columns' files """
+        for column, column_values in values.items():
+            if column_values:
+                column_files[column].write(np.asarray(column_values, dtype=dtypes[column]).tobytes())
+                column_values.clear()
+
+    try:
+        # Going over all the holes once
+        group_index = 0
+        chunk_rows = 0
+        for topology in topologies_dict.values():
+            for hole_group in topology.holes_groups:
+                for hole in hole_group.holes.values():
+                    x, y, z = hole.center_coordinates
+                    values["center_x"].append(x)
+                    values["center_y"].append(y)
+                    values["center_z"].append(z)
+                    values["hole_group"].append(group_index)
+
+                    for column_values, getter, dtype, codes in attribute_columns:
+                        value = getter(hole)
+                        if dtype == "category":
+                            # Coding the text - None is coded as -1
+                            value = -1 if value is None else codes.setdefault(str(value), len(codes))
+                        elif dtype == "float64" and not isinstance(value, list):
+                            value = to_float(value)
+                        column_values.append(value)
+
+                    chunk_rows += 1
+                    if chunk_rows == export_chunk_rows:
+                        write_chunk()
+                        chunk_rows = 0
+                group_index += 1
+        write_chunk()
+    finally:
+        for column_file in column_files.values():
+            column_file.close()
+
+    # Writing the code tables and the manifest
+    code_tables = {column: list(codes) for column, codes in categories.items()}
+    with open(os.path.join(store_dir, "categories.json"), "w") as file:
+        json.dump(code_tables, file, indent=1)
+    with open(os.path.join(store_dir, "manifest.json"), "w") as file:
+        json.dump(manifest, file, indent=1)
+
+    return num_rows
+
+
+def load_feature_store(store_dir, mmap_mode="r"):
+    """
+    This function loads a feature store that was written by 'export_feature_store'.
+
+    Args:
+        store_dir (str): The directory of the feature store
+        mmap_mode (str): Passed to np.load - "r" maps the columns without copying them, None reads them to memory
+
+    Returns:
+        columns (dict):    Feature group -> column name -> array
+        categories (dict): Column name -> list of the text values, where the index of a value is its code
+    """
+    with open(os.path.join(store_dir, "manifest.json")) as file:
+        manifest = json.load(file)
+    if manifest["version"] != store_version:
+        raise ValueError(f"Feature store version {manifest['version']} is not supported (expected {store_version})")
+
+    columns = {}
+    for group, group_columns in manifest["groups"].items():
+        columns[group] = {column: np.load(os.path.join(store_dir, group, column + ".npy"), mmap_mode=mmap_mode)
+                          for column in group_columns}
+
+    with open(os.path.join(store_dir, "categories.json")) as file:
+        categories = json.load(file)
+    return columns, categories
@@ -0,0 +1,198 @@
+import json
+import time
+from contextlib import contextmanager, nullcontext
+
+"""
+Toggleable instrumentation of the processing pipeline - the wall time of its stages, and counters of its hot loops.
+
+The metrics are collected per part (between 'start_part' and 'end_part'), and whatever is recorded outside of a part
+(e.g, printing the stats) is collected for the whole run. 'write_metrics' saves the metrics of all the parts, and
+the totals of the run, to a JSON file.
+
+The work that is done again while merging a part that was processed by a worker is recorded under separate
+"merge_" stages and counters (see 'prefixed'), so the part's metrics don't count it twice.
+
+When the instrumentation is disabled (the default), the stages and the counters do nothing - the hot loops only check
+the 'enabled' flag before counting:
+    if Metrics.enabled:
+        Metrics.count("compare_geometries")
+"""
+
+# True if the metrics are collected - see 'enable'
+enabled = False
+
+# The metrics of the part being processed, the metrics of the parts that were processed, and the run's metrics
+part_metrics = None
+parts_metrics = []
+run_metrics = {"stages": {}, "counters": {}}
+run_start_time = None
+# The prefix of the stages and counters that are recorded - see 'prefixed'
+name_prefix = ""
+# The run's settings that are reported with its metrics (e.g, the JSON backend) - see 'set_run_info'
+run_info = {}
+
+# Returned by 'stage' when the instrumentation is disabled
+null_stage = nullcontext()
+
+
+def enable(metrics_enabled=True):
+    """ Enables (or disables) collecting the metrics - also used as the worker processes' initializer """
+    global enabled, run_start_time
+    enabled = metrics_enabled
+    if enabled and run_start_time is None:
+        run_start_time = time.perf_counter()
+
+
+def new_metrics():
+    """ Returns empty metrics - stage -> {"seconds", "calls"}, and counter -> value """
+    return {"stages": {}, "counters": {}}
+
+
+def current_metrics():
+    """ Returns the metrics that are being recorded - the part's metrics, or the run's metrics outside of a part """
+    return part_metrics if part_metrics is not None else run_metrics
+
+
+def count(counter, amount=1):
+    """ Adds the amount to a counter - should be called only if the instrumentation is enabled """
+    counters = current_metrics()["counters"]
+    counter = name_prefix + counter
+    counters[counter] = counters.get(counter, 0) + amount
+
+
+def set_run_info(name, value):
+    """ Sets a setting of the run, which is reported with the run's metrics """
+    run_info[name] = value
+
+
+def add_stage_time(stage_name, seconds, calls=1):
+    """ Adds the time of a stage """
+    stage_metrics = current_metrics()["stages"].setdefault(name_prefix + stage_name, {"seconds": 0.0, "calls": 0})
+    stage_metrics["seconds"] += seconds
+    stage_metrics["calls"] += calls
+
+
+class StageTimer:
+    """ A context manager that measures the wall time of a stage """
+    __slots__ = ("stage_name", "start_time")
+
+    def __init__(self, stage_name):
+        self.stage_name = stage_name
+        self.start_time = None
+
+    def __enter__(self):
+        self.start_time = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        add_stage_time(self.stage_name, time.perf_counter() - self.start_time)
+        return False
+
+
+def stage(stage_name):
+    """
+    Returns a context manager that measures the wall time of a stage:
+        with Metrics.stage("process_jobs"):
+            ...
+    """
+    if not enabled:
+        return null_stage
+    return StageTimer(stage_name)
+
+
+def prefixed(prefix):
+    """
+    Returns a context manager, in which the stages and the counters are recorded under the prefix:
+        with Metrics.prefixed("merge_"):
+            ...  # Metrics.count("holes_created") counts "merge_holes_created"
+    """
+    if not enabled:
+        return null_stage
+    return prefixed_names(prefix)
+
+
+@contextmanager
+def prefixed_names(prefix):
+    """ Records the stages and the counters under the prefix (see 'prefixed') """
+    global name_prefix
+    previous_prefix = name_prefix
+    name_prefix = previous_prefix + prefix
+    try:
+        yield
+    finally:
+        name_prefix = previous_prefix
+
+
+def timed_iterator(stage_name, iterable):
+    """ Returns the iterable, measuring the time spent on producing its items as a stage (e.g, reading JSONs) """
+    if not enabled:
+        return iterable
+    return timed_items(stage_name, iterable)
+
+
+def timed_items(stage_name, iterable):
+    """ Yields the items of the iterable, adding the time spent on producing each of them to the stage """
+    iterator = iter(iterable)
+    while True:
+        start_time = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            add_stage_time(stage_name, time.perf_counter() - start_time, 0)
+            return
+        add_stage_time(stage_name, time.perf_counter() - start_time)
+        yield item
+
+
+def start_part(part_name, worker_metrics=None):
+    """
+    Starts recording the metrics of a part.
+
+    Args:
+        part_name (str):       The name of the part
+        worker_metrics (dict): The metrics that were already recorded for the part in a worker process (if any)
+    """
+    global part_metrics
+    if not enabled:
+        return
+    part_metrics = dict(part_name=part_name, **new_metrics()) if worker_metrics is None else worker_metrics
+
+
+def end_part():
+    """ Stops recording the metrics of the part, and returns them """
+    global part_metrics
+    if not enabled or part_metrics is None:
+        return None
+    finished_part_metrics = part_metrics
+    parts_metrics.append(finished_part_metrics)
+    part_metrics = None
+    return finished_part_metrics
+
+
+def take_part_metrics():
+    """ Same as 'end_part', but the metrics are not kept - used by worker processes, which return them """
+    finished_part_metrics = end_part()
+    if finished_part_metrics is not None:
+        parts_metrics.pop()
+    return finished_part_metrics
+
+
+def write_metrics(metrics_path):
+    """
+    This function writes the metrics of all the parts, and the totals of the run, to a JSON file.
+    The run's totals are the sums of the parts' metrics, plus whatever was recorded outside of the parts.
+    """
+    totals = {"stages": {}, "counters": {}}
+    for metrics in parts_metrics + [run_metrics]:
+        for stage_name, stage_metrics in metrics["stages"].items():
+            total_stage = totals["stages"].setdefault(stage_name, {"seconds": 0.0, "calls": 0})
+            total_stage["seconds"] += stage_metrics["seconds"]
+            total_stage["calls"] += stage_metrics["calls"]
+        for counter, value in metrics["counters"].items():
+            totals["counters"][counter] = totals["counters"].get(counter, 0) + value
+
+    wall_time = time.perf_counter() - run_start_time if run_start_time is not None else None
+    with open(metrics_path, "w") as file:
+        json.dump({"run": {"wall_time": wall_time, "parts": len(parts_metrics), **run_info, "stages": totals["stages"],
+                           "counters": totals["counters"]},
+                   "parts": parts_metrics}, file, indent=1)
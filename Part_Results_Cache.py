@@ -0,0 +1,83 @@
+import hashlib
+import os
+import pickle
+
+"""
+A persistent, content-addressed cache of the processing results of the parts.
+
+The result of processing a part's JSON (its partial topologies dictionary, the jobs that were processed and the
+printed output - see 'process_part_worker' in main.py) depends only on the JSON's content, the part's name, the
+processing code and the settings. So it is saved in a binary snapshot (pickle) under a key that hashes all of them,
+and an unchanged part is merged back from its snapshot instead of being processed again.
+Changing the processing code changes the key (see 'pipeline_fingerprint'), so old snapshots are never used.
+"""
+
+# Bump when the results change without a change in the modules below (e.g, a change in a dependency)
+pipeline_version = 2
+
+# The modules whose code determines the processing results of a part ('process_part_jobs' is in main.py)
+pipeline_modules = ["Classes.py", "Json_Backends.py", "MACs_Conversions.py", "Process_Jobs.py", "Thread_Standards.py",
+                    "Utilities_and_Cosmetics.py", "main.py"]
+
+# Computed once per process (see 'pipeline_fingerprint')
+_pipeline_fingerprint = None
+
+
+def pipeline_fingerprint():
+    """ Returns a hash of the pipeline version and the code of the processing modules """
+    global _pipeline_fingerprint
+    if _pipeline_fingerprint is None:
+        digest = hashlib.sha256(f"pipeline_version={pipeline_version}".encode())
+        modules_dir = os.path.dirname(os.path.abspath(__file__))
+        for module in pipeline_modules:
+            with open(os.path.join(modules_dir, module), "rb") as file:
+                digest.update(module.encode())
+                digest.update(hashlib.sha256(file.read()).digest())
+        _pipeline_fingerprint = digest.hexdigest()
+    return _pipeline_fingerprint
+
+
+def part_cache_key(part_path, part_name, settings):
+    """
+    This function computes the cache key of a part.
+
+    Args:
+        part_path (str):  The path of the part's JSON file
+        part_name (str):  The name of the part
+        settings (dict):  The settings that affect the processing results (e.g, the validation mode)
+
+    Returns:
+        key (str): A hex digest of the part's JSON content, its name, the pipeline and the settings
+    """
+    digest = hashlib.sha256()
+    with open(part_path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    digest.update(part_name.encode())
+    digest.update(pipeline_fingerprint().encode())
+    digest.update(repr(sorted(settings.items())).encode())
+    return digest.hexdigest()
+
+
+def load_part_result(cache_dir, key):
+    """ Returns the cached result of the key, or None if it is not in the cache (or the snapshot is unreadable) """
+    snapshot_path = os.path.join(cache_dir, key[:2], key + ".pkl")
+    try:
+        with open(snapshot_path, "rb") as file:
+            return pickle.load(file)
+    except FileNotFoundError:
+        return None
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        # A corrupted or incompatible snapshot - it will be written again
+        return None
+
+
+def store_part_result(cache_dir, key, result):
+    """ Saves the result under the key - written to a temporary file first, so a snapshot is never partial """
+    snapshot_dir = os.path.join(cache_dir, key[:2])
+    os.makedirs(snapshot_dir, exist_ok=True)
+    snapshot_path = os.path.join(snapshot_dir, key + ".pkl")
+    temp_path = f"{snapshot_path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as file:
+        pickle.dump(result, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, snapshot_path)
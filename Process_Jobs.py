@@ -1,13 +1,13 @@
-from MACs_Conversions import rotation_translation,  extract_coordinates
+from MACs_Conversions import rotation_translation,  extract_coordinates, Geometry
 from Utilities_and_Cosmetics import topology_sort
-from Classes import Topology
+from Classes import Tool, ToolRegistry, Topology
 
 # Global Variables
 drilling_types = ["NC_DRILL_OLD", "NC_DRILL_DEEP", "NC_THREAD", "NC_DRILL_HR", "NC_JOB_MW_DRILL_5X"]
 non_drilling_types = ["NC_PROFILE", "NC_CHAMFER", "NC_JOB_HSS_PARALLEL_TO_CURVE"]
 
 
-def process_jobs(job, part_name, topologies_dict):
+def process_jobs(job, part_name, topologies_dict, topology_masks=None, part_registry=None, tool_registry=None):
     """
     This function processes jobs:
     1. It creates topologies.
@@ -18,9 +18,15 @@ def process_jobs(job, part_name, topologies_dict):
       job:              The operation (job) that is done on the stock material.
       part_name:        The name of the part.
       topologies_dict:  A dictionary that maps topology masks to topology objects.
+      topology_masks:   If given, only holes groups of these (existing) topologies are processed - used
+                        when merging parts that were processed in parallel.
+      part_registry:    If given, the holes the job is performed on are registered in it (PartRegistry).
+      tool_registry:    The part's tools (ToolRegistry) - if not given, the job's tool is decoded for this job only.
     """
     # Calculating the Rotation Matrix and Translation Vector for each job
     rotation_mat, translation_vec = rotation_translation(job['home_matrix'])
+    # Decoding the job's tool once - it's shared by all the hole groups of the job
+    tool = tool_registry.tool(job['tool']) if tool_registry is not None else Tool(job['tool'])
 
     # Loops on all elements in 'recognized_holes_groups' field - each represents a hole group
     for holes_group_info in job['geometry']["recognized_holes_groups"]:
@@ -36,17 +42,101 @@ def process_jobs(job, part_name, topologies_dict):
             print(f"Topology mask is NOT valid")
             break
 
-        # Saving the reversed topology mask
-        reversed_topology_mask = int(str(topology_mask)[::-1])
-        # Checking if the mask or its reverse already exist. If true, create new Topology instance
-        if topology_mask not in topologies_dict and reversed_topology_mask not in topologies_dict:
+        # Finding the mask the topology is saved under - the mask itself or its reverse
+        topology_mask = find_topology_mask(topology_mask, topologies_dict)
+        if topology_masks is not None and topology_mask not in topology_masks:
+            continue
+        # Checking if the mask or its reverse already exist. If not, create new Topology instance
+        if topology_mask not in topologies_dict:
             topologies_dict[topology_mask] = Topology(topology_type, topology_mask)
-        # If got here, then checking if the reverse mask already exists - If true, then save the reversed mask
-        elif reversed_topology_mask in topologies_dict:
-            topology_mask = reversed_topology_mask
 
         # If it's the first time encountering that geometry shape & holes, add it
-        topologies_dict[topology_mask].add_hole_group(job, new_coordinates, holes_group_info, part_name)
+        topologies_dict[topology_mask].add_hole_group(job, new_coordinates, holes_group_info, part_name, part_registry,
+                                                      tool)
+
+
+def find_topology_mask(topology_mask, topologies_dict):
+    """
+    This function returns the key that the topology is saved under in topologies_dict.
+    A topology is saved under the mask of the first hole group that created it, so the key
+    is either the mask itself, or its reverse (holes that are being worked from parallel MACs).
+
+    Args:
+      topology_mask (int):     The topology's mask (from '_geomShapeMask' field).
+      topologies_dict (dict):  A dictionary that maps topology masks to topology objects.
+
+    Returns:
+      The reversed mask if it already exists in topologies_dict, otherwise the mask itself.
+    """
+    reversed_topology_mask = int(str(topology_mask)[::-1])
+    if reversed_topology_mask in topologies_dict:
+        return reversed_topology_mask
+    return topology_mask
+
+
+def merge_partial_topologies(topologies_dict, partial_topologies_dict, part_jobs, part_name, part_registry=None):
+    """
+    This function folds a partial topologies dictionary - the one built for a single part, separately
+    from all the other parts (e.g., in a worker process) - into the global topologies dictionary.
+
+    The result has to be identical to processing the part directly on topologies_dict, so each of the
+    part's topologies is merged as-is only if it's independent of the parts processed before it.
+    A topology is NOT independent if:
+    1 - One of the part's holes groups has the same geometry as an existing hole group of that topology
+        (in that case, the holes would have been added to the existing hole group).
+    2 - The topology already exists under the reversed mask (in that case, the holes' parameters
+        would have been computed by the reversed mask).
+    The holes groups of topologies that are NOT independent are processed again on topologies_dict,
+    by the order they were processed in the part.
+
+    Args:
+      topologies_dict (dict):          A dictionary that maps topology masks to topology objects.
+      partial_topologies_dict (dict):  The topologies dictionary of a single part.
+      part_jobs (list):                The jobs that were processed in that part, by their order.
+      part_name (str):                 The name of the part.
+      part_registry (PartRegistry):    If given, the part's holes are registered in it.
+    """
+    dependent_masks = set()   # The masks (in topologies_dict) of the topologies that are NOT independent
+
+    # 1 - Checking if any of the part's holes groups matches the geometry of an existing hole group
+    for job in part_jobs:
+        for holes_group_info in job['geometry']["recognized_holes_groups"]:
+            topology_mask = int(holes_group_info["_geomShapeMask"])
+            if topology_mask <= 0:
+                break
+            topology_mask = find_topology_mask(topology_mask, topologies_dict)
+            if topology_mask not in topologies_dict or topology_mask in dependent_masks:
+                continue
+            if topologies_dict[topology_mask].find_hole_groups(Geometry.from_shape(holes_group_info["_geom_ShapePoly"])):
+                dependent_masks.add(topology_mask)
+
+    # 2 - Checking if any of the part's topologies exists under the reversed mask
+    for topology_mask in partial_topologies_dict:
+        existing_topology_mask = find_topology_mask(topology_mask, topologies_dict)
+        if existing_topology_mask != topology_mask:
+            dependent_masks.add(existing_topology_mask)
+
+    # Adding the independent topologies - new topologies are added by the order they were encountered in the part
+    for topology_mask, partial_topology in partial_topologies_dict.items():
+        if find_topology_mask(topology_mask, topologies_dict) in dependent_masks:
+            continue
+        if topology_mask not in topologies_dict:
+            topologies_dict[topology_mask] = partial_topology
+        else:
+            topology = topologies_dict[topology_mask]
+            for hole_group in partial_topology.holes_groups:
+                hole_group.parent_topology = topology
+                topology.append_hole_group(hole_group)
+        if part_registry is not None:
+            for hole_group in partial_topology.holes_groups:
+                part_registry.add_hole_group(hole_group)
+
+    # Processing again the holes groups of the topologies that are NOT independent
+    if dependent_masks:
+        tool_registry = ToolRegistry()
+        for job in part_jobs:
+            process_jobs(job, part_name, topologies_dict, dependent_masks, part_registry, tool_registry)
+
 
 
 
@@ -0,0 +1,96 @@
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import Metrics
+from Json_Backends import read_file
+from Utilities_and_Cosmetics import read_json
+
+"""
+Reading the parts' JSON files (and their technical drawings) ahead, while the current part is being processed.
+
+Reading the files is mostly waiting for the disk or the network (e.g, a network share or OneDrive), so a pool of threads
+reads the next parts while the main thread processes the current one. The parts are still processed by their order,
+one at a time, and everything is printed by the main thread - only the reading is done ahead:
+    1 - The drawings' directory is scanned once, instead of checking if each part's drawing exists.
+    2 - The part's JSON file is read (it's decoded by 'read_json_jobs', which reads only the relevant jobs).
+    3 - The part's technical drawing is read and decoded.
+
+At most 'parts_ahead' parts are read ahead of the processed part, so the memory stays bounded.
+"""
+
+# Number of threads that read the files
+num_threads = 4
+
+
+def scan_drawings(drawings_dir):
+    """ Returns the names of the files in the technical drawings' directory (empty if it doesn't exist) """
+    if drawings_dir is None or not os.path.isdir(drawings_dir):
+        return set()
+    # The names are compared as the file system does (e.g, case-insensitive on Windows)
+    return {os.path.normcase(file_name) for file_name in os.listdir(drawings_dir)}
+
+
+class PrefetchedPart:
+    """
+    A part whose files are being read ahead. The results are waited for only when they are used, so an error in
+    reading a file is raised at the same point as without reading ahead.
+    """
+    def __init__(self, part_path, content_future, drawing_future):
+        self.part_path = part_path
+        self.content_future = content_future  # Reads the part's JSON file - None if the part is not read ahead
+        self.drawing_future = drawing_future  # Reads the drawing's JSON - None if the part has no drawing
+
+    def content(self):
+        """ Returns the content of the part's JSON file (None if it is not read ahead) """
+        if self.content_future is None:
+            return None
+        with Metrics.stage("read_ahead_wait"):
+            return self.content_future.result()
+
+    def drawing(self):
+        """ Returns the part's decoded technical drawing (None if the part has no drawing) """
+        if self.drawing_future is None:
+            return None
+        with Metrics.stage("read_ahead_wait"):
+            return self.drawing_future.result()
+
+
+def read_ahead(parts_paths, drawings_dir=None, parts_ahead=4, read_parts=True):
+    """
+    A generator that yields the parts by their order, while the next parts are read by a pool of threads.
+
+    Args:
+        parts_paths (list): The paths of the parts' JSON files
+        drawings_dir (str): The directory of the technical drawings' JSON files - None for not reading them
+        parts_ahead (int):  Number of parts that are read ahead of the part being processed
+        read_parts (bool):  If False, only the drawings are read ahead (e.g, when the parts are read by the workers)
+
+    Yields:
+        part (PrefetchedPart): The part, whose files are read (or being read)
+    """
+    drawing_names = scan_drawings(drawings_dir)
+    executor = ThreadPoolExecutor(max_workers=num_threads)
+
+    def submit(part_path):
+        """ Starts reading the part's files """
+        content_future = executor.submit(read_file, part_path) if read_parts else None
+        drawing_name = "DRAWING_" + os.path.basename(part_path)
+        drawing_future = None
+        if os.path.normcase(drawing_name) in drawing_names:
+            drawing_future = executor.submit(read_json, os.path.join(drawings_dir, drawing_name))
+        return PrefetchedPart(part_path, content_future, drawing_future)
+
+    try:
+        parts_paths = iter(parts_paths)
+        pending = deque(submit(part_path) for _, part_path in zip(range(parts_ahead + 1), parts_paths))
+        while pending:
+            part = pending.popleft()
+            # Starting to read the next part before the current one is processed
+            next_part_path = next(parts_paths, None)
+            if next_part_path is not None:
+                pending.append(submit(next_part_path))
+            yield part
+    finally:
+        # The reads of the parts that weren't processed (e.g, after an error) are not waited for
+        executor.shutdown(wait=False, cancel_futures=True)
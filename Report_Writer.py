@@ -0,0 +1,242 @@
+import csv
+import json
+import sys
+
+"""
+The report of the topologies, hole groups and holes - written to a buffered file (or to stdout) in one of the formats:
+    "text"  - the human readable report (the same report 'print_stats' used to print)
+    "jsonl" - a JSON record in each line - a record for each topology, hole group and hole
+    "csv"   - a row for each topology, hole group or hole (the deepest record of the detail level)
+
+And in one of the detail levels:
+    "summary" - only the topologies (number of hole groups and holes)
+    "groups"  - the topologies and their hole groups (geometry, centers, diameter and depth)
+    "holes"   - the topologies, hole groups and each hole (tolerances, GD&T, material, thread and jobs)
+
+The report is rendered one hole group at a time - each hole group is written to the file as a single chunk,
+so the output is never held in memory as a whole.
+"""
+
+report_formats = ["text", "jsonl", "csv"]
+detail_levels = ["summary", "groups", "holes"]
+
+bold_s = '\033[1m' # Start to write in bold
+bold_e = '\033[0m' # End to write in bold
+
+# The buffer size of the report file
+buffer_size = 1 << 20
+
+# The fields of a hole in the JSONL and CSV reports - (field name, hole attribute)
+hole_fields = [("diam_tol_exists", "diam_tol_exists"), ("diam_tol_plus", "diam_tol_plus"),
+               ("diam_tol_minus", "diam_tol_minus"), ("depth_tol_exists", "depth_tol_exists"),
+               ("depth_tol_plus", "depth_tol_plus"), ("depth_tol_minus", "depth_tol_minus"),
+               ("gdandt_exists", "gdandt_exists"), ("gdandt_tol_type", "gdandt_tol_type"),
+               ("gdandt_tol_value", "gdandt_tol_value"), ("material", "material"),
+               ("surface_finish", "surface_finish"), ("has_thread", "has_thread"),
+               ("thread_nominal_dia_drawing", "thread_nominal_dia_drawing"),
+               ("thread_pitch_drawing", "thread_pitch_drawing"), ("thread_depth_drawing", "thread_depth_drawing"),
+               ("thread_class_grade", "thread_class_grade")]
+
+
+class ReportWriter:
+    """
+    The base class of the report writers. A writer goes over the topologies, and calls the 'write_*' methods
+    of each record - the subclasses render the records.
+    """
+    def __init__(self, stream, detail="holes"):
+        if detail not in detail_levels:
+            raise ValueError(f"Unknown report detail level: {detail} (expected one of {detail_levels})")
+        self.stream = stream
+        self.detail = detail
+
+    def write_report(self, topologies_dict):
+        """ Writes the report of all the topologies, by their order """
+        self.write_header()
+        for topology in topologies_dict.values():
+            self.write_topology(topology)
+            if self.detail != "summary":
+                for group_index, hole_group in enumerate(topology.holes_groups):
+                    self.write_hole_group(topology, hole_group, group_index + 1)
+            self.write_topology_end(topology)
+
+    def write_header(self):
+        """ Writes the beginning of the report """
+
+    def write_topology(self, topology):
+        """ Writes a topology's record """
+        raise NotImplementedError
+
+    def write_hole_group(self, topology, hole_group, group_index):
+        """ Writes a hole group's record (and its holes' records, in "holes" detail level) """
+        raise NotImplementedError
+
+    def write_topology_end(self, topology):
+        """ Writes the end of a topology's records """
+
+
+class TextReportWriter(ReportWriter):
+    """ Writes the human readable report """
+    def __init__(self, stream, detail="holes", bold=True):
+        super().__init__(stream, detail)
+        self.bold_s, self.bold_e = (bold_s, bold_e) if bold else ("", "")
+
+    def write_topology(self, topology):
+        num_holes = sum(len(hole_group.holes) for hole_group in topology.holes_groups)
+        self.stream.write(f"{self.bold_s}Topology: {topology.topology} | Mask: {topology.topology_mask}{self.bold_e}\n"
+                          f"Total number of hole groups under this topology: {len(topology.holes_groups)}\n"
+                          f"Total number of holes in all hole groups in this topology: {num_holes}\n\n")
+
+    def write_topology_end(self, topology):
+        self.stream.write("\n______________________________________________________\n"
+                          "******************** NEW TOPOLOGY ********************\n"
+                          "______________________________________________________\n\n")
+
+    def write_hole_group(self, topology, hole_group, group_index):
+        lines = [f"Number of instances in Hole Group {group_index}:  {len(hole_group.holes)}\n",
+                 f"Geometry shape: {hole_group.geom_shape}\n",
+                 "Holes centers: {"]
+        separator = ""
+        for x, y, z in hole_group.centers:
+            lines.append(f"{separator}({x}, {y}, {z})")
+            separator = ", "
+        lines.append("}\n")
+        lines.append(f"Diameter: {hole_group.diameter} | Depth: {round(hole_group.hole_depth, 3)}\n")
+
+        if self.detail == "holes":
+            lines.append("\nEach hole, and the jobs performed on it:\n")
+            for hole in hole_group.holes.values():
+                self.hole_lines(hole, lines)
+        lines.append("                NEW HOLE GROUP                 \n"
+                     "*-*-*-*-*-*-*-*-*-*-*-*-*-*-*-*-*-*-*-*-*-*-*-*-\n")
+        self.stream.write("".join(lines))
+
+    @staticmethod
+    def hole_lines(hole, lines):
+        """ Adds the lines of a hole - its tolerances, GD&T, material, thread and jobs """
+        lines.append(f"Hole position at {tuple(float(x) for x in hole.center_coordinates)}\n")
+        if hole.diam_tol_exists:
+            lines.append(f"Diameter tolerance specified is: {hole.diam_tol_plus}+ and {hole.diam_tol_minus}-\n")
+        else:
+            lines.append("Diameter Tolerance is NOT specified\n")
+        if hole.depth_tol_exists:
+            lines.append(f"Depth tolerance specified is:    {hole.depth_tol_plus}+ and {hole.depth_tol_minus}-\n")
+        else:
+            lines.append("Depth Tolerance is NOT specified\n")
+        # GD&T related
+        if hole.gdandt_exists:
+            lines.append(f"GD&T tolerance type is:  {hole.gdandt_tol_type}\n"
+                         f"GD&T tolerance value is: {hole.gdandt_tol_value}\n")
+        else:
+            lines.append("GD&T is NOT specified\n")
+        # Context related
+        lines.append(f"material is:             {hole.material}\n"
+                     f"surface_finish is:       {hole.surface_finish}\n")
+        # Thread related
+        if hole.has_thread:
+            lines.append(f"Thread exists, so printing thread info:\n"
+                         f"thread_nominal_dia_drawing is: {hole.thread_nominal_dia_drawing}\n"
+                         f"thread_pitch_drawing is:       {hole.thread_pitch_drawing}\n"
+                         f"thread_depth_drawing is:       {hole.thread_depth_drawing}\n"
+                         # Below is 6H because it is the standard - otherwise, specified in the technical drawing
+                         f"thread_class_grade is:           {hole.thread_class_grade}\n")
+
+        lines.append("The jobs performed on the hole in the order they were performed:\n")
+        for i, job in enumerate(hole.jobs):
+            lines.append(f"{i + 1} - {job}\n")
+        lines.append("________________________________________________\n")
+
+
+class JsonlReportWriter(ReportWriter):
+    """ Writes a JSON record in each line - the values that aren't JSON types (e.g, numpy numbers) are written as strings """
+    def write_record(self, record, chunk):
+        chunk.append(json.dumps(record, default=str))
+        chunk.append("\n")
+
+    def write_topology(self, topology):
+        chunk = []
+        self.write_record({"record": "topology", "topology": topology.topology, "mask": topology.topology_mask,
+                           "hole_groups": len(topology.holes_groups),
+                           "holes": sum(len(hole_group.holes) for hole_group in topology.holes_groups)}, chunk)
+        self.stream.write("".join(chunk))
+
+    def write_hole_group(self, topology, hole_group, group_index):
+        chunk = []
+        self.write_record({"record": "hole_group", "mask": topology.topology_mask, "group_index": group_index,
+                           "part_name": hole_group.part_name, "instances": len(hole_group.holes),
+                           "geometry": hole_group.geom_shape.to_list(), "centers": list(hole_group.centers),
+                           "diameter": hole_group.diameter, "depth": round(hole_group.hole_depth, 3)}, chunk)
+        if self.detail == "holes":
+            for hole in hole_group.holes.values():
+                record = {"record": "hole", "mask": topology.topology_mask, "group_index": group_index,
+                          "center": [float(x) for x in hole.center_coordinates]}
+                for field, attribute in hole_fields:
+                    record[field] = getattr(hole, attribute)
+                record["jobs"] = [str(job) for job in hole.jobs]
+                self.write_record(record, chunk)
+        self.stream.write("".join(chunk))
+
+
+class CsvReportWriter(ReportWriter):
+    """
+    Writes a row for each record of the deepest level - each row holds the fields of its topology (and hole group).
+    The jobs of a hole are joined by " ; ".
+    """
+    topology_columns = ["topology", "mask", "hole_groups", "holes"]
+    hole_group_columns = ["group_index", "part_name", "instances", "diameter", "depth"]
+    hole_columns = ["center_x", "center_y", "center_z"] + [field for field, attribute in hole_fields] + ["jobs"]
+
+    def __init__(self, stream, detail="holes"):
+        super().__init__(stream, detail)
+        self.writer = csv.writer(stream, lineterminator="\n")
+        self.topology_row = None
+
+    def write_header(self):
+        columns = list(self.topology_columns)
+        if self.detail != "summary":
+            columns += self.hole_group_columns
+        if self.detail == "holes":
+            columns += self.hole_columns
+        self.writer.writerow(columns)
+
+    def write_topology(self, topology):
+        self.topology_row = [topology.topology, topology.topology_mask, len(topology.holes_groups),
+                             sum(len(hole_group.holes) for hole_group in topology.holes_groups)]
+        if self.detail == "summary":
+            self.writer.writerow(self.topology_row)
+
+    def write_hole_group(self, topology, hole_group, group_index):
+        group_row = self.topology_row + [group_index, hole_group.part_name, len(hole_group.holes),
+                                         hole_group.diameter, round(hole_group.hole_depth, 3)]
+        if self.detail == "groups":
+            self.writer.writerow(group_row)
+            return
+        self.writer.writerows(group_row + [float(x) for x in hole.center_coordinates] +
+                              [getattr(hole, attribute) for field, attribute in hole_fields] +
+                              [" ; ".join(str(job) for job in hole.jobs)]
+                              for hole in hole_group.holes.values())
+
+
+report_writers = {"text": TextReportWriter, "jsonl": JsonlReportWriter, "csv": CsvReportWriter}
+
+
+def write_report(topologies_dict, report_path=None, report_format="text", detail="holes"):
+    """
+    This function writes the report of the topologies dictionary.
+
+    Args:
+        topologies_dict (dict): Topologies dictionary that contains all hole groups and holes
+        report_path (str):      The report's file - None for writing to stdout
+        report_format (str):    "text", "jsonl" or "csv"
+        detail (str):           "summary", "groups" or "holes"
+    """
+    if report_format not in report_writers:
+        raise ValueError(f"Unknown report format: {report_format} (expected one of {report_formats})")
+    if report_path is None:
+        report_writers[report_format](sys.stdout, detail).write_report(topologies_dict)
+        return
+    # The ANSI bold codes are written only to the terminal
+    with open(report_path, "w", buffering=buffer_size, newline="") as stream:
+        if report_format == "text":
+            TextReportWriter(stream, detail, bold=False).write_report(topologies_dict)
+        else:
+            report_writers[report_format](stream, detail).write_report(topologies_dict)
@@ -0,0 +1,169 @@
+import os
+import pickle
+
+import Metrics
+from Classes import Hole
+
+"""
+The out-of-core mode - the holes (and the jobs performed on them) of the parts that were processed are spilled to an
+on-disk segment store, so the memory doesn't grow with the corpus.
+
+After a part is processed (and its technical drawing was added), the holes it created or changed are written to the
+store, and are replaced in their hole groups by small references (see 'SpilledHole'). Only what's needed for matching
+the holes of the next parts stays in memory - the topologies, the hole groups (geometry, index by geometry), and the
+holes' centers (and their spatial index, see 'ParallelCentersIndex').
+
+A hole group's holes are then a 'SpilledHoles' dict - the same dict of center -> hole, where:
+    1 - Getting a hole (e.g, when a job of a later part is performed on it) loads it back to memory, until its
+        part is spilled again - a hole that was changed is written again, and its old record is left unused.
+    2 - Going over the holes (e.g, by the report or the feature store export) loads them one at a time, without
+        keeping them - so the report and the export stream the holes from the disk.
+
+The store is a directory of append-only segment files ('segment_00000.bin', ...) - each record holds the holes of a
+hole group that were spilled together, so the jobs they share are written once.
+"""
+
+# A new segment file is started when the current one reaches this size (bytes)
+segment_size = 256 << 20
+
+# The state of a spilled hole - all its attributes but the pointer to its hole group (which stays in memory)
+hole_state_slots = [slot for slot in Hole.__slots__ if slot != "parent_hole_group"]
+
+
+class SpilledRecord:
+    """ The place of a record in the segment store - shared by the holes that were spilled together """
+    __slots__ = ("segment", "offset", "size")
+
+    def __init__(self, segment, offset, size):
+        self.segment = segment
+        self.offset = offset
+        self.size = size
+
+
+class SpilledHole:
+    """ A reference to a hole that was spilled - its record, and its index in the record """
+    __slots__ = ("record", "index")
+
+    def __init__(self, record, index):
+        self.record = record
+        self.index = index
+
+
+class SegmentStore:
+    """
+    An append-only store of records, in segment files in a directory.
+    The segments of a previous run in the same directory are removed.
+    """
+    def __init__(self, store_dir):
+        os.makedirs(store_dir, exist_ok=True)
+        for file_name in os.listdir(store_dir):
+            if file_name.startswith("segment_") and file_name.endswith(".bin"):
+                os.remove(os.path.join(store_dir, file_name))
+        self.store_dir = store_dir
+        self.segment = -1           # The segment that is written
+        self.writer = None
+        self.readers = {}           # segment -> its file, opened for reading
+        self.cached_record = None   # The last record that was read, and its holes' states
+        self.cached_states = None
+        self.start_segment()
+
+    def segment_path(self, segment):
+        return os.path.join(self.store_dir, f"segment_{segment:05d}.bin")
+
+    def start_segment(self):
+        """ Starts writing a new segment file """
+        if self.writer is not None:
+            self.writer.close()
+        self.segment += 1
+        self.writer = open(self.segment_path(self.segment), "wb")
+
+    def append(self, data):
+        """ Writes a record, and returns its place (SpilledRecord) """
+        if self.writer.tell() and self.writer.tell() + len(data) > segment_size:
+            self.start_segment()
+        record = SpilledRecord(self.segment, self.writer.tell(), len(data))
+        self.writer.write(data)
+        return record
+
+    def read(self, record):
+        """ Returns the data of a record """
+        if record.segment == self.segment:
+            self.writer.flush()  # The record may still be in the writer's buffer
+        reader = self.readers.get(record.segment)
+        if reader is None:
+            reader = self.readers[record.segment] = open(self.segment_path(record.segment), "rb")
+        reader.seek(record.offset)
+        return reader.read(record.size)
+
+    def spill_holes(self, hole_group, holes):
+        """
+        This method writes holes of a hole group to the store, and replaces them in the hole group by references.
+
+        Args:
+            hole_group (HoleGroup): The hole group
+            holes (dict):           The holes to spill - center -> Hole
+        """
+        if not isinstance(hole_group.holes, SpilledHoles):
+            hole_group.holes = SpilledHoles(self, hole_group, hole_group.holes)
+        states = [tuple(getattr(hole, slot) for slot in hole_state_slots) for hole in holes.values()]
+        record = self.append(pickle.dumps(states, protocol=pickle.HIGHEST_PROTOCOL))
+        for index, center in enumerate(holes):
+            dict.__setitem__(hole_group.holes, center, SpilledHole(record, index))
+        if Metrics.enabled:
+            Metrics.count("holes_spilled", len(states))
+
+    def load_hole(self, spilled_hole, hole_group):
+        """ Returns a new Hole of a spilled hole - the holes of the last record that was read are kept decoded """
+        if spilled_hole.record is not self.cached_record:
+            self.cached_states = pickle.loads(self.read(spilled_hole.record))
+            self.cached_record = spilled_hole.record
+        hole = Hole.__new__(Hole)
+        hole.parent_hole_group = hole_group
+        for slot, value in zip(hole_state_slots, self.cached_states[spilled_hole.index]):
+            setattr(hole, slot, value)
+        if Metrics.enabled:
+            Metrics.count("spilled_holes_loaded")
+        return hole
+
+
+class SpilledHoles(dict):
+    """
+    The holes of a hole group that has spilled holes - center -> Hole, or SpilledHole for a hole that is on the disk.
+    Getting a spilled hole loads it back (and keeps it), and going over the values or items loads the spilled holes
+    one at a time (without keeping them).
+    """
+    __slots__ = ("store", "hole_group")
+
+    def __init__(self, store, hole_group, holes):
+        super().__init__(holes)
+        self.store = store
+        self.hole_group = hole_group
+
+    def __getitem__(self, center):
+        hole = dict.__getitem__(self, center)
+        if type(hole) is SpilledHole:
+            # The hole may be changed (e.g, a job is added to it), so it stays in memory until it's spilled again
+            hole = self.store.load_hole(hole, self.hole_group)
+            dict.__setitem__(self, center, hole)
+        return hole
+
+    def get(self, center, default=None):
+        return self[center] if center in self else default
+
+    def values(self):
+        for hole in dict.values(self):
+            yield self.store.load_hole(hole, self.hole_group) if type(hole) is SpilledHole else hole
+
+    def items(self):
+        for center, hole in dict.items(self):
+            yield center, self.store.load_hole(hole, self.hole_group) if type(hole) is SpilledHole else hole
+
+
+def spill_part(store, part_registry):
+    """
+    This function spills the holes of a part that was processed - all the holes the part created or changed are in
+    its registry (see 'PartRegistry').
+    """
+    with Metrics.stage("spill_part"):
+        for hole_group, holes in part_registry.holes_groups.items():
+            store.spill_holes(hole_group, holes)
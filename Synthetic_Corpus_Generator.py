@@ -0,0 +1,373 @@
+import argparse
+import json
+import os
+import random
+
+"""
+A generator of synthetic CAM exports - '.PRT.ML.json' files of parts and their 'DRAWING_*.json' technical drawings,
+in the same format as the real ones (see 'JSONs/MultipleMACs_2.PRT.ML.json').
+
+Each part is a box shaped stock. Its holes groups are drilled from the MACs on the box's faces, where every two
+opposite faces are parallel MACs (see 'home_vParallelHomeNumbers'). Thru holes may also be worked from the parallel
+MAC, so the same holes are found by jobs of both MACs - like in the real parts.
+The generator is deterministic - the same settings and seed always generate the same corpus.
+
+The corpus is written as:
+    <output_dir>/JSONs/<part>.PRT.ML.json
+    <output_dir>/Tech_Drawing_JSONs/DRAWING_<part>.PRT.ML.json
+    <output_dir>/corpus_manifest.json   - the settings, and the number of parts, jobs, holes groups and holes
+"""
+
+# The topologies the holes groups are generated from - topology type -> the segments of the hole's profile, from
+# the hole's entry to its bottom (1 - plane, 2 - cylinder, 3 - cone)
+topologies = {
+    "HR_hwSimpleThru": [2],
+    "HR_hwCounterBoreThru": [2, 1, 2],
+    "HR_hwCounterSinkThru": [3, 2],
+    "HR_hwTappedThru": [2],
+    "HR_hwSimpleBlind": [2, 3],
+}
+blind_topologies = ["HR_hwSimpleBlind"]
+tapped_topologies = ["HR_hwTappedThru"]
+
+# The holes' diameters - drawn from standard drill sizes, so holes groups of different parts share geometries
+diameters = [3.3, 4.2, 5.0, 5.5, 6.8, 8.5, 10.2, 13.0]
+thread_pitches = {3.3: 0.7, 4.2: 0.8, 5.0: 1.0, 5.5: 1.0, 6.8: 1.25, 8.5: 1.5, 10.2: 1.75, 13.0: 2.0}
+
+position_formats = ["VFrmt_XY", "VFrmt_P3Str_P3End_V3Dir"]
+
+# The MACs on the stock's faces - (home number, parallel home number, x axis, y axis, z axis, face).
+# The z axis points out of the stock, and the MAC's origin is the center of its face
+macs = [
+    (1, 2, (1, 0, 0), (0, 1, 0), (0, 0, 1), "top"),
+    (2, 1, (1, 0, 0), (0, -1, 0), (0, 0, -1), "bottom"),
+    (3, 4, (0, 1, 0), (0, 0, 1), (1, 0, 0), "right"),
+    (4, 3, (0, -1, 0), (0, 0, 1), (-1, 0, 0), "left"),
+    (5, 6, (1, 0, 0), (0, 0, 1), (0, -1, 0), "front"),
+    (6, 5, (-1, 0, 0), (0, 0, 1), (0, 1, 0), "back"),
+]
+
+
+def mac_origin(face, stock_size):
+    """ Returns the origin of a MAC - the center of its face. The stock's top face is at z=0 """
+    length, width, height = stock_size
+    return {"top": (0.0, 0.0, 0.0), "bottom": (0.0, 0.0, -height),
+            "right": (length / 2, 0.0, -height / 2), "left": (-length / 2, 0.0, -height / 2),
+            "front": (0.0, -width / 2, -height / 2), "back": (0.0, width / 2, -height / 2)}[face]
+
+
+def mac_thickness(face, stock_size):
+    """ Returns the thickness of the stock along a MAC's z axis - the depth of its thru holes """
+    length, width, height = stock_size
+    return {"top": height, "bottom": height, "right": length, "left": length, "front": width, "back": width}[face]
+
+
+def home_matrix(mac, stock_size):
+    """
+    This function builds the 'home_matrix' of a MAC - the MAC's axes, and the translation vector that
+    'rotation_translation' (MACs_Conversions.py) expects, so that: CAD point = rotation * (MAC point - translation).
+    """
+    home_number, parallel_home_number, x_axis, y_axis, z_axis, face = mac
+    origin = mac_origin(face, stock_size)
+    matrix = []
+    for axis in (x_axis, y_axis, z_axis):
+        matrix += [float(value) for value in axis] + [-sum(a * o for a, o in zip(axis, origin))]
+    return [value + 0.0 for value in matrix] + [0.0, 0.0, 0.0, 1.0]
+
+
+def to_mac(point, mac, stock_size):
+    """ Transforms a CAD point to a MAC's coordinate system """
+    home_number, parallel_home_number, x_axis, y_axis, z_axis, face = mac
+    relative = [p - o for p, o in zip(point, mac_origin(face, stock_size))]
+    return tuple(round(sum(a * r for a, r in zip(axis, relative)), 4) + 0.0 for axis in (x_axis, y_axis, z_axis))
+
+
+def to_cad(point, mac, stock_size):
+    """ Transforms a point in a MAC's coordinate system to the CAD coordinate system """
+    home_number, parallel_home_number, x_axis, y_axis, z_axis, face = mac
+    origin = mac_origin(face, stock_size)
+    return tuple(o + point[0] * x + point[1] * y + point[2] * z
+                 for o, x, y, z in zip(origin, x_axis, y_axis, z_axis))
+
+
+def shape_poly(segments, radius, depth, blind_depth):
+    """ Builds the '_geom_ShapePoly' of a hole - its profile (radius, -depth) from the entry to the bottom """
+    big_radius = round(radius * 1.8, 3)
+    if segments == [2]:
+        points = [(radius, 0.0), (radius, -depth)]
+    elif segments == [2, 1, 2]:
+        cbore_depth = round(min(radius * 1.2, depth / 3), 3)
+        points = [(big_radius, 0.0), (big_radius, -cbore_depth), (radius, -cbore_depth), (radius, -depth)]
+    elif segments == [3, 2]:
+        csink_depth = round(big_radius - radius, 3)
+        points = [(big_radius, 0.0), (radius, -csink_depth), (radius, -depth)]
+    else:  # [2, 3] - blind hole with a drill point
+        points = [(radius, 0.0), (radius, -blind_depth), (0.0, round(-blind_depth - 0.6 * radius, 3))]
+    return [{"p0": [p0[0], p0[1]], "p1": [p1[0], p1[1]], "type": "line"} for p0, p1 in zip(points, points[1:])]
+
+
+def reverse_shape_poly(shape, depth):
+    """ Returns the profile of a thru hole as it's seen from the parallel MAC """
+    return [{"p0": [segment["p1"][0], round(-depth - segment["p1"][1], 3) + 0.0],
+             "p1": [segment["p0"][0], round(-depth - segment["p0"][1], 3) + 0.0], "type": segment["type"]}
+            for segment in shape[::-1]]
+
+
+def tool(tool_type, diameter, pitch=None):
+    """ Builds a job's 'tool' field """
+    length_parameters = [{"name": "AD", "unit": "mm", "value": diameter}, {"name": "D", "unit": "mm", "value": diameter},
+                         {"name": "SD", "unit": "mm", "value": diameter}, {"name": "SL", "unit": "mm", "value": 30.0},
+                         {"name": "TL", "unit": "mm", "value": 80.0}]
+    parameters = [{"name": "HelicalAngle", "value": 45.0}, {"name": "SA", "value": 0.0}]
+    if tool_type == "TOOL_SPOT":
+        parameters.insert(0, {"name": "A", "value": 90.0})
+    elif tool_type == "TOOL_DRILL":
+        parameters.insert(0, {"name": "A", "value": 118.0})
+    elif tool_type == "TOOL_THREAD_MILL":
+        length_parameters += [{"name": "MajorDiameter", "unit": "mm", "value": diameter},
+                              {"name": "Pitch", "unit": "mm", "value": pitch}]
+    return {"lengthParameters": length_parameters, "manufacturer": "SYNTHETIC", "mfc_catalog_number": "0",
+            "parameters": parameters, "tool_description": tool_type.lower(), "tool_type": tool_type, "ver": 1}
+
+
+def holes_group_info(topology_type, segments, shape, centers, positions_format, depth, fastener_size):
+    """ Builds a holes group of 'recognized_holes_groups' - the centers are in the job's MAC coordinate system """
+    positions = []
+    for x, y, z in centers:
+        if positions_format == "VFrmt_XY":
+            positions += [x, y]
+        else:
+            positions += [x, y, z, x, y, z - depth, 0.0, 0.0, -1.0]
+    mask = int("".join(str(segment) for segment in segments[::-1]))
+    return {"_fastener_size": fastener_size, "_geomShapeMask": float(mask), "_geom_ShapePoly": shape,
+            "_geom_depth": depth, "_geom_first_Cylinder_diameter": 2 * shape[0]["p0"][0],
+            "_geom_positions": positions, "_geom_thread_depth": 0.0, "_geom_thread_hole_diameter": 0.0,
+            "_geom_thread_pitch": 0.0, "_geom_upper_level": 0.0, "_group_id": "", "_positions_format": positions_format,
+            "_standard": "ANSI Metric", "_tech_delta_depth": 0.0, "_tech_depth": depth,
+            "_tech_depth_type": "DrMCT_CutterTip", "_tech_depth_type_val": 0.0, "_tech_is_half_depth": False,
+            "_tech_positions": positions, "_tech_upper_level": 0.0, "_topology_type": topology_type}
+
+
+class PartGenerator:
+    """
+    An object of this class generates the jobs and the drawing of a single part.
+    """
+    def __init__(self, rng, part_name, settings):
+        self.rng = rng
+        self.part_name = part_name
+        self.settings = settings
+        self.stock_size = (rng.choice([120.0, 200.0, 300.0]), rng.choice([80.0, 150.0, 250.0]),
+                           rng.choice([20.0, 30.0, 50.0]))
+        self.macs = macs[:2 * settings["mac_pairs"]]
+        self.jobs = []
+        self.holes_callout = []
+        self.num_groups = 0
+        self.num_holes = 0
+
+    def add_job(self, job_type, name, job_tool, mac, groups, job_depth, poly_arcs=None):
+        """ Adds a job, with all the fields of a real job (and a tool path of the configured size) """
+        job_number = len(self.jobs) + 1
+        job = {"coolant": {"Machine": {"Flood": 1, "Mist": 0}, "Turret": {"Flood": 1, "Through_Tool": 0}},
+               "drill": None,
+               "geometry": {"name": name, "poly_arcs": poly_arcs, "recognized_holes_groups": groups, "type": "",
+                            "usage_index": 0, "vals": [], "vals_type": "VFrmt_XY", "ver": 1},
+               "home_MAC": mac[0], "home_matrix": home_matrix(mac, self.stock_size), "home_number": mac[0],
+               "home_position": 1, "home_vParallelHomeNumbers": [mac[1]], "job_depth": job_depth,
+               "job_feed": 300.0, "job_feed_unit": "mm/min", "job_file_name": f"JA{job_number:05d}",
+               "job_group_name": "", "job_holeWzrd_id": 0, "job_is_from_HR": False, "job_machine_type": "MILLING",
+               "job_number": job_number, "job_spin": 3500.0, "job_spin_unit": "rpm", "job_upper_level": 0.0,
+               "max_feed": 12700.0, "max_power": 15.0, "max_spin": 10000.0, "name": name,
+               "operation_parameters": None, "rapid": 19050.0,
+               "thread_mill": None, "tool": job_tool,
+               "toolPath": [[round(self.rng.uniform(-100, 100), 3) for _ in range(3)]
+                            for _ in range(self.settings["tool_path_points"])],
+               "type": job_type, "ver": 1}
+        if job_type in ("NC_DRILL_OLD", "NC_DRILL_DEEP", "NC_THREAD", "NC_DRILL_HR", "NC_JOB_MW_DRILL_5X"):
+            job["drill"] = {"cycle": {"drill_type": "ORD_DRILL", "gcode_name": "G81", "gui_name": "G81", "params": {},
+                                      "ver": 1},
+                            "cycle_isUsing": True, "depth_diameter_value": job_tool["lengthParameters"][1]["value"],
+                            "depth_is_cutter_tip": False, "depth_is_full_diameter": True,
+                            "depth_is_tool_Diameter": False}
+        if job_type == "NC_THREAD":
+            job["thread_mill"] = {"thread_type": "internal", "ver": 1}
+        if job_type in ("NC_PROFILE", "NC_CHAMFER"):
+            job["operation_parameters"] = {"offset": 0.0, "ver": 1}
+        self.jobs.append(job)
+
+    def add_holes_group(self, group_number):
+        """ Adds a holes group, the jobs that are performed on it, and (maybe) its hole callout """
+        rng, settings = self.rng, self.settings
+        topology_type = rng.choice(settings["topologies"])
+        segments = topologies[topology_type]
+        diameter = rng.choice(diameters)
+        radius = diameter / 2
+        mac = rng.choice(self.macs)
+        thickness = mac_thickness(mac[5], self.stock_size)
+        blind = topology_type in blind_topologies
+        blind_depth = round(rng.uniform(radius * 2, thickness * 0.7), 1)
+        shape = shape_poly(segments, radius, thickness, blind_depth)
+        depth = round(-min(min(segment["p0"][1], segment["p1"][1]) for segment in shape), 3) if blind else thickness
+        positions_format = rng.choice(settings["position_formats"])
+        fastener_size = f"M{round(diameter + 1)}"
+
+        # The holes' centers on the MAC's face, kept away from the face's edges
+        length, width, height = self.stock_size
+        face_size = {"top": (length, width), "bottom": (length, width), "right": (width, height),
+                     "left": (width, height), "front": (length, height), "back": (length, height)}[mac[5]]
+        centers = set()
+        while len(centers) < settings["holes_per_group"]:
+            centers.add((round(rng.uniform(-face_size[0] / 2 + diameter, face_size[0] / 2 - diameter), 2),
+                         round(rng.uniform(-face_size[1] / 2 + diameter, face_size[1] / 2 - diameter), 2), 0.0))
+        centers = sorted(centers)
+        group = lambda: [holes_group_info(topology_type, segments, shape, centers, positions_format, depth,
+                                          fastener_size)]
+
+        # The jobs of the holes group - spot drilling, drilling, (threading), and more drilling jobs
+        self.add_job("NC_DRILL_OLD", f"spot{group_number}", tool("TOOL_SPOT", diameter), mac, group(), 0.5)
+        drill_types = ["NC_DRILL_OLD", "NC_DRILL_DEEP", "NC_DRILL_HR", "NC_JOB_MW_DRILL_5X"]
+        for job_index in range(max(1, settings["drill_jobs_per_group"])):
+            self.add_job(rng.choice(drill_types), f"drill{group_number}_{job_index}", tool("TOOL_DRILL", diameter),
+                         mac, group(), depth)
+        if topology_type in tapped_topologies:
+            pitch = thread_pitches[diameter]
+            self.add_job("NC_THREAD", f"thread{group_number}", tool("TOOL_THREAD_MILL", diameter + pitch, pitch), mac,
+                         group(), round(depth - 2, 3))
+
+        # Thru holes may also be worked from the parallel MAC - the same holes, seen from the other face
+        if not blind and rng.random() < settings["parallel_ratio"]:
+            parallel_mac = next(other_mac for other_mac in macs if other_mac[0] == mac[1])
+            holes = centers[:max(1, len(centers) // 2)]
+            parallel_centers = [to_mac(to_cad((x, y, -depth), mac, self.stock_size), parallel_mac, self.stock_size)
+                                for x, y, z in holes]
+            poly_arcs = [[{"c": [x, y], "r": radius, "sweep": 6.283185307179586, "type": "arc"}]
+                         for x, y, z in parallel_centers]
+            parallel_group = holes_group_info(topology_type, segments[::-1], reverse_shape_poly(shape, depth),
+                                              parallel_centers, "VFrmt_XY", depth, fastener_size)
+            self.add_job(rng.choice(["NC_PROFILE", "NC_CHAMFER"]), f"contour{group_number}",
+                         tool("TOOL_END_MILL", diameter), parallel_mac, [parallel_group], 1.0, poly_arcs)
+
+        # The hole callout - usually the whole group, sometimes only part of it
+        if rng.random() < settings["callout_ratio"]:
+            quantity = len(centers) if rng.random() < 0.8 else max(1, len(centers) - 1)
+            tapped = topology_type in tapped_topologies
+            self.holes_callout.append({
+                "quantity": str(quantity), "diameter": str(diameter), "depth": str(depth) if blind else "0",
+                "drawing_specific_tol_plus": rng.choice([0, 0, 0.02]), "drawing_specific_tol_minus": 0,
+                "has_thread": 1 if tapped else 0,
+                "thread_nominal_diameter": str(round(diameter + thread_pitches[diameter], 2)) if tapped else None,
+                "thread_pitch": str(thread_pitches[diameter]) if tapped else None,
+                "thread_depth": str(round(depth - 2, 3)) if tapped else None,
+                "thread_class_grade": "6H" if tapped else None,
+                "gdandt_type": rng.choice([None, "position"]), "gdandt_value": "0.05"})
+
+        self.num_groups += 1
+        self.num_holes += len(centers)
+
+    def generate(self):
+        """ Returns the part's JSON and its drawing's JSON """
+        for group_number in range(self.settings["groups_per_part"]):
+            self.add_holes_group(group_number)
+        # Jobs that aren't performed on holes - they are skipped by 'read_json_jobs'
+        for job_index in range(self.settings["other_jobs_per_part"]):
+            self.add_job("NC_POCKET", f"pocket{job_index}", tool("TOOL_END_MILL", 10.0), self.macs[0], [], 5.0)
+
+        part = {"admin_data": {"computer_name": "SYNTHETIC", "user_name": "synthetic"}, "client_id": "not yet",
+                "event_data": {"jobs": self.jobs,
+                               "part": {"folder": "", "iM_machine": "", "iM_material": "", "is_inch": False,
+                                        "name": self.part_name.split(".")[0], "ver": 1},
+                               "user": {"ver": 1}, "vmid": {"post_name": "gMilling_3x", "ver": 1}},
+                "event_name": "close_part", "format": 0.0, "timestamp": "0"}
+        drawing = {"material": self.rng.choice(["AL6061", "AL7075", "STEEL_1045", "SS304"]),
+                   "surface_finish": self.rng.choice(["0.8", "1.6", "3.2"]),
+                   "hole_general_tol_flag": self.rng.choice(["0", "1"]),
+                   "hole_upper_general_tolerance": "0.1", "hole_lower_general_tolerance": "-0.05",
+                   "linear_general_tol_flag": self.rng.choice(["0", "1"]),
+                   "linear_upper_general_tolerance": "0.2", "linear_lower_general_tolerance": "-0.2",
+                   "gdandt_general_flag": self.rng.choice(["0", "1"]), "global_gdandt_type": "position",
+                   "global_gdandt_value": "0.2", "holes_callout": self.holes_callout}
+        return part, drawing
+
+
+def generate_corpus(output_dir, num_parts=10, groups_per_part=20, holes_per_group=4, drill_jobs_per_group=1,
+                    other_jobs_per_part=2, mac_pairs=1, parallel_ratio=0.5, callout_ratio=0.7, drawings_ratio=0.9,
+                    position_formats=position_formats, topologies=list(topologies), tool_path_points=50, seed=0):
+    """
+    This function generates a synthetic corpus of parts and their technical drawings.
+
+    Args:
+      output_dir (str):            The corpus' directory - created if it doesn't exist
+      num_parts (int):             Number of parts
+      groups_per_part (int):       Number of holes groups in each part
+      holes_per_group (int):       Number of holes in each holes group
+      drill_jobs_per_group (int):  Number of drilling jobs performed on each holes group (after the spot drilling)
+      other_jobs_per_part (int):   Number of jobs in each part that aren't performed on holes
+      mac_pairs (int):             Number of pairs of parallel MACs (1 to 3) the holes are drilled from
+      parallel_ratio (float):      The fraction of the thru holes groups that are also worked from the parallel MAC
+      callout_ratio (float):       The fraction of the holes groups that have a hole callout in the drawing
+      drawings_ratio (float):      The fraction of the parts that have a technical drawing
+      position_formats (list):     The '_positions_format' values the holes groups are generated with
+      topologies (list):           The topology types the holes groups are generated from (see 'topologies')
+      tool_path_points (int):      Number of points in each job's tool path (affects the size of the files only)
+      seed (int):                  The random seed
+
+    Returns:
+      manifest (dict): The settings, and the number of parts, jobs, holes groups and holes that were generated
+    """
+    settings = {"num_parts": num_parts, "groups_per_part": groups_per_part, "holes_per_group": holes_per_group,
+                "drill_jobs_per_group": drill_jobs_per_group, "other_jobs_per_part": other_jobs_per_part,
+                "mac_pairs": min(max(mac_pairs, 1), len(macs) // 2), "parallel_ratio": parallel_ratio,
+                "callout_ratio": callout_ratio, "drawings_ratio": drawings_ratio,
+                "position_formats": list(position_formats), "topologies": list(topologies),
+                "tool_path_points": tool_path_points, "seed": seed}
+    jsons_dir = os.path.join(output_dir, "JSONs")
+    drawings_dir = os.path.join(output_dir, "Tech_Drawing_JSONs")
+    os.makedirs(jsons_dir, exist_ok=True)
+    os.makedirs(drawings_dir, exist_ok=True)
+
+    rng = random.Random(seed)
+    manifest = {"settings": settings, "parts": 0, "jobs": 0, "holes_groups": 0, "holes": 0, "drawings": 0}
+    for part_index in range(num_parts):
+        part_name = f"SYNTH_{part_index:05d}.PRT.ML.json"
+        part_generator = PartGenerator(rng, part_name, settings)
+        part, drawing = part_generator.generate()
+        with open(os.path.join(jsons_dir, part_name), "w") as file:
+            json.dump(part, file)
+        if rng.random() < drawings_ratio:
+            with open(os.path.join(drawings_dir, "DRAWING_" + part_name), "w") as file:
+                json.dump(drawing, file)
+            manifest["drawings"] += 1
+
+        manifest["parts"] += 1
+        manifest["jobs"] += len(part_generator.jobs)
+        manifest["holes_groups"] += part_generator.num_groups
+        manifest["holes"] += part_generator.num_holes
+
+    with open(os.path.join(output_dir, "corpus_manifest.json"), "w") as file:
+        json.dump(manifest, file, indent=1)
+    return manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generates a synthetic corpus of CAM exports and technical drawings")
+    parser.add_argument("output_dir")
+    parser.add_argument("--parts", type=int, default=10)
+    parser.add_argument("--groups-per-part", type=int, default=20)
+    parser.add_argument("--holes-per-group", type=int, default=4)
+    parser.add_argument("--drill-jobs-per-group", type=int, default=1)
+    parser.add_argument("--other-jobs-per-part", type=int, default=2)
+    parser.add_argument("--mac-pairs", type=int, default=1, help="pairs of parallel MACs (1 to 3)")
+    parser.add_argument("--parallel-ratio", type=float, default=0.5)
+    parser.add_argument("--position-formats", nargs="+", default=position_formats, choices=position_formats)
+    parser.add_argument("--topologies", nargs="+", default=list(topologies), choices=list(topologies))
+    parser.add_argument("--tool-path-points", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    corpus_manifest = generate_corpus(args.output_dir, args.parts, args.groups_per_part, args.holes_per_group,
+                                      args.drill_jobs_per_group, args.other_jobs_per_part, args.mac_pairs,
+                                      args.parallel_ratio, position_formats=args.position_formats,
+                                      topologies=args.topologies, tool_path_points=args.tool_path_points,
+                                      seed=args.seed)
+    print(f"Generated {corpus_manifest['parts']} parts, {corpus_manifest['jobs']} jobs, "
+          f"{corpus_manifest['holes_groups']} holes groups and {corpus_manifest['holes']} holes "
+          f"in {args.output_dir}")
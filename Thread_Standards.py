@@ -0,0 +1,135 @@
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+
+"""
+Resolving the standard of a thread by the nominal diameter and the pitch of the tool that cuts it.
+
+The known standards are:
+    ISO Metric (coarse and fine pitches) - e.g, "M8.0_x_1.25"
+    Unified Coarse (UNC) and Unified Fine (UNF) - e.g, "UNC_1/4-20", "UNF_#10-32"
+
+Each standard's table is sorted by the nominal diameter, so only the diameters within the tolerance of the tool's
+diameter are checked (found by binary search), and the result of each (diameter, pitch, unit) is memoized - a tool is
+resolved once, no matter how many holes it threads.
+"""
+
+mm_per_inch = 25.4
+
+# Allowed differences between the tool's values and the table's values
+diameter_tolerance = 0.2   # mm
+pitch_tolerance = 0.05     # mm
+tpi_tolerance = 0.5        # threads per inch
+
+# Known ISO Metric thread table (coarse and fine pitches) - nominal diameter (mm) -> pitches (mm)
+metric_threads = {
+    1.2: [0.25], 1.4: [0.3], 1.6: [0.35], 2.0: [0.4], 2.2: [0.45], 2.5: [0.45], 3.0: [0.5], 3.5: [0.6], 4.0: [0.7],
+    5.0: [0.8], 6.0: [1.0], 7.0: [1.0], 8.0: [1.25, 1.0], 10.0: [1.5, 1.25, 1.0], 12.0: [1.75, 1.5, 1.25],
+    14.0: [2.0, 1.5], 16.0: [2.0, 1.5], 18.0: [2.5, 2.0, 1.5], 20.0: [2.5, 2.0, 1.5], 22.0: [2.5, 2.0, 1.5],
+    24.0: [3.0, 2.0], 27.0: [3.0, 2.0], 30.0: [3.5, 2.0], 33.0: [3.5, 2.0], 36.0: [4.0, 3.0], 39.0: [4.0, 3.0, 2.0],
+    42.0: [4.5, 3.0], 45.0: [4.5], 48.0: [5.0], 52.0: [5.0, 3.0], 56.0: [5.5, 4.0], 60.0: [5.5, 4.0],
+    64.0: [6.0, 4.0], 68.0: [6.0], 72.0: [6.0, 4.0], 80.0: [6.0, 4.0], 90.0: [6.0, 4.0], 100.0: [6.0, 4.0]
+}
+
+# Known Unified thread tables - (size, nominal diameter (inch), threads per inch)
+unc_threads = [
+    ("#1", 0.073, 64), ("#2", 0.086, 56), ("#3", 0.099, 48), ("#4", 0.112, 40), ("#5", 0.125, 40), ("#6", 0.138, 32),
+    ("#8", 0.164, 32), ("#10", 0.190, 24), ("#12", 0.216, 24), ("1/4", 0.250, 20), ("5/16", 0.3125, 18),
+    ("3/8", 0.375, 16), ("7/16", 0.4375, 14), ("1/2", 0.500, 13), ("9/16", 0.5625, 12), ("5/8", 0.625, 11),
+    ("3/4", 0.750, 10), ("7/8", 0.875, 9), ("1", 1.000, 8), ("1-1/8", 1.125, 7), ("1-1/4", 1.250, 7),
+    ("1-3/8", 1.375, 6), ("1-1/2", 1.500, 6), ("1-3/4", 1.750, 5), ("2", 2.000, 4.5)
+]
+unf_threads = [
+    ("#0", 0.060, 80), ("#1", 0.073, 72), ("#2", 0.086, 64), ("#3", 0.099, 56), ("#4", 0.112, 48), ("#5", 0.125, 44),
+    ("#6", 0.138, 40), ("#8", 0.164, 36), ("#10", 0.190, 32), ("#12", 0.216, 28), ("1/4", 0.250, 28),
+    ("5/16", 0.3125, 24), ("3/8", 0.375, 24), ("7/16", 0.4375, 20), ("1/2", 0.500, 20), ("9/16", 0.5625, 18),
+    ("5/8", 0.625, 18), ("3/4", 0.750, 16), ("7/8", 0.875, 14), ("1", 1.000, 12), ("1-1/8", 1.125, 12),
+    ("1-1/4", 1.250, 12), ("1-3/8", 1.375, 12), ("1-1/2", 1.500, 12)
+]
+
+# The units of the tools' length parameters
+mm_units = ("mm",)
+inch_units = ("inch", "in")
+
+
+class ThreadTable:
+    """
+    A thread standard's table, sorted by the nominal diameter (in mm). Each entry is
+    (nominal diameter (mm), pitch (mm), name) - the entries of the same diameter keep the table's order.
+    """
+    def __init__(self, entries):
+        self.entries = sorted(entries, key=lambda entry: entry[0])
+        self.diameters = [entry[0] for entry in self.entries]
+
+    def candidates(self, diameter):
+        """ Returns the entries whose diameter may be within the tolerance of the given diameter """
+        # The range is slightly wider than the tolerance - the exact check is done by the caller
+        start = bisect_left(self.diameters, diameter - diameter_tolerance - 1e-9)
+        end = bisect_right(self.diameters, diameter + diameter_tolerance + 1e-9)
+        return self.entries[start:end]
+
+
+def build_metric_table():
+    """ Returns the ISO Metric table - the entries' names are their nominal diameters (e.g, 8.0 for M8) """
+    return ThreadTable([(dia, pitch, dia) for dia, pitches in metric_threads.items() for pitch in pitches])
+
+
+def build_unified_table(threads):
+    """ Returns a Unified table - the diameters and pitches are converted to mm, and the names are (size, TPI) """
+    return ThreadTable([(dia * mm_per_inch, mm_per_inch / tpi, (size, tpi)) for size, dia, tpi in threads])
+
+
+metric_table = build_metric_table()
+unified_tables = [("UNC", build_unified_table(unc_threads)), ("UNF", build_unified_table(unf_threads))]
+
+
+def resolve_metric(diameter, pitch, tool_pitch):
+    """
+    Returns the ISO Metric standard of the thread, or None if it isn't one.
+    The last matching entry is used (as the table is checked by the order of the diameters), and the standard
+    is named by the tool's pitch.
+    """
+    standard = None
+    for dia, table_pitch, name in metric_table.candidates(diameter):
+        if abs(diameter - dia) < diameter_tolerance and abs(pitch - table_pitch) < pitch_tolerance:
+            standard = f"M{name}_x_{tool_pitch}"
+    return standard
+
+
+def resolve_unified(diameter, pitch):
+    """ Returns the Unified (UNC or UNF) standard of the thread, or None if it isn't one """
+    tpi = mm_per_inch / pitch
+    for series, table in unified_tables:
+        for dia, table_pitch, (size, table_tpi) in table.candidates(diameter):
+            if abs(diameter - dia) < diameter_tolerance and abs(tpi - table_tpi) < tpi_tolerance:
+                return f"{series}_{size}-{table_tpi}"
+    return None
+
+
+@lru_cache(maxsize=None)
+def resolve_thread_standard(nominal_diameter, pitch, unit):
+    """
+    This function finds the standard of a thread by the tool's nominal diameter and pitch.
+    ISO Metric is checked first for tools in mm, and the Unified standards are checked first for tools in inches.
+
+    Args:
+        nominal_diameter (float): The tool's nominal diameter
+        pitch (float):            The tool's pitch - for tools in inches, either the pitch or the threads per inch
+        unit (str):               The unit of the tool's length parameters ("mm" or "inch")
+
+    Returns:
+        standard (str): The thread's standard (e.g, "M8.0_x_1.25" or "UNC_1/4-20"), or None if it wasn't found
+    """
+    if nominal_diameter is None or pitch is None or pitch <= 0:
+        return None
+
+    if unit in mm_units:
+        return resolve_metric(nominal_diameter, pitch, pitch) or resolve_unified(nominal_diameter, pitch)
+
+    if unit in inch_units:
+        # A pitch of 1 inch or more is given as threads per inch
+        pitch_mm = mm_per_inch / pitch if pitch >= 1 else pitch * mm_per_inch
+        diameter_mm = nominal_diameter * mm_per_inch
+        return (resolve_unified(diameter_mm, pitch_mm) or
+                resolve_metric(diameter_mm, pitch_mm, round(pitch_mm, 3)))
+
+    return None
@@ -1,21 +1,246 @@
 import json
 import os
 import re
+from bisect import bisect_left, bisect_right
 import math
+import zlib
 from enum import Enum
 from types import NoneType
 
+from Json_Backends import current_backend, load_file, read_file
+
 # Global Variables
 drilling_types = ["NC_DRILL_OLD", "NC_DRILL_DEEP", "NC_THREAD", "NC_DRILL_HR", "NC_JOB_MW_DRILL_5X"]
 non_drilling_types = ["NC_PROFILE", "NC_CHAMFER", "NC_JOB_HSS_PARALLEL_TO_CURVE"]
 
 
-# A function for reading JSON files
+# The fields of a job that are being used for validating and processing it - all the other fields are skipped.
+# For the "geometry" field, only its subfields that are being used are read
+job_fields = {"drill": None, "geometry": {"poly_arcs": None, "recognized_holes_groups": None}, "home_matrix": None,
+              "home_number": None, "home_vParallelHomeNumbers": None, "job_depth": None, "job_number": None,
+              "name": None, "operation_parameters": None, "thread_mill": None, "tool": None, "type": None}
+
+# Regular expressions used for scanning JSON text without decoding it
+whitespace_re = re.compile(r'[ \t\n\r]*')
+string_pattern = r'"[^"\\]*(?:\\.[^"\\]*)*"'
+string_re = re.compile(string_pattern, re.DOTALL)
+# The content of a flat array/object - scalars and strings, without brackets
+flat_content_pattern = r'[^"\[\]{}]*(?:' + string_pattern + r'[^"\[\]{}]*)*'
+
+
+def array_or_object_pattern(content_pattern):
+    """ Returns the pattern of an array or an object with the given content """
+    return r'\[' + content_pattern + r'\]|\{' + content_pattern + r'\}'
+
+
+# The content of an array/object whose items are scalars, strings, or flat arrays/objects (e.g, a tool path of points)
+nested_content_pattern = (flat_content_pattern + '(?:(?:' + array_or_object_pattern(flat_content_pattern) + ')' +
+                          flat_content_pattern + ')*')
+# Groups: 1 - string, or an array/object nested up to 2 levels (brackets inside strings are ignored),
+#         2 - opening, 3 - closing
+value_pattern = string_pattern + '|' + array_or_object_pattern(nested_content_pattern)
+brackets_re = re.compile('(' + value_pattern + r')|([\[{])|([\]}])', re.DOTALL)
+scalar_re = re.compile(r'[^,\]}\s]+')
+json_decoder = json.JSONDecoder()
+
+
+# A function for reading JSON files - with the selected JSON backend (see 'Json_Backends.py')
 def read_json(file_path):
-    with open(file_path, 'r') as file:
-        data = json.load(file)
-    return data
+    return load_file(file_path)
+
+
+def read_json_jobs(file_path, job_types, content=None):
+    """
+    A generator that reads the jobs of a part's JSON file ("event_data" -> "jobs") one at a time.
 
+    Unlike 'read_json', only the relevant parts are decoded - the rest of the JSON (e.g., "admin_data", "coolant",
+    "toolPath") is only scanned over:
+    1 - Jobs that their type is not in job_types are skipped without decoding them.
+    2 - Only the fields in 'job_fields' are decoded.
+    3 - Each distinct tool (the "tool" field) is decoded once - the jobs that use the same tool share its dict,
+        so it should not be changed (see 'ToolRegistry' in Classes.py).
+    With a JSON backend that decodes whole files (see 'Json_Backends.py'), the file is decoded at once instead, and
+    the same jobs and fields are taken from it (see 'project_json_jobs').
+
+    Args:
+        file_path (str):  The path of the part's JSON file
+        job_types (list): The types of the jobs of interest
+        content (bytes):  The content of the file, if it was already read (see 'Read_Ahead.py')
+
+    Yields:
+        job (dict): The job's relevant fields
+    """
+    if content is None:
+        content = read_file(file_path)
+    backend = current_backend()
+    if backend.decodes_whole:
+        yield from project_json_jobs(backend.loads(content), job_types, backend.dumps)
+        return
+    text = content.decode("utf-8")
+    tools = {}  # The tool's JSON text -> the decoded tool
+
+    # Going over the fields of the JSON until the jobs list
+    pos = find_object_field(text, skip_whitespace(text, 0), "event_data")
+    if pos is None:
+        raise KeyError("event_data")
+    pos = find_object_field(text, pos, "jobs")
+    if pos is None:
+        raise KeyError("jobs")
+
+    # Going over the jobs list
+    if text[pos:pos + 1] != "[":
+        raise json.JSONDecodeError("Expecting '['", text, pos)
+    pos = skip_whitespace(text, pos + 1)
+    if text[pos:pos + 1] == "]":
+        return
+    while True:
+        job_spans, pos = scan_object_fields(text, pos, job_fields)
+
+        # Checking the job's type first, so irrelevant jobs are not decoded at all
+        if "type" in job_spans and decode_spans(text, job_spans["type"]) in job_types:
+            yield {field: decode_shared(text, span, tools) if field == "tool" else decode_spans(text, span)
+                   for field, span in job_spans.items()}
+
+        pos = skip_whitespace(text, pos)
+        if text[pos:pos + 1] == "]":
+            return
+        if text[pos:pos + 1] != ",":
+            raise json.JSONDecodeError("Expecting ',' delimiter", text, pos)
+        pos = skip_whitespace(text, pos + 1)
+
+
+def project_json_jobs(data, job_types, encode):
+    """
+    A generator that yields the jobs of a decoded part's JSON - the same jobs and fields as 'read_json_jobs'.
+
+    Args:
+        data (dict):         The decoded JSON
+        job_types (list):    The types of the jobs of interest
+        encode (function):   Encodes a value to JSON - the jobs whose tools have the same JSON share the tool's dict
+
+    Yields:
+        job (dict): The job's relevant fields
+    """
+    tools = {}  # The tool's JSON -> the tool
+    for job in data["event_data"]["jobs"]:
+        if job.get("type") in job_types:
+            job = project_fields(job, job_fields)
+            if "tool" in job:
+                job["tool"] = tools.setdefault(encode(job["tool"]), job["tool"])
+            yield job
+
+
+def project_fields(value, fields):
+    """ Returns the given fields of a decoded JSON object, by their order in it (see 'scan_object_fields') """
+    return {key: project_fields(field_value, fields[key])
+            if fields[key] is not None and isinstance(field_value, dict) else field_value
+            for key, field_value in value.items() if key in fields}
+
+
+def skip_whitespace(text, pos):
+    """ Returns the position of the first non-whitespace character from pos """
+    return whitespace_re.match(text, pos).end()
+
+
+def skip_value(text, pos):
+    """ Returns the position right after the JSON value that starts at pos, without decoding it """
+    char = text[pos:pos + 1]
+    if char == '"':
+        match = string_re.match(text, pos)
+        if match is None:
+            raise json.JSONDecodeError("Unterminated string", text, pos)
+        return match.end()
+    if char == "[" or char == "{":
+        # Counting brackets (brackets inside strings are ignored) until the value is closed
+        depth = 0
+        for match in brackets_re.finditer(text, pos):
+            group = match.lastindex
+            if group == 1 and depth == 0:
+                return match.end()  # The whole value is an array/object that is nested up to 2 levels
+            elif group == 2:
+                depth += 1
+            elif group == 3:
+                depth -= 1
+                if depth == 0:
+                    return match.end()
+        raise json.JSONDecodeError("Unterminated value", text, pos)
+    match = scalar_re.match(text, pos)
+    if match is None:
+        raise json.JSONDecodeError("Expecting value", text, pos)
+    return match.end()
+
+
+def scan_object_fields(text, pos, fields, stop_field=None):
+    """
+    Scans the JSON object that starts at pos, and finds where the values of the given fields are.
+    The other fields' values are skipped over.
+
+    Args:
+        text (str):       The JSON text
+        pos (int):        The position where the object starts
+        fields (dict):    Maps each field to its subfields that should be read (a dict), or to None for the whole value
+        stop_field (str): If given, stops scanning when reaching this field
+
+    Returns:
+        spans (dict): Maps each field that was found to the (start, end) of its value - or, if subfields are given
+                      and the value is an object, to the spans of the subfields. If stop_field was found, it is
+                      mapped to (start, None)
+        pos (int):    The position right after the object - or, if stop_field was found, where its value starts
+    """
+    if text[pos:pos + 1] != "{":
+        raise json.JSONDecodeError("Expecting '{'", text, pos)
+    spans = {}
+    pos = skip_whitespace(text, pos + 1)
+    if text[pos:pos + 1] == "}":
+        return spans, pos + 1
+    while True:
+        if text[pos:pos + 1] != '"':
+            raise json.JSONDecodeError("Expecting property name enclosed in double quotes", text, pos)
+        key, pos = json.decoder.scanstring(text, pos + 1)
+        pos = skip_whitespace(text, pos)
+        if text[pos:pos + 1] != ":":
+            raise json.JSONDecodeError("Expecting ':' delimiter", text, pos)
+        value_start = skip_whitespace(text, pos + 1)
+        if key == stop_field:
+            spans[key] = (value_start, None)  # The value itself is not scanned
+            return spans, value_start
+
+        if key in fields and fields[key] is not None and text[value_start:value_start + 1] == "{":
+            spans[key], pos = scan_object_fields(text, value_start, fields[key])
+        else:
+            pos = skip_value(text, value_start)
+            if key in fields:
+                spans[key] = (value_start, pos)
+
+        pos = skip_whitespace(text, pos)
+        if text[pos:pos + 1] == "}":
+            return spans, pos + 1
+        if text[pos:pos + 1] != ",":
+            raise json.JSONDecodeError("Expecting ',' delimiter", text, pos)
+        pos = skip_whitespace(text, pos + 1)
+
+
+def find_object_field(text, pos, field):
+    """ Returns where the value of the field starts in the JSON object that starts at pos, or None if it's missing """
+    spans, pos = scan_object_fields(text, pos, {}, stop_field=field)
+    return pos if field in spans else None
+
+
+def decode_spans(text, spans):
+    """ Decodes the JSON value in the given span (start, end), or the values in a dict of spans """
+    if isinstance(spans, dict):
+        return {field: decode_spans(text, span) for field, span in spans.items()}
+    value, end = json_decoder.raw_decode(text, spans[0])
+    return value
+
+
+def decode_shared(text, span, decoded_values):
+    """ Decodes the JSON value in the given span - values with the same JSON text are decoded once, and shared """
+    value_text = text[span[0]:span[1]]
+    value = decoded_values.get(value_text)
+    if value is None:
+        value = decoded_values[value_text] = decode_spans(text, span)
+    return value
 
 
 def process_job_name(job_type: str) -> str:
@@ -72,14 +297,14 @@ def topology_sort(topology_type: str):
 
 
 
-def adding_global_info(topologies_dict: dict, tech_data):
+def adding_global_info(part_registry, tech_data):
     """
-    This function adds the following information:
+    This function adds the following information to the holes of the part:
     - Global Diameter and Depth Tolerances (if exists)
     - Global GD&T (if exists)
     - Material
     Args:
-        topologies_dict (dict): Topologies dictionary that contains all hole groups and holes
+        part_registry (PartRegistry): Holds the hole groups and holes of the part
         tech_data       (dict): Holds all the hole callouts and global information about tolerancs and such
     Returns:
         hole_gen_tol   (float): The diameter tolerance that will be used for comparison
@@ -102,26 +327,26 @@ def adding_global_info(topologies_dict: dict, tech_data):
         glob_gdandt_value  = float(tech_data.get("global_gdandt_value"))
 
     ### Adding Global Attributes - Tolerances and Material ###
-    # Go over all holes, and add the global attributes - tolerances and material
-    for topology in topologies_dict.values():
-        for hole_group in topology.holes_groups:
-            for hole in hole_group.holes.values():
-                # Fill material attribute
-                hole.material = str(tech_data.get("material"))
-                hole.surface_finish = str(tech_data.get("surface_finish"))
-                # Fill global tolerances and GD&T only if exists in drawing
-                if global_diam_flag:  # Diameter Tolerances
-                    hole.diam_tol_exists = 1
-                    hole.diam_tol_plus = hole_up_gen_tol
-                    hole.diam_tol_minus = hole_lower_gen_tol
-                if global_depth_flag:  # Depth Tolerances
-                    hole.depth_tol_exists = 1
-                    hole.depth_tol_plus = lin_up_gen_tol
-                    hole.depth_tol_minus = lin_lower_gen_tol
-                if global_gdandt_flag:  # GD&T
-                    hole.gdandt_exists = 1
-                    hole.gdandt_tol_type = glob_gdandt_type
-                    hole.gdandt_tol_value = glob_gdandt_value
+    # Go over the holes of the part, and add the global attributes - tolerances and material
+    material = str(tech_data.get("material"))
+    surface_finish = str(tech_data.get("surface_finish"))
+    for hole in part_registry.holes():
+        # Fill material attribute
+        hole.material = material
+        hole.surface_finish = surface_finish
+        # Fill global tolerances and GD&T only if exists in drawing
+        if global_diam_flag:  # Diameter Tolerances
+            hole.diam_tol_exists = 1
+            hole.diam_tol_plus = hole_up_gen_tol
+            hole.diam_tol_minus = hole_lower_gen_tol
+        if global_depth_flag:  # Depth Tolerances
+            hole.depth_tol_exists = 1
+            hole.depth_tol_plus = lin_up_gen_tol
+            hole.depth_tol_minus = lin_lower_gen_tol
+        if global_gdandt_flag:  # GD&T
+            hole.gdandt_exists = 1
+            hole.gdandt_tol_type = glob_gdandt_type
+            hole.gdandt_tol_value = glob_gdandt_value
 
     # Defining the general tolerances I'll be using for comparison to be the bigger of the two tolerance (+ or -)
     if global_diam_flag:  # Diameter tolerance
@@ -138,25 +363,92 @@ def adding_global_info(topologies_dict: dict, tech_data):
 
 
 
-def process_tech_drawing_json(tech_drawing_jsons_dir_path: str, part_name: str, topologies_dict: dict):
+class HoleGroupsDiameterIndex:
     """
-    Reads the technical drawing JSON and updates the Hole attributes in the topologies_dict.
+    An index of hole groups sorted by their diameter, and then by their depth - used for finding the hole groups that
+    match a hole callout of a technical drawing (see 'process_tech_drawing_json') by binary search.
+    It is built once, and queried for every hole callout.
 
-    Matching Logic:
-    1. Matches a Drawing Entry to a Hole Group via Diameter and Depth.
-    2. Matches specific Holes within that Group via Quantity and Job Count (descending).
+    Args:
+        holes_groups (list): The hole groups to index, by their order in the topologies dictionary
     """
-    # Construct file path
-    file_path = os.path.join(tech_drawing_jsons_dir_path, part_name)
-    # Validation: Check if file exists
-    if not os.path.exists(file_path):
-        print(f"Warning: Technical drawing file not found at {file_path}")
-        return
-    # Loading the JSON file
-    tech_data = read_json(file_path)
+    def __init__(self, holes_groups):
+        # Sorting the hole groups by (diameter, depth), keeping their given order
+        entries = [(hole_group.diameter, hole_group.hole_depth, order, hole_group)
+                   for order, hole_group in enumerate(holes_groups)]
+        entries.sort(key=lambda entry: entry[:3])
+
+        self.diameters = [entry[0] for entry in entries]  # list: the hole groups' diameters - sorted
+        self.depths = [entry[1] for entry in entries]     # list: the hole groups' depths - sorted within each diameter
+        self.orders = [entry[2] for entry in entries]     # list: the hole groups' orders in the topologies dictionary
+        self.groups = [entry[3] for entry in entries]     # list: the hole groups
+
+        # The start index of each distinct diameter (and the end of the last one) - for searching by depth
+        self.diameter_starts = [i for i in range(len(entries)) if i == 0 or self.diameters[i] != self.diameters[i - 1]]
+        self.diameter_starts.append(len(entries))
+
+    def query(self, diameter, diameter_tol, depth=None, depth_tol=None):
+        """
+        This method finds the hole groups whose diameter is within diameter_tol of the given diameter, and if a depth
+        is given, whose depth is within depth_tol of it.
 
-    # Adding global information to every hole
-    hole_gen_tol, depth_gen_tol = adding_global_info(topologies_dict, tech_data)
+        Returns:
+            matching_groups (list): The matching hole groups, by their order in the topologies dictionary
+        """
+        # The binary search windows are a bit wider, and then the exact tolerance checks are used
+        margin = 1e-9 * (abs(diameter) + diameter_tol + 1)
+        first = bisect_left(self.diameters, diameter - diameter_tol - margin)
+        last = bisect_right(self.diameters, diameter + diameter_tol + margin)
+
+        matches = []
+        if depth is None:
+            for i in range(first, last):
+                if abs(diameter - self.diameters[i]) <= diameter_tol:
+                    matches.append(i)
+        else:
+            # Searching by depth inside each distinct diameter in the window
+            depth_margin = 1e-9 * (abs(depth) + depth_tol + 1)
+            start_index = bisect_right(self.diameter_starts, first) - 1
+            for start, end in zip(self.diameter_starts[start_index:], self.diameter_starts[start_index + 1:]):
+                if start >= last:
+                    break
+                if abs(diameter - self.diameters[start]) > diameter_tol:
+                    continue
+                depth_first = bisect_left(self.depths, depth - depth_tol - depth_margin, start, end)
+                depth_last = bisect_right(self.depths, depth + depth_tol + depth_margin, start, end)
+                for i in range(depth_first, depth_last):
+                    if abs(depth - self.depths[i]) <= depth_tol:
+                        matches.append(i)
+
+        matches.sort(key=self.orders.__getitem__)
+        return [self.groups[i] for i in matches]
+
+
+def process_tech_drawing_json(tech_drawing_jsons_dir_path: str, part_name: str, topologies_dict: dict, part_registry,
+                              tech_data=None):
+    """
+    Reads the technical drawing JSON and updates the attributes of the part's holes (the ones in part_registry).
+    The JSON is read from the file, unless it was already read and given as tech_data (see 'Read_Ahead.py').
+
+    Matching Logic:
+    1. Matches a Drawing Entry to one of the part's Hole Groups via Diameter and Depth.
+    2. Matches specific Holes of the part within that Group via Quantity and Job Count (descending).
+    """
+    if tech_data is None:
+        # Construct file path
+        file_path = os.path.join(tech_drawing_jsons_dir_path, part_name)
+        # Validation: Check if file exists
+        if not os.path.exists(file_path):
+            print(f"Warning: Technical drawing file not found at {file_path}")
+            return
+        # Loading the JSON file
+        tech_data = read_json(file_path)
+
+    # Adding global information to every hole of the part
+    hole_gen_tol, depth_gen_tol = adding_global_info(part_registry, tech_data)
+
+    # Indexing the part's hole groups by diameter and depth once, for matching all the hole callouts
+    diameter_index = HoleGroupsDiameterIndex(part_registry.sorted_holes_groups(topologies_dict))
 
     ### Adding Specific Attributes Found in Technical Drawing - Threads, Tolerances, GD&T ###
     # Going over all hole callouts found in the technical drawing
@@ -189,32 +481,25 @@ def process_tech_drawing_json(tech_drawing_jsons_dir_path: str, part_name: str,
         exact_qty_candidates = []  # Stores best match where Group Size == Drawing Qty
         sufficient_qty_candidates = []  # Stores fallback match where Group Size > Drawing Qty
 
-        # 3. Search ALL groups to find valid candidates
-        for topology in topologies_dict.values():
-            for hole_group in topology.holes_groups:
-
-                # --- Geometric Filter ---
-
-                # 1. Diameter Check (Always applies)
-                delta_diameter = abs(drawing_diameter - hole_group.diameter)
-                if delta_diameter > hole_gen_tol:
-                    continue  # Skip this group when Diameter mismatch
-
-                # 2. Depth Check (Conditional)
-                # If drawing has depth (Priority 1 & 2 logic), we check tolerance.
-                # If drawing depth is 0 (Priority 3 & 4 logic), we IGNORE depth check.
-                if drawing_depth > 0:
-                    delta_depth = abs(drawing_depth - hole_group.hole_depth)
-                    if delta_depth > depth_gen_tol:
-                        continue  # Skip: Depth mismatch when depth is required
-
-                # If we reach here, the group is Geometrically Valid (Diameter + Depth/Ignored)
-                # --- Quantity Prioritization ---
-                group_size = len(hole_group.holes)
-                if group_size == drawing_quantity:
-                    exact_qty_candidates.append(hole_group)
-                elif group_size > drawing_quantity:
-                    sufficient_qty_candidates.append(hole_group)
+        # 3. Search the index for the geometrically valid groups
+        # --- Geometric Filter ---
+        # 1. Diameter Check (Always applies)
+        # 2. Depth Check (Conditional)
+        # If drawing has depth (Priority 1 & 2 logic), we check tolerance.
+        # If drawing depth is 0 (Priority 3 & 4 logic), we IGNORE depth check.
+        if drawing_depth > 0:
+            matching_groups = diameter_index.query(drawing_diameter, hole_gen_tol, drawing_depth, depth_gen_tol)
+        else:
+            matching_groups = diameter_index.query(drawing_diameter, hole_gen_tol)
+
+        for hole_group in matching_groups:
+            # If we reach here, the group is Geometrically Valid (Diameter + Depth/Ignored)
+            # --- Quantity Prioritization ---
+            group_size = len(part_registry.holes_groups[hole_group])
+            if group_size == drawing_quantity:
+                exact_qty_candidates.append(hole_group)
+            elif group_size > drawing_quantity:
+                sufficient_qty_candidates.append(hole_group)
 
         # 4. Selection Logic
         # This structure automatically satisfies our 4-tier priority:
@@ -231,7 +516,7 @@ def process_tech_drawing_json(tech_drawing_jsons_dir_path: str, part_name: str,
         if target_group:
             # If quantity < size of hole group, then I first pick the holes with more jobs
             # Sort holes by job count (Heuristic: complex holes have more jobs)
-            current_holes = list(target_group.holes.values())
+            current_holes = part_registry.part_holes(target_group)
             current_holes.sort(key=lambda h: len(h.jobs), reverse=True)
 
             # Select the top N holes
@@ -313,123 +598,254 @@ def process_tech_drawing_json(tech_drawing_jsons_dir_path: str, part_name: str,
 #     # I can access the strings by using: "Mask(number 1-4).name"
 
 
-def validate_job(job, part_name):
+# Validation rules - each rule is (field path, check, error message).
+# The checks are:
+#   "not_none"           - the field exists and it's not None
+#   "not_empty"          - the field exists, it's not None and it's not empty
+#   "positive"           - the field exists, it's not None and it's bigger than 0
+#   ("min_len", n)       - the field exists, it's not None and it has at least n elements
+#   ("len", n)           - the field exists, it's not None and it has exactly n elements
+#   ("no_value", value)  - none of the field's values equals value (skipped if the field is None)
+# A rule on a subfield (e.g., "tool.tool_type") is skipped if its parent field is None - the parent's rule reports it.
+#
+# *Note - the order of the rules is similar to the order of the fields on the JSON
+
+# Rules that are common to every job
+common_job_rules = [
+    ("home_matrix", ("len", 16), "home matrix field is invalid"),
+    ("job_depth", "not_none", "job depth field is invalid"),
+    ("name", "not_none", "name field is invalid"),
+    ("tool", "not_none", "tool field is invalid"),
+    ("tool.lengthParameters", "not_none", "lengthParameters field is invalid"),
+    ("tool.parameters", "not_none", "parameters field is invalid"),
+    ("tool.tool_type", "not_none", "tool_type field is invalid"),
+    ("type", "not_none", "type field is invalid"),
+]
+
+# Rules of each job type - they are added to the common rules
+drilling_job_rules = [
+    ("drill", "not_empty", "drill field is invalid"),
+    ("geometry", "not_none", "geometry field is invalid"),
+    ("geometry.recognized_holes_groups", "not_none",
+     "recognized_holes_groups field is invalid OR it's a pre-drilling operation"),
+]
+non_drilling_job_rules = [
+    ("geometry", "not_none", "geometry field is invalid"),
+    ("geometry.recognized_holes_groups", "not_none",
+     "recognized_holes_groups field is invalid OR this operation isn't performed on holes"),
+]
+contour_job_rules = [
+    ("geometry", "not_none", "geometry field is invalid"),
+    ("geometry.poly_arcs", "not_empty", "geometry.poly_arcs field is invalid"),
+    ("operation_parameters", "not_none", "operation_parameters field is invalid"),
+    ("operation_parameters", ("no_value", "Unsupported type"), "Unsupported type found in operation_parameters"),
+    ("geometry.recognized_holes_groups", "not_none",
+     "recognized_holes_groups field is invalid OR this operation isn't performed on holes"),
+]
+# Rules of job types that do not have rules of their own
+default_job_rules = [
+    ("geometry", "not_none", "geometry field is invalid"),
+]
+job_type_rules = {
+    "NC_DRILL_OLD": drilling_job_rules,
+    "NC_DRILL_DEEP": drilling_job_rules,
+    "NC_DRILL_HR": drilling_job_rules,
+    "NC_JOB_MW_DRILL_5X": drilling_job_rules,
+    "NC_THREAD": drilling_job_rules + [("thread_mill", "not_empty", "thread_mill field is invalid")],
+    "NC_PROFILE": contour_job_rules,
+    "NC_CHAMFER": contour_job_rules,
+    "NC_JOB_HSS_PARALLEL_TO_CURVE": non_drilling_job_rules,
+}
+
+# Rules of every holes group in 'recognized_holes_groups'
+common_holes_group_rules = [
+    ("_geom_depth", "not_none", "_geom_depth field is invalid"),
+    ("_geom_thread_depth", "not_none", "_geom_thread_depth field is invalid"),
+    ("_geom_thread_hole_diameter", "not_none", "_geom_thread_hole_diameter field is invalid"),
+    ("_geom_thread_pitch", "not_none", "_geom_thread_pitch field is invalid"),
+    ("_geom_upper_level", "not_none", "_geom_upper_level field is invalid"),
+    ("_geomShapeMask", "positive", "_geomShapeMask field is invalid"),
+    ("_geom_ShapePoly", "not_empty", "_geom_ShapePoly field is invalid"),
+    ("_positions_format", "not_empty", "_positions_format field is invalid"),
+    ("_topology_type", "not_empty", "_topology_type field is invalid"),
+    ("_tech_positions", ("min_len", 2), "_tech_positions field is invalid"),
+]
+
+# Rules of the holes groups of each job type - they are added to the common rules
+holes_group_type_rules = {
+    "NC_JOB_MW_DRILL_5X": [
+        ("_tech_depth", "not_none", "_tech_depth field is invalid"),
+        ("_tech_depth_type", "not_empty", "_tech_depth_type field is invalid"),
+        ("_tech_depth_type_val", "not_none", "_tech_depth_type_val field is invalid"),
+    ],
+}
+
+# Validation modes:
+#   "strict"  - every job is validated
+#   "sampled" - only 1 out of every 'validation_sample_rate' jobs is validated (chosen deterministically)
+#   "off"     - no job is validated
+validation_modes = ["strict", "sampled", "off"]
+validation_sample_rate = 10
+
+# Holds the validators of each job type - they are built on first use
+compiled_validators = {}
+
+
+def compile_rule(field_path, check):
     """
-    This function purpose is for verifying that all the JSON fields that are being used are either:
-    1 - Existing
-    2 - Not None
-    3 - Bigger than 0
-    If any mistakes are found, it prints information about them
-
-    *Note - the order of the fields on this code are similar to the order of the fields on the JSON
+    This function builds a single validation rule into a check function over 'data' (a job or a holes group).
+    The function returns True if the check passes, and gets every field only once.
 
     Args:
-        job (dict): Holds all the fields of the job
-        part_name (str): The name of the part
+        field_path (str):   The path of the field, where subfields are separated by "."
+        check (str/tuple):  The check that the field's value should pass
+
+    Returns:
+        rule_check (function): The rule's check function
     """
+    *parents, field = field_path.split(".")
+    check_name, check_arg = check if isinstance(check, tuple) else (check, None)
+
+    # The checks of the field, over its parent's data
+    if check_name == "not_none":
+        def field_check(data):
+            return data.get(field) is not None
+    elif check_name == "not_empty":
+        def field_check(data):
+            return (value := data.get(field)) is not None and len(value) != 0
+    elif check_name == "positive":
+        def field_check(data):
+            return (value := data.get(field)) is not None and value > 0
+    elif check_name == "min_len":
+        def field_check(data):
+            return (value := data.get(field)) is not None and len(value) >= check_arg
+    elif check_name == "len":
+        def field_check(data):
+            return (value := data.get(field)) is not None and len(value) == check_arg
+    elif check_name == "no_value":
+        def field_check(data):
+            return (value := data.get(field)) is None or check_arg not in value.values()
+    else:
+        raise ValueError(f"Unknown validation check: {check_name}")
 
-    errors = []           # A list that will keep all the invalid lines
-    job_type = None       # A string that will keep the job's type
+    if not parents:
+        return field_check
 
-    # Checking the fields that are common to every job
-    if job.get("home_matrix") is None or len(job["home_matrix"])!=16:
-        errors.append("home matrix field is invalid")                     # Checking if home_matrix contain 16 values
-    if job.get("job_depth") is None:
-        errors.append("job depth field is invalid")                       # Checking job_depth field
-    if job.get("name") is None:
-        errors.append("name field is invalid")                            # Checking name field
+    # Getting to the field through its parents - if a parent is None the rule passes (the parent's rule reports it)
+    def rule_check(data):
+        for parent in parents:
+            data = data.get(parent)
+            if data is None:
+                return True
+        return field_check(data)
+    return rule_check
 
-    if job.get("tool") is None:
-        errors.append("tool field is invalid")                            # Checking tool field
-    else:
-        tool_subfields = ["lengthParameters", "parameters", "tool_type"]  # Checking subfields of tool
-        for tool_subfield in tool_subfields:
-            if job["tool"].get(tool_subfield) is None:
-                errors.append(f"{tool_subfield} field is invalid")
 
-    if job.get("type") is None:
-        errors.append("type field is invalid")                            # Checking type field
-    else:
-        job_type = job.get("type")
+def compile_validator(job_type):
+    """
+    This function builds the validation rules of a job type into check functions.
+    Valid jobs only go through 2 fast functions - one for the job's fields and one for all its holes groups.
+    Only if one of them fails, the rules are checked one by one for finding the invalid fields.
 
-    # True if it's one of the Drilling jobs - they all should have valid 'drill' field
-    if job_type in drilling_types:
-        if job.get("drill") is None or len(job.get("drill")) == 0:
-            errors.append("drill field is invalid")                        # Checking drill field
+    Args:
+        job_type (str): The type of the job
 
-    # Checking 'geometry' field and many of his subfields
-    if job.get("geometry") is None:
-        errors.append("geometry field is invalid")                          # Checking geometry field
-    else:
-        # True if it's Profile or Chamfer job - they should have a valid 'poly_arcs' field
-        if job_type in ["NC_PROFILE", "NC_CHAMFER"]:
-            geometry = job["geometry"]
-            if geometry.get("poly_arcs") is None or len(geometry.get("poly_arcs"))==0:   # Checking poly_arcs field
-                errors.append("geometry.poly_arcs field is invalid")
-            if job.get("operation_parameters") is None:                        # Checking operation_parameters field
-                errors.append("operation_parameters field is invalid")
-            elif "Unsupported type" in job.get("operation_parameters").values(): # Checking if there is a value with "Unsupported type"
-                errors.append("Unsupported type found in operation_parameters")
-
-        if job["geometry"].get("recognized_holes_groups") is None:                        # Checking recognized_holes_groups field
-            if job_type in drilling_types:
-                errors.append("recognized_holes_groups field is invalid OR it's a pre-drilling operation")
-            if job_type in non_drilling_types:
-                errors.append("recognized_holes_groups field is invalid OR this operation isn't performed on holes")
-
-        else: # Going over on all the holes groups in the job
-            for holes_group_info in job['geometry']["recognized_holes_groups"]:
-
-                # Checking if the following fields are not None
-                fields_not_none = ["_geom_depth", "_geom_thread_depth", "_geom_thread_hole_diameter", "_geom_thread_pitch", "_geom_upper_level"]
-                for field in fields_not_none:
-                    if holes_group_info.get(field) is None:
-                        errors.append(f"{field} field is invalid")
-
-                # Checking if the following fields are not None nor equals 0
-                if holes_group_info.get("_geomShapeMask") is None or holes_group_info.get("_geomShapeMask")<=0:
-                    errors.append(f"_geomShapeMask field is invalid")
-
-                fields_not_none_or_zero = ["_geom_ShapePoly", "_positions_format", "_topology_type"]
-                for field in fields_not_none_or_zero:
-                    if holes_group_info.get(field) is None or len(holes_group_info.get(field)) == 0:
-                        errors.append(f"{field} field is invalid")
-
-                # Checking _tech_positions field - it should contain at least 2 elements
-                if holes_group_info.get("_tech_positions") is None or len(holes_group_info.get("_tech_positions"))<2:
-                    errors.append("_tech_positions field is invalid")
-
-                # True if it's a Multi-Axis drilling job
-                if job_type == "NC_JOB_MW_DRILL_5X":
-                    if holes_group_info.get("_tech_depth") is None:
-                        errors.append("_tech_depth field is invalid")          # Checking _tech_depth field
-                    if holes_group_info.get("_tech_depth_type") is None or len(holes_group_info.get("_tech_depth_type"))==0:
-                        errors.append("_tech_depth_type field is invalid")     # Checking _tech_depth_type field
-                    if holes_group_info.get("_tech_depth_type_val") is None:
-                        errors.append("_tech_depth_type_val field is invalid") # Checking _tech_depth_type_val field
-
-                # True if it's a Thread Milling Job
-                elif job_type == "NC_THREAD":
-                    if job.get("thread_mill") is None or len(job.get("thread_mill")) == 0:
-                        errors.append("thread_mill field is invalid")
-
-                    # # Checking again the thread fields, but also checking if their value is not zero
-                    # # Note - the next 'for loop' will result in error if one of the fields are zero
-                    # fields_not_none = ["_geom_thread_depth", "_geom_thread_diameter", "_geom_thread_pitch"]
-                    # for field in fields_not_none:
-                    #     if holes_group_info.get(field) is None or holes_group_info.get(field) == 0:
-                    #         errors.append(f"{field} field is invalid")
-
-    # Printing the errors if there are any
-    if errors:
-        # print("\n")
-        print(f"Job name: {job['name']} | Job type: {job['type']} | Job number: ({job["job_number"]}) | Part name:{part_name}")
-        for error in errors:
-            print(error)
-        print("\n")
+    Returns:
+        job_check (function):          Returns True if all the job's fields are valid
+        holes_groups_check (function): Returns True if all the fields of all the given holes groups are valid
+        job_checks (list):             (field path, message, check function) of every job rule
+        holes_group_checks (list):     (field path, message, check function) of every holes group rule
+    """
+    job_rules = common_job_rules + job_type_rules.get(job_type, default_job_rules)
+    holes_group_rules = common_holes_group_rules + holes_group_type_rules.get(job_type, [])
+    job_checks = [(field_path, message, compile_rule(field_path, check)) for field_path, check, message in job_rules]
+    holes_group_checks = [(field_path, message, compile_rule(field_path, check))
+                          for field_path, check, message in holes_group_rules]
+    job_rule_checks = [rule_check for _, _, rule_check in job_checks]
+    holes_group_rule_checks = [rule_check for _, _, rule_check in holes_group_checks]
+
+    def job_check(data):
+        return all(rule_check(data) for rule_check in job_rule_checks)
+
+    def holes_groups_check(holes_groups_info):
+        return all(rule_check(data) for data in holes_groups_info for rule_check in holes_group_rule_checks)
 
+    return job_check, holes_groups_check, job_checks, holes_group_checks
 
 
+def validate_job(job, part_name, mode="strict"):
+    """
+    This function purpose is for verifying that all the JSON fields that are being used are either:
+    1 - Existing
+    2 - Not None
+    3 - Bigger than 0
+    The fields are checked by the rules of the job's type (built once per job type).
 
+    Args:
+        job (dict):       Holds all the fields of the job
+        part_name (str):  The name of the part
+        mode (str):       The validation mode - "strict", "sampled" or "off"
 
+    Returns:
+        errors (list): An error record (dict) for every invalid field - empty if the job is valid
+    """
+    if mode == "off":
+        return []
+    if mode == "sampled" and zlib.crc32(f"{part_name}:{job.get('job_number')}".encode()) % validation_sample_rate:
+        return []
+    if mode not in validation_modes:
+        raise ValueError(f"Unknown validation mode: {mode}")
+
+    job_type = job.get("type")
+    if not isinstance(job_type, str):
+        job_type = None  # An invalid type - only the default rules are used
+    if job_type not in compiled_validators:
+        compiled_validators[job_type] = compile_validator(job_type)
+    job_check, holes_groups_check, job_checks, holes_group_checks = compiled_validators[job_type]
+    geometry = job.get("geometry")
+    holes_groups_info = (geometry.get("recognized_holes_groups") if geometry is not None else None) or []
+
+    # The fast path - a valid job
+    if job_check(job) and holes_groups_check(holes_groups_info):
+        return []
+
+    # Finding the invalid fields
+    errors = []
+    for field_path, message, rule_check in job_checks:
+        if not rule_check(job):
+            errors.append(validation_error(job, part_name, None, field_path, message))
+
+    # Going over on all the holes groups in the job
+    for holes_group_index, holes_group_info in enumerate(holes_groups_info):
+        for field_path, message, rule_check in holes_group_checks:
+            if not rule_check(holes_group_info):
+                errors.append(validation_error(job, part_name, holes_group_index, field_path, message))
+
+    return errors
+
+
+def validation_error(job, part_name, holes_group_index, field, message):
+    """ Returns an error record of an invalid field of a job """
+    return {"part_name": part_name, "job_name": job.get("name"), "job_type": job.get("type"),
+            "job_number": job.get("job_number"), "holes_group_index": holes_group_index, "field": field,
+            "message": message}
+
+
+def print_validation_errors(errors):
+    """
+    This function prints the error records of a job, in the format:
+    Job name: ... | Job type: ... | Job number: (...) | Part name:...
+    <error message>
+    ...
 
+    Args:
+        errors (list): The error records of a single job, as returned from 'validate_job'
+    """
+    if not errors:
+        return
+    error = errors[0]
+    print(f"Job name: {error['job_name']} | Job type: {error['job_type']} | Job number: ({error['job_number']}) | "
+          f"Part name:{error['part_name']}")
+    for error in errors:
+        print(error["message"])
+    print("\n")
@@ -1,7 +1,12 @@
+import io
 import os
+from contextlib import redirect_stdout
+from functools import partial
+from itertools import repeat
 
-from Process_Jobs import process_jobs
-from Utilities_and_Cosmetics import read_json, validate_job, process_tech_drawing_json
+import Json_Backends
+import Metrics
+from Utilities_and_Cosmetics import read_json_jobs, validate_job, print_validation_errors, process_tech_drawing_json
 
 
 """
@@ -9,14 +14,30 @@ This notebook's purpose is processing the JSON files of parts in order to assign
 performed on, in the relevant topology (I'm using the mask).
 
 
-The data is being processed as follows:  
+The data is being processed as follows:
 1 - Iterating on the each part's jobs.
 
 2 - Creating a dictionary that holds all the topologies.
 
-3 - Assigning holes groups to their topology.  
+3 - Assigning holes groups to their topology.
 
 4 - Assigning jobs by the order they have been performed, for each hole.
+
+The parts can be processed in parallel (see 'num_workers') - each worker process builds the topologies of
+a single part, and the results are merged by the parts' order, so the output is identical to the serial run.
+
+Importing this module doesn't process anything - the pipeline can be called from other code:
+    process_corpus(jsons_dir, drawings_dir, ...) - processes all the parts in a directory, returns the topologies
+    process_part(part_path, drawing_path, ...)   - processes a single part, returns its topologies
+    validate_corpus(jsons_dir, ...)              - only validates the parts' jobs
+Or from the command line (see 'parse_arguments'), where the defaults are the global variables below:
+    python main.py <JSONs dir> --drawings <Tech_Drawing_JSONs dir> --workers 4 --cache <dir> --report report.jsonl
+
+The modules that do the coordinates work (and import NumPy), the parallel processing, the read-ahead, the cache, the
+spill store and the feature store are imported only when they are used, so validating a corpus doesn't import them.
+
+For corpora larger than the memory, the holes of the processed parts can be spilled to the disk (see 'spill_dir'),
+and the report and the feature store then read them back from the disk one at a time.
 """
 
 # Path to JSON's folder
@@ -29,71 +50,348 @@ tech_drawing_jsons_dir_path = "C:/Users/eliron.lubaton/OneDrive - SolidCAM/Deskt
 drilling_types = ["NC_DRILL_OLD", "NC_DRILL_DEEP", "NC_THREAD", "NC_DRILL_HR", "NC_JOB_MW_DRILL_5X"]
 non_drilling_types = ["NC_PROFILE", "NC_CHAMFER", "NC_JOB_HSS_PARALLEL_TO_CURVE"]
 
+# Number of worker processes used for processing the parts - 1 means processing the parts serially
+num_workers = 1
+# The JSON decoding backend (see 'Json_Backends.py') - "auto", "stdlib" or "orjson"
+json_backend = "auto"
+# Number of parts (and their drawings) that are read ahead while a part is processed (see 'Read_Ahead.py') - 0 for
+# reading each part only when it is processed
+read_ahead_parts = 4
+# How the jobs are validated - "strict" (every job), "sampled" (1 out of every few jobs) or "off"
+validation_mode = "strict"
+# The directory of the ML feature store (see 'ML_Feature_Store.py') - None for not exporting it
+feature_store_dir = None
+# The directory of the per-part results cache (see 'Part_Results_Cache.py') - None for not using it
+cache_dir = None
+# The directory the processed parts' holes are spilled to (see 'Spill_Store.py') - None for keeping them in memory
+spill_dir = None
+# The path of the metrics JSON file (see 'Metrics.py') - None for not collecting metrics
+metrics_path = None
+# The report's file (see 'Report_Writer.py') - None for printing it
+report_path = None
+# The report's format - "text", "jsonl" or "csv"
+report_format = "text"
+# How detailed the report is - "summary", "groups" or "holes"
+report_detail = "holes"
 
 
-# Holds all the different topologies masks
-topologies_dict = {}
-
-def processing_loop():
-    # Going over on all the parts, and process them
-    for part_name in os.listdir(jsons_dir_path):
-        # Processing only files that ends with .json
-        if part_name.endswith('.json'):
-            file_path = os.path.join(jsons_dir_path, part_name)
-
-            # Read the JSON file
-            data = read_json(file_path)
-
-            # Going over all jobs in the part
-            print(f"Part name is: {part_name}")
-            for job in data["event_data"]["jobs"]:
-                # Processing only specific jobs of intrest
-                if job["type"] not in drilling_types and job["type"] not in non_drilling_types:
-                    continue
 
-                # Making sure all the relevant fields in the JSON exist and are correct
-                validate_job(job, part_name)
 
-                # Checking if the job is not pre-drilling for creating pockets
-                if job["geometry"].get("recognized_holes_groups") is not None:
-                    # Processing the job
-                    process_jobs(job, part_name, topologies_dict)
-
-            # Processing the tech drawing JSON we get from AI tools (Gemini), and adding its info
-            drawing_part_name = "DRAWING_" + part_name
-            process_tech_drawing_json(tech_drawing_jsons_dir_path, drawing_part_name, topologies_dict)
-
-            print(f"\n***********************\n")
+# Holds all the different topologies masks
+topologies_dict = {}
 
-processing_loop()
+def process_part_jobs(part_path, topologies_dict, part_registry=None, validation_mode="strict", part_content=None):
+    """
+    Reads a part's JSON file, and processes all of its relevant jobs into topologies_dict.
+
+    Args:
+      part_path (str):         The path of the part's JSON file - its file name is the part's name.
+      topologies_dict (dict):  A dictionary that maps topology masks to topology objects.
+      part_registry (PartRegistry): If given, the part's holes are registered in it.
+      validation_mode (str):   How the jobs are validated - "strict", "sampled" or "off"
+      part_content (bytes):    The content of the part's JSON file, if it was already read (see 'Read_Ahead.py')
+
+    Returns:
+      part_jobs (list): The jobs that were processed, by their order
+    """
+    from Classes import ToolRegistry
+    from Process_Jobs import process_jobs
+
+    part_name = os.path.basename(part_path)
+    part_jobs = []
+    tool_registry = ToolRegistry()  # Each of the part's tools is decoded once
+
+    # Going over all jobs in the part - reading only specific jobs of intrest, one at a time
+    print(f"Part name is: {part_name}")
+    for job in Metrics.timed_iterator("read_json", read_json_jobs(part_path, drilling_types + non_drilling_types,
+                                                                       part_content)):
+        # Making sure all the relevant fields in the JSON exist and are correct
+        with Metrics.stage("validate_job"):
+            validation_errors = validate_job(job, part_name, validation_mode)
+        print_validation_errors(validation_errors)
+
+        # Checking if the job is not pre-drilling for creating pockets
+        if job["geometry"].get("recognized_holes_groups") is not None:
+            # Processing the job
+            with Metrics.stage("process_jobs"):
+                process_jobs(job, part_name, topologies_dict, part_registry=part_registry, tool_registry=tool_registry)
+            part_jobs.append(job)
+
+    return part_jobs
+
+
+def init_worker(metrics_enabled, json_backend_name):
+    """ Initializes a worker process - with the same metrics and JSON backend settings as the main process """
+    Metrics.enable(metrics_enabled)
+    Json_Backends.select_backend(json_backend_name)
+
+
+def process_part_worker(part_path, validation_mode="strict"):
+    """
+    Processes a single part into its own (partial) topologies dictionary - runs inside a worker process.
+    Everything that is printed while processing the part is captured, so it can be printed by the parts' order.
+
+    Returns:
+      A 5-tuple of the part's name, the partial topologies dictionary, the jobs that were processed,
+      the captured output, and the part's metrics (None if they are not collected - see 'Metrics.py').
+    """
+    part_name = os.path.basename(part_path)
+    partial_topologies_dict = {}
+    Metrics.start_part(part_name)
+    with redirect_stdout(io.StringIO()) as output:
+        part_jobs = process_part_jobs(part_path, partial_topologies_dict, validation_mode=validation_mode)
+    return part_name, partial_topologies_dict, part_jobs, output.getvalue(), Metrics.take_part_metrics()
+
+
+def process_part_cached(part_path, validation_mode="strict", cache_dir=None):
+    """
+    Same as 'process_part_worker', but takes the result from the results cache if the part didn't change,
+    and saves it to the cache otherwise.
+    """
+    from Part_Results_Cache import part_cache_key, load_part_result, store_part_result
+
+    key = part_cache_key(part_path, os.path.basename(part_path), {"validation_mode": validation_mode})
+    result = load_part_result(cache_dir, key)
+    if result is None:
+        result = process_part_worker(part_path, validation_mode)
+        # The metrics belong to this run only, so they are not cached
+        store_part_result(cache_dir, key, result[:4] + (None,))
+    return result
+
+
+def process_part_drawing(drawings_dir, part_name, topologies_dict, part_registry, prefetched_part=None):
+    """
+    Processing the tech drawing JSON we get from AI tools (Gemini), and adding its info to the part's holes.
+    If the part was read ahead (see 'Read_Ahead.py'), its drawing was already read.
+    """
+    if drawings_dir is not None:
+        drawing_part_name = "DRAWING_" + part_name
+        tech_data = None if prefetched_part is None else prefetched_part.drawing()
+        with Metrics.stage("process_tech_drawing_json"):
+            process_tech_drawing_json(drawings_dir, drawing_part_name, topologies_dict, part_registry, tech_data)
+
+    print(f"\n***********************\n")
+
+
+def finish_part(part_registry, spill_store=None):
+    """ Finishes processing a part - its holes are spilled to the disk if spill_store is given (see 'Spill_Store.py') """
+    if spill_store is not None:
+        from Spill_Store import spill_part
+        spill_part(spill_store, part_registry)
+    Metrics.end_part()
+
+
+def list_parts(jsons_dir):
+    """ Returns the paths of the parts' JSON files in a directory - only files that ends with .json """
+    return [os.path.join(jsons_dir, part_name) for part_name in os.listdir(jsons_dir) if part_name.endswith('.json')]
+
+
+def process_corpus(jsons_dir, drawings_dir=None, num_workers=1, cache_dir=None, validation_mode="strict",
+                   topologies_dict=None, read_ahead_parts=4, spill_dir=None):
+    """
+    Processes all the parts in a directory (and their technical drawings), by their order in the directory.
+
+    Args:
+      jsons_dir (str):         The directory of the parts' JSON files
+      drawings_dir (str):      The directory of the technical drawings' JSON files - None for not adding them
+      num_workers (int):       Number of worker processes - 1 means processing the parts serially
+      cache_dir (str):         The directory of the per-part results cache - None for not using it
+      validation_mode (str):   How the jobs are validated - "strict", "sampled" or "off"
+      topologies_dict (dict):  The topologies to add the parts to - a new dictionary if None
+      read_ahead_parts (int):  Number of parts (and drawings) read ahead while a part is processed - 0 for not
+                               reading ahead
+      spill_dir (str):         The directory the holes of the processed parts are spilled to, so the memory doesn't
+                               grow with the corpus (see 'Spill_Store.py') - None for keeping them in memory
+
+    Returns:
+      topologies_dict (dict): A dictionary that maps topology masks to topology objects
+    """
+    from Classes import PartRegistry
+
+    if topologies_dict is None:
+        topologies_dict = {}
+    parts_paths = list_parts(jsons_dir)
+    backend = Json_Backends.current_backend()
+    Metrics.set_run_info("json_backend", backend.name)
+    spill_store = None
+    if spill_dir is not None:
+        from Spill_Store import SegmentStore
+        spill_store = SegmentStore(spill_dir)
 
+    # Going over on all the parts, and process them
+    if num_workers <= 1 and cache_dir is None:
+        if read_ahead_parts > 0:
+            from Read_Ahead import read_ahead
+            parts = read_ahead(parts_paths, drawings_dir, read_ahead_parts)
+        else:
+            parts = repeat(None)
+        for part_path, prefetched_part in zip(parts_paths, parts):
+            part_name = os.path.basename(part_path)
+            Metrics.start_part(part_name)
+            part_registry = PartRegistry(part_name)
+            process_part_jobs(part_path, topologies_dict, part_registry, validation_mode,
+                              None if prefetched_part is None else prefetched_part.content())
+            process_part_drawing(drawings_dir, part_name, topologies_dict, part_registry, prefetched_part)
+            finish_part(part_registry, spill_store)
+        return topologies_dict
+
+    # Processing each part into its own partial topologies dictionary (or taking it from the cache), and merging it
+    if cache_dir is None:
+        part_function = partial(process_part_worker, validation_mode=validation_mode)
+    else:
+        part_function = partial(process_part_cached, validation_mode=validation_mode, cache_dir=cache_dir)
+    # The parts are read by 'part_function', so only their drawings are read ahead
+    prefetched_parts = None
+    if read_ahead_parts > 0 and drawings_dir is not None:
+        from Read_Ahead import read_ahead
+        prefetched_parts = read_ahead(parts_paths, drawings_dir, read_ahead_parts, read_parts=False)
+    if num_workers <= 1:
+        merge_part_results(map(part_function, parts_paths), topologies_dict, drawings_dir, prefetched_parts,
+                           spill_store)
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        # Processing the parts in parallel - 'map' returns the results by the parts' order, so merging is deterministic
+        with ProcessPoolExecutor(max_workers=num_workers, initializer=init_worker,
+                                 initargs=(Metrics.enabled, backend.name)) as executor:
+            merge_part_results(executor.map(part_function, parts_paths), topologies_dict, drawings_dir,
+                               prefetched_parts, spill_store)
+    return topologies_dict
+
+
+def merge_part_results(part_results, topologies_dict, drawings_dir, prefetched_parts=None, spill_store=None):
+    """
+    Merges the results of the parts (see 'process_part_worker') by their order, and adds their drawings' info.
+    prefetched_parts yields the parts by the same order, with their drawings read ahead (see 'Read_Ahead.py'),
+    and each merged part is spilled to spill_store (see 'Spill_Store.py'), if it's given.
+    """
+    from Classes import PartRegistry
+    from Process_Jobs import merge_partial_topologies
+
+    if prefetched_parts is None:
+        prefetched_parts = repeat(None)  # No part is read ahead
+    for (part_name, partial_topologies_dict, part_jobs, output, part_metrics), prefetched_part in zip(
+            part_results, prefetched_parts):
+        print(output, end='')
+        # The metrics that were recorded while processing the part - None if the part was taken from the cache
+        Metrics.start_part(part_name, part_metrics)
+        if Metrics.enabled and part_metrics is None:
+            Metrics.count("results_cache_hits")
+        part_registry = PartRegistry(part_name)
+        # Everything the part prints was already captured by the worker, so not printing it twice while merging.
+        # The work done again while merging was already counted by the worker, so it's counted as "merge_" metrics
+        with redirect_stdout(io.StringIO()), Metrics.stage("merge_partial_topologies"), Metrics.prefixed("merge_"):
+            merge_partial_topologies(topologies_dict, partial_topologies_dict, part_jobs, part_name, part_registry)
+        process_part_drawing(drawings_dir, part_name, topologies_dict, part_registry, prefetched_part)
+        finish_part(part_registry, spill_store)
+
+
+def process_part(part_path, drawing_path=None, validation_mode="strict", topologies_dict=None):
+    """
+    Processes a single part (and its technical drawing).
+
+    Args:
+      part_path (str):         The path of the part's JSON file
+      drawing_path (str):      The path of the technical drawing's JSON file - None for not adding it
+      validation_mode (str):   How the jobs are validated - "strict", "sampled" or "off"
+      topologies_dict (dict):  The topologies to add the part to - a new dictionary if None
+
+    Returns:
+      topologies_dict (dict): A dictionary that maps topology masks to topology objects
+    """
+    from Classes import PartRegistry
+
+    if topologies_dict is None:
+        topologies_dict = {}
+    part_registry = PartRegistry(os.path.basename(part_path))
+    process_part_jobs(part_path, topologies_dict, part_registry, validation_mode)
+    if drawing_path is not None:
+        process_tech_drawing_json(os.path.dirname(drawing_path), os.path.basename(drawing_path), topologies_dict,
+                                  part_registry)
+    return topologies_dict
+
+
+def validate_corpus(jsons_dir, validation_mode="strict"):
+    """
+    Validates the jobs of all the parts in a directory, without processing them - the errors are printed.
+
+    Returns:
+      num_invalid_jobs (int): The number of jobs that have at least one error
+    """
+    num_invalid_jobs = 0
+    for part_path in list_parts(jsons_dir):
+        part_name = os.path.basename(part_path)
+        print(f"Part name is: {part_name}")
+        for job in read_json_jobs(part_path, drilling_types + non_drilling_types):
+            validation_errors = validate_job(job, part_name, validation_mode)
+            print_validation_errors(validation_errors)
+            num_invalid_jobs += bool(validation_errors)
+    return num_invalid_jobs
 
 
+def processing_loop():
+    """ Processes the parts in 'jsons_dir_path' into the global topologies_dict, by the global variables above """
+    Json_Backends.select_backend(json_backend)
+    process_corpus(jsons_dir_path, tech_drawing_jsons_dir_path, num_workers, cache_dir, validation_mode,
+                   topologies_dict, read_ahead_parts, spill_dir)
 
 
 ### Printing Stats
 """
 Most of the stats that are printed here are used for DEBUGGING purposes.
-In order to change the stats that are being printed, go to the method 'print' under
-'HoleGroup' class.
+In order to change the stats that are being printed, go to 'TextReportWriter' in Report_Writer.py.
 """
 
-bold_s = '\033[1m' # Start to write in bold
-bold_e = '\033[0m' # End to write in bold
-
-# Printing the updated dictionary, and saving the output
-for topology in topologies_dict.values():
-  print(f"{bold_s}Topology: {topology.topology} | Mask: {topology.topology_mask}{bold_e}")
-  print(f"Total number of hole groups under this topology: {len(topology.holes_groups)}")
-  total_instances = 0
-  for hole_group in topology.holes_groups:
-    total_instances += len(hole_group.centers)
-  print(f"Total number of holes in all hole groups in this topology: {total_instances}\n")
-
-
-  for group_index, group in enumerate(topology.holes_groups):
-    group.print(group_index+1)
-  print("\n______________________________________________________")
-  print("******************** NEW TOPOLOGY ********************")
-  print("______________________________________________________\n")
-
+def print_stats():
+  # Writing the report of the updated dictionary - to stdout, or to the report's file
+  from Report_Writer import write_report
+  write_report(topologies_dict, report_path, report_format, report_detail)
+
+
+def parse_arguments(arguments=None):
+  """ Parses the command line arguments - the defaults are the global variables """
+  import argparse
+
+  parser = argparse.ArgumentParser(description="Assigns the jobs of CAM parts to the holes they are performed on")
+  parser.add_argument("jsons_dir", nargs="?", default=jsons_dir_path, help="the directory of the parts' JSON files")
+  parser.add_argument("--drawings", default=tech_drawing_jsons_dir_path,
+                      help="the directory of the technical drawings' JSON files")
+  parser.add_argument("--no-drawings", action="store_true", help="don't add the technical drawings' info")
+  parser.add_argument("--workers", type=int, default=num_workers, help="number of worker processes")
+  parser.add_argument("--json-backend", default=json_backend, choices=Json_Backends.backend_names,
+                      help="the JSON decoding backend (the stdlib if the backend isn't installed)")
+  parser.add_argument("--read-ahead", type=int, default=read_ahead_parts,
+                      help="number of parts read ahead while a part is processed (0 for not reading ahead)")
+  parser.add_argument("--cache", default=cache_dir, help="the directory of the per-part results cache")
+  parser.add_argument("--spill", default=spill_dir,
+                      help="the directory the processed parts' holes are spilled to, for corpora larger than the memory")
+  parser.add_argument("--validation", default=validation_mode, choices=["strict", "sampled", "off"])
+  parser.add_argument("--validate-only", action="store_true", help="only validate the jobs, without processing them")
+  parser.add_argument("--report", default=report_path, help="the report's file (printed if not given)")
+  parser.add_argument("--report-format", default=report_format, choices=["text", "jsonl", "csv"])
+  parser.add_argument("--report-detail", default=report_detail, choices=["summary", "groups", "holes"])
+  parser.add_argument("--feature-store", default=feature_store_dir, help="the directory of the ML feature store")
+  parser.add_argument("--metrics", default=metrics_path, help="the path of the metrics JSON file")
+  return parser.parse_args(arguments)
+
+
+# Worker processes import this module too, so running only when executed as a script
+if __name__ == "__main__":
+  args = parse_arguments()
+  Json_Backends.select_backend(args.json_backend)
+  if args.validate_only:
+    raise SystemExit(1 if validate_corpus(args.jsons_dir, args.validation) else 0)
+
+  report_path, report_format, report_detail = args.report, args.report_format, args.report_detail
+  if args.metrics is not None:
+    Metrics.enable()
+  process_corpus(args.jsons_dir, None if args.no_drawings else args.drawings, args.workers, args.cache,
+                 args.validation, topologies_dict, args.read_ahead, args.spill)
+  with Metrics.stage("print_stats"):
+    print_stats()
+  if args.feature_store is not None:
+    from ML_Feature_Store import export_feature_store
+    with Metrics.stage("export_feature_store"):
+      export_feature_store(topologies_dict, args.feature_store)
+  if args.metrics is not None:
+    Metrics.write_metrics(args.metrics)
@@ -0,0 +1,61 @@
+import os
+import sys
+import unittest
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from MACs_Conversions import ParallelCentersIndex, compare_coordinates, tolerance
+
+"""
+When a center worked from a parallel MAC is at the hole's depth from several holes of a hole group, the job is added to
+the first of them by the iteration order of the set of the hole group's centers (added one by one, by the order the
+holes were added) - the same hole the original implementation, which held the centers in a set, chose.
+"""
+
+depth = 10.0
+parallel_home_number = 2
+
+# All the centers are at the hole's depth from (0, 0, 0) - their set's order is different from the order they're added
+centers = [(10.0, 0.0, 0.0), (0.0, 10.0, 0.0), (0.0, 0.0, 10.0), (-10.0, 0.0, 0.0), (0.0, -10.0, 0.0),
+           (6.0, 8.0, 0.0), (8.0, 6.0, 0.0), (0.0, 6.0, 8.0)]
+
+
+def hole_group(group_centers):
+    """ Returns a hole group with a hole at each center, all worked from a MAC parallel to 'parallel_home_number' """
+    holes = {center: f"hole at {center}" for center in group_centers}
+    centers_index = ParallelCentersIndex(depth + tolerance)
+    for center in group_centers:
+        centers_index.add(center, [parallel_home_number])
+    return SimpleNamespace(holes=holes, centers=holes.keys(), centers_index=centers_index)
+
+
+class CompareCoordinatesTest(unittest.TestCase):
+    def test_exact_center(self):
+        self.assertEqual(compare_coordinates(centers[3], hole_group(centers), 1, depth, 1),
+                         (True, f"hole at {centers[3]}"))
+
+    def test_several_matching_holes(self):
+        self.assertEqual(compare_coordinates((0.0, 0.0, 0.0), hole_group(centers), parallel_home_number, depth, 1),
+                         (True, "hole at (8.0, 6.0, 0.0)"))
+
+    def test_first_by_centers_set(self):
+        # Enough holes for the set to be resized while they're added
+        group_centers = [(depth * x / 13, depth * y / 13, depth * z / 13)
+                         for x, y, z in [(3, 4, 12), (4, 3, 12), (12, 3, 4), (5, 12, 0), (12, 5, 0), (0, 5, 12),
+                                         (0, 12, 5), (12, 0, 5), (5, 0, 12), (3, 12, 4), (4, 12, 3), (12, 4, 3)]]
+        group_centers += [(float(x), float(x), 50.0) for x in range(40)]  # Not at the hole's depth
+        centers_set = set()
+        for center in group_centers:
+            centers_set.add(center)
+        expected_center = next(center for center in centers_set if center[2] != 50.0)
+        self.assertNotEqual(expected_center, group_centers[0])
+        self.assertEqual(compare_coordinates((0.0, 0.0, 0.0), hole_group(group_centers), parallel_home_number, depth, 1),
+                         (True, f"hole at {expected_center}"))
+
+    def test_not_parallel(self):
+        self.assertEqual(compare_coordinates((0.0, 0.0, 0.0), hole_group(centers), 3, depth, 1), (False, None))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import os
+import subprocess
+import sys
+import unittest
+
+"""
+Regression test - a geometry index that was pickled in another process (e.g, by a worker, or in the results cache)
+still finds the hole groups with the same geometry, although the segments' type codes are given per process.
+"""
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Pickles an index of 5 hole groups with the same geometry, in a process that encounters "arc" first
+pickle_index = """
+import pickle, sys
+from types import SimpleNamespace
+from MACs_Conversions import Geometry, GeometryIndex, segment_type_code
+segment_type_code(sys.argv[1])
+shape = [{"p0": [2.0, 0.0], "p1": [2.0, -5.0], "type": "line"}, {"p0": [2.0, -5.0], "p1": [0.0, -6.0], "type": "arc"}]
+index = GeometryIndex()
+for position in range(5):
+    index.add(position, SimpleNamespace(geom_shape=Geometry.from_shape(shape)))
+sys.stdout.buffer.write(pickle.dumps(index))
+"""
+
+# Loads the index in a process that encounters "line" first, and prints the number of matching hole groups
+match_index = """
+import pickle, sys
+from MACs_Conversions import Geometry, segment_type_code
+segment_type_code(sys.argv[1])
+index = pickle.loads(sys.stdin.buffer.read())
+shape = [{"p0": [0.0, -6.0], "p1": [2.0, -5.0], "type": "arc"}, {"p0": [2.0, -5.0], "p1": [2.0, 0.0], "type": "line"}]
+geometry = Geometry.from_shape(shape)
+print(len(index.matching_groups(geometry, index.candidates(geometry))))
+"""
+
+
+def run_script(script, first_type, input_data=None):
+    """ Runs a script in a new process (which encounters 'first_type' first), and returns its output """
+    return subprocess.run([sys.executable, "-c", script, first_type], input=input_data, capture_output=True,
+                          cwd=repo_dir, check=True).stdout
+
+
+class GeometryIndexPickleTest(unittest.TestCase):
+    def matches_after_pickle(self, pickled_first_type, loaded_first_type):
+        pickled_index = run_script(pickle_index, pickled_first_type)
+        return int(run_script(match_index, loaded_first_type, pickled_index))
+
+    def test_same_types_order(self):
+        self.assertEqual(self.matches_after_pickle("arc", "arc"), 5)
+
+    def test_different_types_order(self):
+        self.assertEqual(self.matches_after_pickle("arc", "line"), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+from MACs_Conversions import ParallelCentersIndex
+from ML_Feature_Store import export_feature_store
+from Report_Writer import write_report
+from Synthetic_Corpus_Generator import generate_corpus
+
+"""
+A NaN (or infinite) value in a part's export is never the same as another value - a bad record mustn't stop the run.
+"""
+
+
+def corrupt_part(part_path, corrupt_holes_group):
+    """ Changes every holes group in a part's JSON file by corrupt_holes_group (which changes the dict in place) """
+    with open(part_path) as file:
+        part = json.load(file)
+    for job in part["event_data"]["jobs"]:
+        for holes_group_info in (job.get("geometry") or {}).get("recognized_holes_groups") or []:
+            corrupt_holes_group(holes_group_info)
+    with open(part_path, "w") as file:
+        json.dump(part, file)
+
+
+def set_nan_depth(holes_group_info):
+    holes_group_info["_geom_depth"] = float("nan")
+
+
+def set_nan_position(holes_group_info):
+    holes_group_info["_tech_positions"][0] = float("nan")
+
+
+class NonFiniteValuesTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.corpus_dir = os.path.join(self.temp_dir.name, "corpus")
+        # All the thru holes are also worked from the parallel MAC, so every part queries the spatial index
+        generate_corpus(self.corpus_dir, num_parts=4, groups_per_part=4, parallel_ratio=1.0, tool_path_points=5, seed=5)
+        self.jsons_dir = os.path.join(self.corpus_dir, "JSONs")
+        self.parts_paths = sorted(main.list_parts(self.jsons_dir))
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def process_corpus(self):
+        """ Processes the corpus, and writes its report and its feature store """
+        with redirect_stdout(io.StringIO()):
+            topologies_dict = main.process_corpus(self.jsons_dir, os.path.join(self.corpus_dir, "Tech_Drawing_JSONs"))
+        write_report(topologies_dict, os.path.join(self.temp_dir.name, "report.txt"))
+        export_feature_store(topologies_dict, os.path.join(self.temp_dir.name, "store"))
+        return topologies_dict
+
+    def test_nan_depth(self):
+        corrupt_part(self.parts_paths[0], set_nan_depth)
+        corrupt_part(self.parts_paths[2], set_nan_depth)
+        self.assertTrue(self.process_corpus())
+
+    def test_nan_position(self):
+        corrupt_part(self.parts_paths[0], set_nan_position)
+        corrupt_part(self.parts_paths[2], set_nan_position)
+        self.assertTrue(self.process_corpus())
+
+
+class ParallelCentersIndexTest(unittest.TestCase):
+    def test_non_finite_cell_size(self):
+        for cell_size in (float("nan"), float("inf")):
+            index = ParallelCentersIndex(cell_size)
+            index.add((0.0, 0.0, 0.0), [2])
+            self.assertEqual(index.query((0.0, 0.0, 0.1), 2, 1.0), [(0.0, 0.0, 0.0)])
+
+    def test_non_finite_centers_and_distances(self):
+        index = ParallelCentersIndex(10.0)
+        index.add((float("nan"), 0.0, 0.0), [2])
+        index.add((float("inf"), 0.0, 0.0), [2])
+        index.add((0.0, 0.0, 0.0), [2])
+        self.assertEqual(index.query((0.0, 0.0, 10.0), 2, 10.1), [(0.0, 0.0, 0.0)])
+        self.assertEqual(index.query((float("nan"), 0.0, 10.0), 2, 10.1), [])
+        self.assertEqual(index.query((0.0, 0.0, 10.0), 2, float("nan")), [])
+        self.assertEqual(index.query((0.0, 0.0, 10.0), 2, float("inf")), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import io
+import os
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+from Report_Writer import write_report
+from Synthetic_Corpus_Generator import generate_corpus
+
+"""
+The results of processing the parts in worker processes (and merging them by the parts' order) must be identical to
+processing them serially - the reports are compared byte by byte.
+"""
+
+
+def corpus_report(corpus_dir, report_path, **process_arguments):
+    """ Processes the synthetic corpus in corpus_dir, and returns its report (text) """
+    with redirect_stdout(io.StringIO()):
+        topologies_dict = main.process_corpus(os.path.join(corpus_dir, "JSONs"),
+                                              os.path.join(corpus_dir, "Tech_Drawing_JSONs"), **process_arguments)
+    write_report(topologies_dict, report_path)
+    with open(report_path, "rb") as file:
+        return file.read()
+
+
+class ParallelProcessingTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.temp_dir = tempfile.TemporaryDirectory()
+        cls.corpus_dir = os.path.join(cls.temp_dir.name, "corpus")
+        # Parallel MACs, so some of the parts' topologies depend on the parts before them
+        generate_corpus(cls.corpus_dir, num_parts=12, groups_per_part=6, mac_pairs=2, tool_path_points=5, seed=3)
+        cls.serial_report = corpus_report(cls.corpus_dir, os.path.join(cls.temp_dir.name, "serial.txt"))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.temp_dir.cleanup()
+
+    def test_report_not_empty(self):
+        self.assertIn(b"Hole Group", self.serial_report)
+
+    def test_workers_report_identical(self):
+        for num_workers in (2, 3):
+            with self.subTest(num_workers=num_workers):
+                report = corpus_report(self.corpus_dir, os.path.join(self.temp_dir.name, f"workers_{num_workers}.txt"),
+                                       num_workers=num_workers)
+                self.assertEqual(report, self.serial_report)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+import numpy as np
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_dir)
+
+import main
+from ML_Feature_Store import export_feature_store, load_feature_store
+from Part_Results_Cache import pipeline_modules
+from Report_Writer import write_report
+from Synthetic_Corpus_Generator import generate_corpus
+
+"""
+A part that is merged back from the results cache must give the same topologies as processing it again - the reports
+and the feature stores of the cold and the warm cached runs are compared with the run without the cache.
+"""
+
+
+def repeat_parts(corpus_dir, num_parts):
+    """ Copies the first num_parts parts of the corpus (and their drawings) under new names """
+    jsons_dir = os.path.join(corpus_dir, "JSONs")
+    drawings_dir = os.path.join(corpus_dir, "Tech_Drawing_JSONs")
+    for part_name in sorted(os.listdir(jsons_dir))[:num_parts]:
+        shutil.copy(os.path.join(jsons_dir, part_name), os.path.join(jsons_dir, "REPEATED_" + part_name))
+        shutil.copy(os.path.join(drawings_dir, "DRAWING_" + part_name),
+                    os.path.join(drawings_dir, "DRAWING_REPEATED_" + part_name))
+
+
+def corpus_outputs(corpus_dir, output_dir, **process_arguments):
+    """ Processes the corpus in corpus_dir, and returns its report (text) and its feature store's columns """
+    with redirect_stdout(io.StringIO()):
+        topologies_dict = main.process_corpus(os.path.join(corpus_dir, "JSONs"),
+                                              os.path.join(corpus_dir, "Tech_Drawing_JSONs"), **process_arguments)
+    report_path = os.path.join(output_dir, "report.txt")
+    write_report(topologies_dict, report_path)
+    with open(report_path, "rb") as file:
+        report = file.read()
+    store_dir = os.path.join(output_dir, "store")
+    export_feature_store(topologies_dict, store_dir)
+    columns, categories = load_feature_store(store_dir, mmap_mode=None)
+    return report, columns, categories
+
+
+# Prints the files of the repo's modules that are loaded for processing a part - run in a new process
+loaded_modules_script = """
+import io, os, sys
+from contextlib import redirect_stdout
+sys.path.insert(0, sys.argv[1])
+import main
+with redirect_stdout(io.StringIO()):
+    main.process_part_worker(sys.argv[2])
+for module in list(sys.modules.values()):
+    module_path = getattr(module, "__file__", None) or ""
+    if os.path.dirname(os.path.abspath(module_path)) == sys.argv[1]:
+        print(os.path.basename(module_path))
+"""
+
+
+class ResultsCacheTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.temp_dir = tempfile.TemporaryDirectory()
+        cls.corpus_dir = os.path.join(cls.temp_dir.name, "corpus")
+        generate_corpus(cls.corpus_dir, num_parts=8, groups_per_part=5, mac_pairs=2, tool_path_points=5, seed=7)
+        repeat_parts(cls.corpus_dir, 3)
+        cls.expected_outputs = cls.outputs("in_memory")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.temp_dir.cleanup()
+
+    @classmethod
+    def outputs(cls, run_name, **process_arguments):
+        output_dir = os.path.join(cls.temp_dir.name, run_name)
+        os.makedirs(output_dir)
+        return corpus_outputs(cls.corpus_dir, output_dir, **process_arguments)
+
+    def assert_same_outputs(self, outputs):
+        report, columns, categories = outputs
+        expected_report, expected_columns, expected_categories = self.expected_outputs
+        self.assertIn(b"Hole Group", report)
+        self.assertEqual(report, expected_report)
+        self.assertEqual(categories, expected_categories)
+        self.assertEqual({group: list(group_columns) for group, group_columns in columns.items()},
+                         {group: list(group_columns) for group, group_columns in expected_columns.items()})
+        for group, group_columns in expected_columns.items():
+            for column, expected_array in group_columns.items():
+                with self.subTest(group=group, column=column):
+                    array = columns[group][column]
+                    self.assertEqual(array.dtype, expected_array.dtype)
+                    self.assertTrue(np.array_equal(array, expected_array, equal_nan=array.dtype.kind == "f"))
+
+    def test_cold_and_warm_cache(self):
+        cache_dir = os.path.join(self.temp_dir.name, "cache")
+        self.assert_same_outputs(self.outputs("cold_cache", cache_dir=cache_dir))
+        self.assertTrue(os.listdir(cache_dir))
+        self.assert_same_outputs(self.outputs("warm_cache", cache_dir=cache_dir))
+
+    def test_warm_cache_with_workers(self):
+        cache_dir = os.path.join(self.temp_dir.name, "workers_cache")
+        self.outputs("workers_cold_cache", cache_dir=cache_dir)
+        self.assert_same_outputs(self.outputs("workers_warm_cache", cache_dir=cache_dir, num_workers=2))
+
+    def test_processing_modules_fingerprinted(self):
+        # A change in any module whose code runs while a part is processed must change the cache keys
+        part_path = sorted(main.list_parts(os.path.join(self.corpus_dir, "JSONs")))[0]
+        output = subprocess.run([sys.executable, "-c", loaded_modules_script, repo_dir, part_path],
+                                capture_output=True, check=True, text=True).stdout
+        loaded_modules = set(output.split())
+        self.assertIn("main.py", loaded_modules)
+        # The metrics are not part of the results, and the report writer isn't used before the report is written
+        self.assertLessEqual(loaded_modules - {"Metrics.py", "Report_Writer.py"}, set(pipeline_modules))
+
+
+if __name__ == "__main__":
+    unittest.main()
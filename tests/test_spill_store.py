@@ -0,0 +1,110 @@
+import io
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+import Spill_Store
+from ML_Feature_Store import export_feature_store, load_feature_store
+from Report_Writer import write_report
+from Synthetic_Corpus_Generator import generate_corpus
+
+"""
+Spilling the holes of the processed parts to the disk mustn't change the results - the report and the feature store
+(which stream the spilled holes back from the disk) are compared with the in-memory run. The corpus repeats some of
+its parts, so the jobs of the later parts are performed on holes that were already spilled.
+"""
+
+
+def repeat_parts(corpus_dir, num_parts):
+    """ Copies the first num_parts parts of the corpus (and their drawings) under new names """
+    jsons_dir = os.path.join(corpus_dir, "JSONs")
+    drawings_dir = os.path.join(corpus_dir, "Tech_Drawing_JSONs")
+    for part_name in sorted(os.listdir(jsons_dir))[:num_parts]:
+        shutil.copy(os.path.join(jsons_dir, part_name), os.path.join(jsons_dir, "REPEATED_" + part_name))
+        shutil.copy(os.path.join(drawings_dir, "DRAWING_" + part_name),
+                    os.path.join(drawings_dir, "DRAWING_REPEATED_" + part_name))
+
+
+def corpus_outputs(corpus_dir, output_dir, **process_arguments):
+    """ Processes the corpus in corpus_dir, and returns its report (text) and its feature store's columns """
+    with redirect_stdout(io.StringIO()):
+        topologies_dict = main.process_corpus(os.path.join(corpus_dir, "JSONs"),
+                                              os.path.join(corpus_dir, "Tech_Drawing_JSONs"), **process_arguments)
+    report_path = os.path.join(output_dir, "report.txt")
+    write_report(topologies_dict, report_path)
+    with open(report_path, "rb") as file:
+        report = file.read()
+    store_dir = os.path.join(output_dir, "store")
+    export_feature_store(topologies_dict, store_dir)
+    columns, categories = load_feature_store(store_dir, mmap_mode=None)
+    return report, columns, categories
+
+
+class SpillStoreTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.temp_dir = tempfile.TemporaryDirectory()
+        cls.corpus_dir = os.path.join(cls.temp_dir.name, "corpus")
+        generate_corpus(cls.corpus_dir, num_parts=8, groups_per_part=5, mac_pairs=2, tool_path_points=5, seed=11)
+        repeat_parts(cls.corpus_dir, 3)
+        cls.expected_outputs = cls.outputs("in_memory")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.temp_dir.cleanup()
+
+    @classmethod
+    def outputs(cls, run_name, **process_arguments):
+        output_dir = os.path.join(cls.temp_dir.name, run_name)
+        os.makedirs(output_dir)
+        return corpus_outputs(cls.corpus_dir, output_dir, **process_arguments)
+
+    def assert_same_outputs(self, outputs):
+        report, columns, categories = outputs
+        expected_report, expected_columns, expected_categories = self.expected_outputs
+        self.assertIn(b"Hole Group", report)
+        self.assertEqual(report, expected_report)
+        self.assertEqual(categories, expected_categories)
+        self.assertEqual({group: list(group_columns) for group, group_columns in columns.items()},
+                         {group: list(group_columns) for group, group_columns in expected_columns.items()})
+        for group, group_columns in expected_columns.items():
+            for column, expected_array in group_columns.items():
+                with self.subTest(group=group, column=column):
+                    array = columns[group][column]
+                    self.assertEqual(array.dtype, expected_array.dtype)
+                    self.assertTrue(np.array_equal(array, expected_array, equal_nan=array.dtype.kind == "f"))
+
+    def spill_dir(self, run_name):
+        return os.path.join(self.temp_dir.name, run_name, "spill")
+
+    def test_spilled(self):
+        spill_dir = self.spill_dir("spilled")
+        self.assert_same_outputs(self.outputs("spilled", spill_dir=spill_dir))
+        self.assertTrue(os.listdir(spill_dir))
+
+    def test_spilled_with_workers(self):
+        self.assert_same_outputs(self.outputs("spilled_workers", spill_dir=self.spill_dir("spilled_workers"),
+                                              num_workers=2))
+
+    def test_small_segments(self):
+        # Many segment files, so the holes are read back from segments that are no longer written to
+        original_segment_size = Spill_Store.segment_size
+        Spill_Store.segment_size = 4096
+        try:
+            spill_dir = self.spill_dir("small_segments")
+            self.assert_same_outputs(self.outputs("small_segments", spill_dir=spill_dir))
+            self.assertGreater(len(os.listdir(spill_dir)), 1)
+        finally:
+            Spill_Store.segment_size = original_segment_size
+
+
+if __name__ == "__main__":
+    unittest.main()
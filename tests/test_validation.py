@@ -0,0 +1,198 @@
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_dir)
+
+from Utilities_and_Cosmetics import validate_job
+
+"""
+The validation rules of each job type (see 'job_type_rules' in Utilities_and_Cosmetics.py) - known-bad jobs must
+get the expected error records, and the "sampled" and "off" modes must skip the same jobs on every run.
+"""
+
+job_types = ["NC_DRILL_OLD", "NC_DRILL_DEEP", "NC_DRILL_HR", "NC_JOB_MW_DRILL_5X", "NC_THREAD", "NC_PROFILE",
+             "NC_CHAMFER", "NC_JOB_HSS_PARALLEL_TO_CURVE", "NC_UNKNOWN_TYPE"]
+
+
+def valid_holes_group():
+    """ Returns a holes group that passes the rules of every job type """
+    return {"_geom_depth": 10.0, "_geom_thread_depth": 0.0, "_geom_thread_hole_diameter": 0.0, "_geom_thread_pitch": 0.0,
+            "_geom_upper_level": 0.0, "_geomShapeMask": 22,
+            "_geom_ShapePoly": [{"p0": [2.0, 0.0], "p1": [2.0, -10.0], "type": "line"}],
+            "_positions_format": "VFrmt_XY", "_topology_type": "HR_hwSimpleThru", "_tech_positions": [1.0, 2.0],
+            "_tech_depth": 10.0, "_tech_depth_type": "Thru", "_tech_depth_type_val": 0}
+
+
+def valid_job(job_type):
+    """ Returns a job of the given type that passes all its rules """
+    return {"type": job_type, "name": "job", "job_number": 7, "home_matrix": [0.0] * 16, "job_depth": 10.0,
+            "tool": {"lengthParameters": [], "parameters": [], "tool_type": "Drill"},
+            "drill": {"depth": 10.0}, "thread_mill": {"pitch": 1.0}, "operation_parameters": {"mode": "Climb"},
+            "geometry": {"poly_arcs": [{"p0": [0, 0]}], "recognized_holes_groups": [valid_holes_group()]}}
+
+
+def error(job, field, message, holes_group_index=None):
+    """ Returns the expected error record of a job's field """
+    return {"part_name": "part.json", "job_name": job.get("name"), "job_type": job.get("type"),
+            "job_number": job.get("job_number"), "holes_group_index": holes_group_index, "field": field,
+            "message": message}
+
+
+class ValidationRulesTest(unittest.TestCase):
+    def assert_errors(self, job, expected_errors):
+        self.assertEqual(validate_job(job, "part.json"), expected_errors)
+
+    def test_valid_jobs(self):
+        for job_type in job_types:
+            with self.subTest(job_type=job_type):
+                self.assert_errors(valid_job(job_type), [])
+
+    def test_common_rules(self):
+        for job_type in job_types:
+            with self.subTest(job_type=job_type):
+                job = valid_job(job_type)
+                job["home_matrix"] = [0.0] * 15
+                del job["job_depth"]
+                job["name"] = None
+                job["tool"]["tool_type"] = None
+                self.assert_errors(job, [error(job, "home_matrix", "home matrix field is invalid"),
+                                         error(job, "job_depth", "job depth field is invalid"),
+                                         error(job, "name", "name field is invalid"),
+                                         error(job, "tool.tool_type", "tool_type field is invalid")])
+
+    def test_missing_parent_reported_once(self):
+        # The rules of the tool's subfields are skipped when the tool is missing
+        job = valid_job("NC_DRILL_OLD")
+        job["tool"] = None
+        self.assert_errors(job, [error(job, "tool", "tool field is invalid")])
+
+    def test_drilling_rules(self):
+        for job_type in ["NC_DRILL_OLD", "NC_DRILL_DEEP", "NC_DRILL_HR", "NC_JOB_MW_DRILL_5X", "NC_THREAD"]:
+            with self.subTest(job_type=job_type):
+                job = valid_job(job_type)
+                job["drill"] = {}
+                job["geometry"]["recognized_holes_groups"] = None
+                self.assert_errors(job, [
+                    error(job, "drill", "drill field is invalid"),
+                    error(job, "geometry.recognized_holes_groups",
+                          "recognized_holes_groups field is invalid OR it's a pre-drilling operation")])
+
+    def test_thread_rules(self):
+        job = valid_job("NC_THREAD")
+        job["thread_mill"] = []
+        self.assert_errors(job, [error(job, "thread_mill", "thread_mill field is invalid")])
+        # Other drilling types don't use the thread mill
+        job = valid_job("NC_DRILL_DEEP")
+        del job["thread_mill"]
+        self.assert_errors(job, [])
+
+    def test_contour_rules(self):
+        for job_type in ["NC_PROFILE", "NC_CHAMFER"]:
+            with self.subTest(job_type=job_type):
+                job = valid_job(job_type)
+                job["geometry"]["poly_arcs"] = []
+                job["operation_parameters"] = {"mode": "Climb", "wall": "Unsupported type"}
+                job["geometry"]["recognized_holes_groups"] = None
+                self.assert_errors(job, [
+                    error(job, "geometry.poly_arcs", "geometry.poly_arcs field is invalid"),
+                    error(job, "operation_parameters", "Unsupported type found in operation_parameters"),
+                    error(job, "geometry.recognized_holes_groups",
+                          "recognized_holes_groups field is invalid OR this operation isn't performed on holes")])
+
+                job = valid_job(job_type)
+                job["operation_parameters"] = None
+                self.assert_errors(job, [error(job, "operation_parameters", "operation_parameters field is invalid")])
+
+    def test_non_drilling_rules(self):
+        job = valid_job("NC_JOB_HSS_PARALLEL_TO_CURVE")
+        job["geometry"]["recognized_holes_groups"] = None
+        job["drill"] = None  # Not used by this job type
+        self.assert_errors(job, [
+            error(job, "geometry.recognized_holes_groups",
+                  "recognized_holes_groups field is invalid OR this operation isn't performed on holes")])
+
+    def test_missing_geometry(self):
+        # The rules of the geometry's subfields are skipped when the geometry is missing
+        for job_type in job_types:
+            with self.subTest(job_type=job_type):
+                job = valid_job(job_type)
+                job["geometry"] = None
+                self.assert_errors(job, [error(job, "geometry", "geometry field is invalid")])
+
+    def test_invalid_type(self):
+        # A job without a valid type is checked by the default rules only
+        job = valid_job(None)
+        job["drill"] = None
+        self.assert_errors(job, [error(job, "type", "type field is invalid")])
+
+    def test_holes_group_rules(self):
+        job = valid_job("NC_DRILL_OLD")
+        holes_groups = job["geometry"]["recognized_holes_groups"]
+        holes_groups.append(valid_holes_group())
+        holes_groups[0]["_geomShapeMask"] = 0
+        holes_groups[1]["_tech_positions"] = [1.0]
+        holes_groups[1]["_geom_ShapePoly"] = []
+        del holes_groups[1]["_geom_upper_level"]
+        del holes_groups[1]["_tech_depth_type"]  # Used only by NC_JOB_MW_DRILL_5X
+        self.assert_errors(job, [
+            error(job, "_geomShapeMask", "_geomShapeMask field is invalid", 0),
+            error(job, "_geom_upper_level", "_geom_upper_level field is invalid", 1),
+            error(job, "_geom_ShapePoly", "_geom_ShapePoly field is invalid", 1),
+            error(job, "_tech_positions", "_tech_positions field is invalid", 1)])
+
+    def test_5x_holes_group_rules(self):
+        job = valid_job("NC_JOB_MW_DRILL_5X")
+        job["geometry"]["recognized_holes_groups"].append(valid_holes_group())
+        job["geometry"]["recognized_holes_groups"][1]["_tech_depth_type"] = ""
+        job["geometry"]["recognized_holes_groups"][1]["_tech_depth"] = None
+        self.assert_errors(job, [error(job, "_tech_depth", "_tech_depth field is invalid", 1),
+                                 error(job, "_tech_depth_type", "_tech_depth_type field is invalid", 1)])
+
+
+# Prints the job numbers (out of 200) that the "sampled" mode validates - run in a new process
+sampled_jobs_script = """
+import json, sys
+sys.path.insert(0, sys.argv[1])
+from Utilities_and_Cosmetics import validate_job
+job = {"type": "NC_DRILL_OLD", "name": "job", "geometry": None}
+print(json.dumps([job_number for job_number in range(200)
+                  if validate_job(dict(job, job_number=job_number), "part.json", "sampled")]))
+"""
+
+
+class ValidationModesTest(unittest.TestCase):
+    def invalid_job(self, job_number):
+        job = valid_job("NC_DRILL_OLD")
+        job["job_number"] = job_number
+        job["drill"] = None
+        return job
+
+    def test_off(self):
+        for job_number in range(50):
+            self.assertEqual(validate_job(self.invalid_job(job_number), "part.json", "off"), [])
+
+    def test_sampled(self):
+        sampled_jobs = [job_number for job_number in range(200)
+                        if validate_job(self.invalid_job(job_number), "part.json", "sampled")]
+        # About 1 out of every 10 jobs is validated, and a validated job gets the same errors as in "strict" mode
+        self.assertTrue(5 <= len(sampled_jobs) <= 40)
+        for job_number in sampled_jobs:
+            job = self.invalid_job(job_number)
+            self.assertEqual(validate_job(job, "part.json", "sampled"), validate_job(job, "part.json", "strict"))
+        # The same jobs are validated on every run - also in new processes, with different hash seeds
+        for hash_seed in ("1", "2"):
+            output = subprocess.run([sys.executable, "-c", sampled_jobs_script, repo_dir], capture_output=True,
+                                    check=True, env=dict(os.environ, PYTHONHASHSEED=hash_seed)).stdout
+            self.assertEqual(json.loads(output), sampled_jobs)
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            validate_job(valid_job("NC_DRILL_OLD"), "part.json", "sometimes")
+
+
+if __name__ == "__main__":
+    unittest.main()